@@ -37,6 +37,8 @@ try:
 except ImportError:
     import pywbem as wbem
 
+from multiprocessing.pool import ThreadPool
+import sys
 from sys import stdout
 from lmi.shell import LMIClassNotFound
 from lmi.scripts.common import get_logger
@@ -52,16 +54,28 @@ FIRST_COLUMN_MIN_SIZE = 17
 # GLOBAL variable - modified in get_all_info(), accessed in init_result()
 STANDALONE = True
 
+FETCH_THREADS = 4
+# Replies needed by sections of get_all_info(), fetched concurrently
+ALL_INFO_REPLIES = [
+    ('LMI_Chassis', 'first_instance'),
+    ('LMI_Baseboard', 'first_instance'),
+    ('LMI_BIOSElement', 'first_instance'),
+    ('LMI_Processor', 'instances'),
+    ('LMI_ProcessorCapabilities', 'instances'),
+    ('LMI_Memory', 'first_instance'),
+    ('LMI_PhysicalMemory', 'instances'),
+    ('LMI_MemorySlot', 'instances'),
+    ('LMI_PCIDevice', 'instances'),
+    ('LMI_PCIBridge', 'instances'),
+    ('LMI_DiskDrive', 'instances'),
+]
+
 LOG = get_logger(__name__)
 
-def _cache_replies(ns, class_name, method):
+def _get_cache(ns):
     """
-    Get the reply from cimom and cache it. Cache is cleared
-    once the namespace object changes.
-
-    :param str class_name: Name of class to operate on.
-    :param str method_name: Name of method to invoke on lmi class object.
-    :returns: Whatever the requested method returns.
+    Get the cache of replies. Cache is cleared once the namespace object
+    changes.
     """
     if not hasattr(_cache_replies, 'cache'):
         _cache_replies.cache = (ns, {})
@@ -70,18 +84,49 @@ def _cache_replies(ns, class_name, method):
         # keep the cache until namespace object changes
         cache.clear()
         _cache_replies.cache = (ns, cache)
-    try:
-        if not (class_name, method) in cache:
+    return cache
+
+class _FailedReply(object):
+    """
+    Cached exception of failed request, which is raised again each time
+    the reply is requested.
+    """
+    def __init__(self, exc_info):
+        self.exc_info = exc_info
+
+    def reraise(self):
+        raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+
+def _cache_replies(ns, class_name, method):
+    """
+    Get the reply from cimom and cache it. Cache is cleared
+    once the namespace object changes. Errors are cached as well,
+    so the failed request is not repeated.
+
+    :param str class_name: Name of class to operate on.
+    :param str method_name: Name of method to invoke on lmi class object.
+    :returns: Whatever the requested method returns.
+    """
+    cache = _get_cache(ns)
+    if not (class_name, method) in cache:
+        try:
             i = getattr(ns, class_name)
             cache[(class_name, method)] = getattr(i, method)()
-    except (LMIClassNotFound, wbem.CIMError) as err:
-        if (   isinstance(err, wbem.CIMError)
-           and err.args[0] != wbem.CIM_ERR_NOT_SUPPORTED):
+        except (LMIClassNotFound, wbem.CIMError) as err:
+            if (   isinstance(err, wbem.CIMError)
+               and err.args[0] != wbem.CIM_ERR_NOT_SUPPORTED):
+                cache[(class_name, method)] = _FailedReply(sys.exc_info())
+                raise
+            LOG().info('System has old openlmi-hardware package installed,'
+                ' class "%s" is not available.', class_name)
+            cache[(class_name, method)] = []
+        except Exception:
+            cache[(class_name, method)] = _FailedReply(sys.exc_info())
             raise
-        LOG().info('System has old openlmi-hardware package installed,'
-            ' class "%s" is not available.', class_name)
-        return []
-    return cache[(class_name, method)]
+    reply = cache[(class_name, method)]
+    if isinstance(reply, _FailedReply):
+        reply.reraise()
+    return reply
 
 def get_single_instance(ns, class_name):
     """
@@ -105,6 +150,78 @@ def get_all_instances(ns, class_name):
     """
     return _cache_replies(ns, class_name, 'instances')
 
+def get_disk_associators(ns, hdd):
+    """
+    Returns physical packages and firmware identities of the disk drive.
+    Replies are cached.
+
+    :param hdd: Disk drive.
+    :type hdd: :py:class:`lmi.shell.LMIInstance`
+    :returns: Pair of lists ``(physical packages, software identities)``.
+    :rtype: Tuple
+    """
+    cache = _get_cache(ns)
+    key = ('LMI_DiskDrive', 'associators', hdd.DeviceID)
+    if key not in cache:
+        try:
+            phys_hdds = hdd.associators(
+                    AssocClass='LMI_DiskDriveRealizes',
+                    ResultClass='LMI_DiskPhysicalPackage')
+            fws = hdd.associators(
+                    AssocClass='LMI_DiskDriveElementSoftwareIdentity',
+                    ResultClass='LMI_DiskDriveSoftwareIdentity')
+            cache[key] = (phys_hdds, fws)
+        except Exception:
+            cache[key] = _FailedReply(sys.exc_info())
+            raise
+    reply = cache[key]
+    if isinstance(reply, _FailedReply):
+        reply.reraise()
+    return reply
+
+def _fetch_reply(ns, pool, class_name, method):
+    """
+    Fetch and cache the reply, errors are cached to be reported
+    by the section printing the data. Associators of each disk drive
+    are submitted to the pool as separate work items.
+    """
+    try:
+        reply = _cache_replies(ns, class_name, method)
+    except Exception:
+        LOG().debug('Failed to fetch %s of %s.', method, class_name,
+                exc_info=True)
+        return
+    if class_name == 'LMI_DiskDrive':
+        for hdd in reply:
+            pool.apply_async(_fetch_disk_associators, (ns, hdd))
+
+def _fetch_disk_associators(ns, hdd):
+    """
+    Fetch and cache associators of disk drive, see :py:func:`_fetch_reply`.
+    """
+    try:
+        get_disk_associators(ns, hdd)
+    except Exception:
+        LOG().debug('Failed to fetch associators of disk %s.', hdd.DeviceID,
+                exc_info=True)
+
+def fetch_all_info(ns, pool):
+    """
+    Fetch data of all sections concurrently and cache them, so that
+    :py:func:`get_all_info` only renders them. Associators of each disk
+    drive are fetched as separate work items.
+
+    :param pool: Pool of threads issuing the requests.
+    :type pool: :py:class:`multiprocessing.pool.ThreadPool`
+    :returns: Results of submitted work items. Once all of them are
+        ready, no more work items are submitted and the pool can be
+        closed and joined.
+    :rtype: List of :py:class:`multiprocessing.pool.AsyncResult`
+    """
+    _get_cache(ns)  # reset the cache before threads start
+    return [ pool.apply_async(_fetch_reply, (ns, pool, class_name, method))
+           for class_name, method in ALL_INFO_REPLIES]
+
 def get_hostname(ns):
     """
     :returns: System hostname.
@@ -164,8 +281,18 @@ def get_all_info(ns):
     global STANDALONE
     STANDALONE = False
 
-    tf = TableFormatter(stdout, 0, True)
-    tf.print_host(get_hostname(ns))
+    # fetch all sections at once, they are rendered in fixed order below
+    pool = ThreadPool(FETCH_THREADS)
+    try:
+        results = fetch_all_info(ns, pool)
+        tf = TableFormatter(stdout, 0, True)
+        hostname = get_hostname(ns)
+        for result in results:
+            result.wait()
+    finally:
+        pool.close()
+        pool.join()
+    tf.print_host(hostname)
 
     try:
         get_system_info(ns)
@@ -408,51 +535,63 @@ def get_memory_info(ns):
 
 def get_pci_list(ns, pcis, bus=0, level=0):
     """
-    Recursive function, returns list of PCI devices ready for TableFormatter.
+    Returns list of PCI devices ready for TableFormatter. Devices behind
+    bridges are listed under the bridges, the tree is walked iteratively
+    with devices indexed by their bus.
 
     :param ns: LMI Namespace.
     :type ns: :py:class:`lmi.shell.LMINamespace.LMINamespace`
     :param pcis: Sorted list of PCI devices and bridges.
     :type pcis: List
-    :param bus: ID of PCI bus for this level.
+    :param bus: ID of PCI bus to start with.
     :type bus: Integer
-    :param level: Level of recursion.
+    :param level: Level of the starting bus in the tree.
     :type level: Integer
     :returns: Formatted list of tuples of PCI devices.
     :rtype: List of tuples
     """
     if level > 99:
         return []
-    result = []
-    # For deeper levels, count items on the bus
-    count = 0
-    if level > 0:
-        for p in pcis:
-            if p.BusNumber == bus:
-                count += 1
-    # Print PCI devices
-    i = 1
+    by_bus = {}
     for p in pcis:
-        if p.BusNumber == bus:
-            if level > 0:
-                if i == count:
-                    sign = u'└─ '
-                else:
-                    sign = u'├─ '
-                i += 1
-            else:
-                sign = ''
-            dsc_line = '  ' + ' ' * level + sign + p.DeviceID
-            if p.CreationClassName == 'LMI_PCIBridge':
-                dsc_line += ' %s bridge: ' % \
-                    ns.LMI_PCIBridge.BridgeTypeValues.value_name(p.BridgeType)
+        by_bus.setdefault(p.BusNumber, []).append(p)
+
+    result = []
+    # stack of (bus, level, index of the next device on the bus)
+    stack = [(bus, level, 0)]
+    # buses on the path from the root, to skip cycles of bridges
+    on_path = set([bus])
+    while stack:
+        cur_bus, cur_level, index = stack[-1]
+        devices = by_bus.get(cur_bus, [])
+        if index >= len(devices):
+            stack.pop()
+            on_path.discard(cur_bus)
+            continue
+        stack[-1] = (cur_bus, cur_level, index + 1)
+        p = devices[index]
+        if cur_level > 0:
+            if index == len(devices) - 1:
+                sign = u'└─ '
             else:
-                dsc_line += ' %s: ' % \
-                    ns.LMI_PCIDevice.ClassCodeValues.value_name(p.ClassCode)
-            dsc_line += p.Name
-            result += [(dsc_line, '')]
-            if p.CreationClassName == 'LMI_PCIBridge' and p.SecondayBusNumber:
-                result += get_pci_list(ns, pcis, p.SecondayBusNumber, level + 1)
+                sign = u'├─ '
+        else:
+            sign = ''
+        dsc_line = '  ' + ' ' * cur_level + sign + p.DeviceID
+        if p.CreationClassName == 'LMI_PCIBridge':
+            dsc_line += ' %s bridge: ' % \
+                ns.LMI_PCIBridge.BridgeTypeValues.value_name(p.BridgeType)
+        else:
+            dsc_line += ' %s: ' % \
+                ns.LMI_PCIDevice.ClassCodeValues.value_name(p.ClassCode)
+        dsc_line += p.Name
+        result += [(dsc_line, '')]
+        if (    p.CreationClassName == 'LMI_PCIBridge'
+            and p.SecondayBusNumber
+            and cur_level < 99
+            and p.SecondayBusNumber not in on_path):
+            stack.append((p.SecondayBusNumber, cur_level + 1, 0))
+            on_path.add(p.SecondayBusNumber)
     return result
 
 def get_pci_info(ns):
@@ -514,12 +653,7 @@ def get_disks_info(ns):
         return []
 
     for hdd in hdds:
-        phys_hdds = hdd.associators(
-                AssocClass='LMI_DiskDriveRealizes',
-                ResultClass='LMI_DiskPhysicalPackage')
-        fws = hdd.associators(
-                AssocClass='LMI_DiskDriveElementSoftwareIdentity',
-                ResultClass='LMI_DiskDriveSoftwareIdentity')
+        phys_hdds, fws = get_disk_associators(ns, hdd)
 
         if phys_hdds and phys_hdds[0].Model:
             model = phys_hdds[0].Model
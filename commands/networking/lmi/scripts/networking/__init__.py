@@ -30,15 +30,36 @@
 """
 LMI networking provider client library.
 """
+import random
+import socket
+import sys
+import threading
 import time
+try:
+    import lmiwbem as wbem
+except ImportError:
+    import pywbem as wbem
 
 from lmi.scripts.common.errors import LmiFailed, LmiInvalidOptions
 from lmi.scripts.common import get_logger, versioncheck
+from lmi.shell import LMIIndicationListener, LMIJob
 
 import util
 
 LOG = get_logger(__name__)
 
+ACTIVATION_TIMEOUT = None
+''' Default number of seconds to wait for (de)activation of setting, None to wait until it happens '''
+
+LISTENER_PORTS = (12000, 13000)
+''' Range of ports, one of which is picked for indication listener '''
+
+POLL_INTERVAL_INITIAL = 0.1
+POLL_INTERVAL_MAX = 2
+POLL_INTERVAL_MULTIPLIER = 1.5
+
+ESD_INDICATION_QUERY = "SELECT * FROM LMI_NetworkInstModification WHERE SourceInstance ISA LMI_IPElementSettingData"
+
 def _gateway_check(gateway, version):
     if gateway is None:
         return None
@@ -50,6 +71,59 @@ def _gateway_check(gateway, version):
         raise LmiInvalidOptions("Invalid gateway, should be IPv%d: %s" % (version, gateway))
     return gw
 
+# lookup indexes of one namespace object, see _get_lookup_cache()
+_LOOKUP_CACHE = {'ns': None, 'indexes': {}}
+
+def _get_lookup_cache(ns):
+    '''
+    Get cache of lookup indexes. Cache is cleared once the namespace object
+    changes.
+    '''
+    if _LOOKUP_CACHE['ns'] is not ns:
+        _LOOKUP_CACHE['ns'] = ns
+        _LOOKUP_CACHE['indexes'] = {}
+    return _LOOKUP_CACHE['indexes']
+
+def invalidate_lookup_index(ns):
+    '''
+    Clear index of device names and setting captions used by
+    :py:func:`get_device_by_name` and :py:func:`get_setting_by_caption`.
+
+    It's called automatically when settings are created or deleted, call it
+    when devices or settings could have been changed by another client.
+    '''
+    _get_lookup_cache(ns).clear()
+
+def _index_devices(ns, devices):
+    _get_lookup_cache(ns)['devices'] = dict((d.ElementName, d) for d in devices)
+
+def _index_settings(ns, settings):
+    cumulative = ns.LMI_IPAssignmentSettingData.AddressOriginValues.cumulativeconfiguration
+    index = {}
+    preferred = set()
+    for s in settings:
+        # prefer top-level settings over their sub-settings with the same caption
+        if s.Caption not in index or (s.AddressOrigin == cumulative and s.Caption not in preferred):
+            index[s.Caption] = s
+            if s.AddressOrigin == cumulative:
+                preferred.add(s.Caption)
+    _get_lookup_cache(ns)['settings'] = index
+
+def _lookup(ns, kind, name):
+    '''
+    Find instance in the lookup index. The index keeps instances from one
+    enumeration, which is made when the index is used for the first time or
+    when the name is not found in it.
+    '''
+    cache = _get_lookup_cache(ns)
+    if name not in cache.get(kind, {}):
+        # the index is missing or out of date
+        if kind == 'devices':
+            _index_devices(ns, ns.LMI_IPNetworkConnection.instances())
+        else:
+            _index_settings(ns, ns.LMI_IPAssignmentSettingData.instances())
+    return cache[kind].get(name)
+
 def get_device_by_name(ns, device_name):
     '''
     Get instance of LMI_IPNetworkConnection class by the device name.
@@ -58,7 +132,7 @@ def get_device_by_name(ns, device_name):
     :return: LMI_IPNetworkConnection representing the device.
     :rtype: ``LMI_IPNetworkConnection`` or ``None`` if not found
     '''
-    return ns.LMI_IPNetworkConnection.first_instance({ 'ElementName': device_name })
+    return _lookup(ns, 'devices', device_name)
 
 def get_setting_by_caption(ns, caption):
     '''
@@ -68,7 +142,7 @@ def get_setting_by_caption(ns, caption):
     :return: LMI_IPAssignmentSettingData representing the setting.
     :rtype: ``LMI_IPAssignmentSettingData`` or ``None`` if not found
     '''
-    return ns.LMI_IPAssignmentSettingData.first_instance({ 'Caption': caption })
+    return _lookup(ns, 'settings', caption)
 
 def list_devices(ns, device_names=None):
     '''
@@ -79,12 +153,10 @@ def list_devices(ns, device_names=None):
     :return: List of instances of LMI_IPNetworkConnection
     :rtype: list of LMI_IPNetworkConnection
     '''
-    for s in sorted(ns.LMI_IPNetworkConnection.instances(),
-                    key=lambda i: i.ElementName):
-        if device_names:
-            if s.ElementName in device_names:
-                yield s
-        else:
+    devices = ns.LMI_IPNetworkConnection.instances()
+    _index_devices(ns, devices)
+    for s in sorted(devices, key=lambda i: i.ElementName):
+        if not device_names or s.ElementName in device_names:
             yield s
 
 def list_settings(ns, captions=None):
@@ -96,13 +168,12 @@ def list_settings(ns, captions=None):
     :return: Settings that matches given captions
     :rtype: list of LMI_IPAssignmentSettingData
     '''
-    for s in sorted(ns.LMI_IPAssignmentSettingData.instances(),
-                    key=lambda i: i.Caption):
-        if s.AddressOrigin == ns.LMI_IPAssignmentSettingData.AddressOriginValues.cumulativeconfiguration:
-            if captions:
-                if s.Caption in captions:
-                    yield s
-            else:
+    cumulative = ns.LMI_IPAssignmentSettingData.AddressOriginValues.cumulativeconfiguration
+    settings = ns.LMI_IPAssignmentSettingData.instances()
+    _index_settings(ns, settings)
+    for s in sorted(settings, key=lambda i: i.Caption):
+        if s.AddressOrigin == cumulative:
+            if not captions or s.Caption in captions:
                 yield s
 
 def get_mac(ns, device):
@@ -207,6 +278,182 @@ def get_active_settings(ns, device):
         if elementsettingdata.IsCurrent == ns.LMI_IPElementSettingData.IsCurrentValues.IsCurrent:
             yield elementsettingdata.SettingData.to_instance()
 
+class DeviceInfo(object):
+    '''
+    Details of network device fetched at once by :py:func:`get_device_info`.
+
+    :ivar device: The device.
+    :ivar str mac: MAC address of the device.
+    :ivar list ipv4_addresses: IPv4 addresses with subnet masks, see :py:func:`get_ipv4_addresses`.
+    :ivar list ipv6_addresses: IPv6 addresses with prefixes, see :py:func:`get_ipv6_addresses`.
+    :ivar list default_gateways: Default gateways of the device.
+    :ivar list dns_servers: DNS servers assigned to the device.
+    :ivar list active_settings: Settings that are active on the device.
+    :ivar list available_settings: Settings applicable to the device.
+    '''
+    def __init__(self, device):
+        self.device = device
+        self.mac = "00:00:00:00:00:00"
+        self.ipv4_addresses = []
+        self.ipv6_addresses = []
+        self.default_gateways = []
+        self.dns_servers = []
+        self.active_settings = []
+        self.available_settings = []
+
+def get_device_info(ns, device):
+    '''
+    Get all details about given device needed by ``net device show``.
+
+    Endpoints of the device (IP endpoints, LAN endpoint and remote access
+    points) are fetched with a single associators call, settings with one
+    references and one associators call. Only DNS servers need additional
+    requests for each IP endpoint.
+
+    :param LMI_IPNetworkConnection device: network device
+    :return: details of the device
+    :rtype: :py:class:`DeviceInfo`
+    '''
+    info = DeviceInfo(device)
+    ipv4 = ns.LMI_IPProtocolEndpoint.ProtocolIFTypeValues.IPv4
+    ipv6 = ns.LMI_IPProtocolEndpoint.ProtocolIFTypeValues.IPv6
+    default_gateway = ns.LMI_NetworkRemoteServiceAccessPoint.AccessContextValues.DefaultGateway
+    dns_server = ns.LMI_NetworkRemoteServiceAccessPoint.AccessContextValues.DNSServer
+
+    ip_endpoints = []
+    for sap in device.associators(ResultClass="CIM_ServiceAccessPoint"):
+        if sap.classname == "LMI_IPProtocolEndpoint":
+            ip_endpoints.append(sap)
+            if sap.ProtocolIFType == ipv4:
+                info.ipv4_addresses.append((sap.IPv4Address, sap.SubnetMask))
+            elif sap.ProtocolIFType == ipv6:
+                info.ipv6_addresses.append((sap.IPv6Address, sap.IPv6SubnetPrefixLength))
+        elif sap.classname == "LMI_LANEndpoint":
+            if sap.MACAddress is not None:
+                info.mac = sap.MACAddress
+        elif sap.classname == "LMI_NetworkRemoteServiceAccessPoint":
+            if sap.AccessContext == default_gateway:
+                info.default_gateways.append(sap.AccessInfo)
+
+    # DNS endpoints may be shared by IP endpoints, visit each just once
+    dns_endpoints = {}
+    for ip_endpoint in ip_endpoints:
+        for dns_endpoint in ip_endpoint.associators(AssocClass="LMI_NetworkSAPSAPDependency", ResultClass="LMI_DNSProtocolEndpoint"):
+            dns_endpoints.setdefault(dns_endpoint.Name, dns_endpoint)
+    servers = {}
+    for dns_endpoint in dns_endpoints.values():
+        for rsap in dns_endpoint.associators(AssocClass="LMI_NetworkRemoteAccessAvailableToElement", ResultClass="LMI_NetworkRemoteServiceAccessPoint"):
+            if rsap.AccessContext == dns_server:
+                servers[rsap.Name] = rsap.AccessInfo
+    info.dns_servers = servers.values()
+
+    is_current = ns.LMI_IPElementSettingData.IsCurrentValues.IsCurrent
+    current = set(esd.SettingData.InstanceID
+                  for esd in device.references(ResultClass="LMI_IPElementSettingData")
+                  if esd.IsCurrent == is_current)
+    for setting in get_available_settings(ns, device):
+        info.available_settings.append(setting)
+        if setting.InstanceID in current:
+            info.active_settings.append(setting)
+    return info
+
+def _path_key(path):
+    '''
+    Make a hashable key out of object path, so that references returned in
+    association instance names can be matched with paths of instances.
+
+    :param path: LMIInstanceName or CIMInstanceName
+    :rtype: tuple
+    '''
+    path = getattr(path, 'wrapped_object', path)
+    return tuple(sorted((k.lower(), unicode(v)) for k, v in path.keybindings.items()))
+
+def _association_links(ns, assoc_class):
+    '''
+    Enumerate instance names of association class and yield pairs of keys
+    (see :py:func:`_path_key`) of associated objects.
+
+    :param str assoc_class: name of association class
+    '''
+    for assoc in getattr(ns, assoc_class).instance_names():
+        refs = [v for v in assoc.wrapped_object.keybindings.values()
+                if hasattr(v, 'keybindings')]
+        if len(refs) == 2:
+            yield (_path_key(refs[0]), _path_key(refs[1]))
+
+def get_network_inventory(ns, device_names=None):
+    '''
+    Get details about all network devices with a fixed number of requests.
+
+    Instead of walking associations of each device, instances of endpoints,
+    remote access points, settings and instance names of associations
+    between them are enumerated in bulk and joined locally. The number of
+    requests does not depend on the number of devices.
+
+    :param device_names: List of device names that will be used as filter for devices.
+    :type device_names: list of str
+    :return: details of the devices sorted by their names
+    :rtype: list of :py:class:`DeviceInfo`
+    '''
+    ipv4 = ns.LMI_IPProtocolEndpoint.ProtocolIFTypeValues.IPv4
+    ipv6 = ns.LMI_IPProtocolEndpoint.ProtocolIFTypeValues.IPv6
+    default_gateway = ns.LMI_NetworkRemoteServiceAccessPoint.AccessContextValues.DefaultGateway
+    dns_server = ns.LMI_NetworkRemoteServiceAccessPoint.AccessContextValues.DNSServer
+    is_current = ns.LMI_IPElementSettingData.IsCurrentValues.IsCurrent
+
+    devices = {}
+    for device in list_devices(ns, device_names):
+        devices[_path_key(device.path)] = DeviceInfo(device)
+    if not devices:
+        return []
+    ip_endpoints = dict((_path_key(i.path), i) for i in ns.LMI_IPProtocolEndpoint.instances())
+    lan_endpoints = dict((_path_key(i.path), i) for i in ns.LMI_LANEndpoint.instances())
+    dns_endpoints = set(_path_key(i) for i in ns.LMI_DNSProtocolEndpoint.instance_names())
+    rsaps = dict((_path_key(i.path), i) for i in ns.LMI_NetworkRemoteServiceAccessPoint.instances())
+    neighbours = {}
+    for assoc_class in ("LMI_NetworkSAPSAPDependency",
+                        "LMI_EndpointForIPNetworkConnection",
+                        "LMI_NetworkRemoteAccessAvailableToElement"):
+        for first, second in _association_links(ns, assoc_class):
+            neighbours.setdefault(first, set()).add(second)
+            neighbours.setdefault(second, set()).add(first)
+
+    for device_key, info in devices.iteritems():
+        servers = {}
+        for key in sorted(neighbours.get(device_key, ())):
+            if key in ip_endpoints:
+                endpoint = ip_endpoints[key]
+                if endpoint.ProtocolIFType == ipv4:
+                    info.ipv4_addresses.append((endpoint.IPv4Address, endpoint.SubnetMask))
+                elif endpoint.ProtocolIFType == ipv6:
+                    info.ipv6_addresses.append((endpoint.IPv6Address, endpoint.IPv6SubnetPrefixLength))
+                for dns_key in neighbours.get(key, ()):
+                    if dns_key not in dns_endpoints:
+                        continue
+                    for rsap_key in neighbours.get(dns_key, ()):
+                        rsap = rsaps.get(rsap_key)
+                        if rsap is not None and rsap.AccessContext == dns_server:
+                            servers[rsap.Name] = rsap.AccessInfo
+            elif key in lan_endpoints:
+                if lan_endpoints[key].MACAddress is not None:
+                    info.mac = lan_endpoints[key].MACAddress
+            elif key in rsaps:
+                if rsaps[key].AccessContext == default_gateway:
+                    info.default_gateways.append(rsaps[key].AccessInfo)
+        info.dns_servers = servers.values()
+
+    settings = dict((_path_key(i.path), i) for i in ns.LMI_IPAssignmentSettingData.instances())
+    for esd in ns.LMI_IPElementSettingData.instances():
+        info = devices.get(_path_key(esd.ManagedElement))
+        setting = settings.get(_path_key(esd.SettingData))
+        if info is None or setting is None:
+            continue
+        info.available_settings.append(setting)
+        if esd.IsCurrent == is_current:
+            info.active_settings.append(setting)
+
+    return sorted(devices.values(), key=lambda i: i.device.ElementName)
+
 SETTING_IP_METHOD_DISABLED = 0
 ''' Disabled IP configuration '''
 
@@ -302,11 +549,85 @@ def get_sub_setting(ns, setting):
     '''
     return setting.associators(AssocClass="LMI_OrderedIPAssignmentComponent")
 
-def get_applicable_devices(ns, setting):
+class ElementSettingIndex(object):
+    '''
+    Index of LMI_IPElementSettingData associations by setting and by device.
+
+    Associations are enumerated only once, devices and components of settings
+    are enumerated when they are needed for the first time. Pass the index to
+    :py:func:`get_applicable_devices`, :py:func:`is_setting_active` and
+    :py:func:`get_autoconnect` when they are called for many settings.
+    The index is not updated, create a new one after settings are changed.
+    '''
+    def __init__(self, ns):
+        self.ns = ns
+        self.by_setting = {}
+        self.by_device = {}
+        for esd in ns.LMI_IPElementSettingData.instances():
+            self.by_setting.setdefault(_path_key(esd.SettingData), []).append(esd)
+            self.by_device.setdefault(_path_key(esd.ManagedElement), []).append(esd)
+        self._devices = None
+        self._parts = None
+
+    @property
+    def devices(self):
+        '''
+        :return: devices indexed by keys of their paths
+        :rtype: dict
+        '''
+        if self._devices is None:
+            self._devices = dict((_path_key(d.path), d) for d in self.ns.LMI_IPNetworkConnection.instances())
+        return self._devices
+
+    def get_elements(self, setting):
+        '''
+        :return: LMI_IPElementSettingData associations of the setting
+        :rtype: list of LMI_IPElementSettingData
+        '''
+        return self.by_setting.get(_path_key(setting.path), [])
+
+    def get_devices(self, setting):
+        '''
+        :return: devices associated with the setting
+        :rtype: list of LMI_IPNetworkConnection
+        '''
+        devices = []
+        for esd in self.get_elements(setting):
+            device = self.devices.get(_path_key(esd.ManagedElement))
+            if device is not None:
+                devices.append(device)
+        return devices
+
+    def get_device_by_name(self, device_name):
+        '''
+        :return: device with given name or None
+        :rtype: LMI_IPNetworkConnection
+        '''
+        for device in self.devices.values():
+            if device.ElementName == device_name:
+                return device
+        return None
+
+    def get_parts(self, setting):
+        '''
+        :return: keys of paths of sub-settings of the setting
+        :rtype: list of tuples
+        '''
+        if self._parts is None:
+            self._parts = {}
+            for assoc in self.ns.LMI_OrderedIPAssignmentComponent.instance_names():
+                keybindings = assoc.wrapped_object.keybindings
+                self._parts.setdefault(_path_key(keybindings['GroupComponent']), []).append(
+                    _path_key(keybindings['PartComponent']))
+        return self._parts.get(_path_key(setting.path), [])
+
+def get_applicable_devices(ns, setting, index=None):
     '''
     Get list of network devices that this setting can be applied to.
 
     :param LMI_IPAssignmentSettingData setting: network setting
+    :param index: index of associations of settings and devices, see :py:class:`ElementSettingIndex`
+    :type index: ElementSettingIndex or None
     :return: devices that the setting can be applied to
     :rtype: list of LMI_IPNetworkConnection
     '''
@@ -315,10 +636,22 @@ def get_applicable_devices(ns, setting):
     if setting.classname in ('LMI_BridgingMasterSettingData', 'LMI_BondingMasterSettingData'):
         # return bond/bridge device in the bond/bridge setting is active
         interface_name = setting.InterfaceName
-        device = ns.LMI_IPNetworkConnection.first_instance({'ElementName': interface_name})
+        if index is not None:
+            device = index.get_device_by_name(interface_name)
+        else:
+            device = get_device_by_name(ns, interface_name)
         if device:
             return [device]
         # return all devices associated with slave settings for bridge/bond if not active
+        if index is not None:
+            # only slave settings are associated with devices
+            devices = []
+            for part in index.get_parts(setting):
+                for esd in index.by_setting.get(part, []):
+                    device = index.devices.get(_path_key(esd.ManagedElement))
+                    if device is not None:
+                        devices.append(device)
+            return devices
         slave_class = None
         if setting.classname == 'LMI_BridgingMasterSettingData':
             slave_class = 'LMI_BridgingSlaveSettingData'
@@ -330,18 +663,27 @@ def get_applicable_devices(ns, setting):
             devices += slave_setting.associators(AssocClass="LMI_IPElementSettingData")
         return devices
 
+    if index is not None:
+        return index.get_devices(setting)
     return setting.associators(AssocClass="LMI_IPElementSettingData")
 
-def is_setting_active(ns, setting):
+def _get_elements(setting, index):
+    if index is not None:
+        return index.get_elements(setting)
+    return setting.references(ResultClass="LMI_IPElementSettingData")
+
+def is_setting_active(ns, setting, index=None):
     '''
     Return true if the setting is currently active
 
     :param LMI_IPAssignmentSettingData setting: network setting
+    :param index: index of associations of settings and devices, see :py:class:`ElementSettingIndex`
+    :type index: ElementSettingIndex or None
     :retval True: setting is currently active
     :retval False: setting is not currently active
     :rtype: bool
     '''
-    for esd in setting.references(ResultClass="LMI_IPElementSettingData"):
+    for esd in _get_elements(setting, index):
         if esd.IsCurrent == ns.LMI_IPElementSettingData.IsCurrentValues.IsCurrent:
             return True
     return False
@@ -370,13 +712,171 @@ def _provider_check_required_device(ns):
     version = versioncheck.get_class_version(ns.connection, 'LMI_IPConfigurationService', ns.name)
     return versioncheck.parser.cmp_version(version, '0.2.3')
 
-def activate(ns, setting, device=None):
+def _is_setting_in_state(ns, setting, current):
+    '''
+    Check whether any LMI_IPElementSettingData of the setting has IsCurrent
+    property set to IsCurrent (if current is True) or IsNotCurrent.
+    '''
+    if current:
+        value = ns.LMI_IPElementSettingData.IsCurrentValues.IsCurrent
+    else:
+        value = ns.LMI_IPElementSettingData.IsCurrentValues.IsNotCurrent
+    for esd in setting.references(ResultClass="LMI_IPElementSettingData", PropertyList=["IsCurrent"]):
+        if esd.IsCurrent == value:
+            return True
+    return False
+
+def start_indication_listener():
+    '''
+    Start indication listener on a random port from ``LISTENER_PORTS``.
+
+    :return: Started listener or None if it could not be started
+    :rtype: LMIIndicationListener or None
+    '''
+    port = random.randint(*LISTENER_PORTS)
+    listener = LMIIndicationListener("0.0.0.0", port)
+    try:
+        listener.start()
+    except Exception as e:
+        LOG().warn("Unable to start indication listener on port %d: %s", port, e)
+        return None
+    return listener
+
+def wait_for_setting_state(ns, setting, current=True, timeout=ACTIVATION_TIMEOUT, listener=None):
+    '''
+    Wait until the setting is activated or deactivated.
+
+    The state is polled with increasing intervals, starting at
+    ``POLL_INTERVAL_INITIAL`` seconds. If indication listener is given,
+    modifications of LMI_IPElementSettingData are subscribed and the state
+    is polled immediately after such indication arrives. If the subscription
+    fails, the state is just polled.
+
+    :param LMI_IPAssignmentSettingData setting: Setting to wait for.
+    :param bool current: `True` to wait for activation, `False` for deactivation.
+    :param timeout: Maximum number of seconds to wait or None to wait forever.
+    :type timeout: float or None
+    :param listener: Started indication listener or None.
+    :type listener: LMIIndicationListener or None
+    :raises: LmiFailed when the timeout expires
+    '''
+    changed = threading.Event()
+    subscription = None
+    if listener is not None:
+        name = listener.add_handler("lmiscript_networking_setting-XXXXXXXX",
+                                    lambda indication, **kwargs: changed.set())
+        try:
+            retval = ns.connection.subscribe_indication(
+                Name=name,
+                Query=ESD_INDICATION_QUERY,
+                Destination="http://%s:%d" % (socket.gethostname(), listener.port))
+        except wbem.CIMError as e:
+            LOG().warn("Failed to subscribe to setting indications: %s", e)
+        else:
+            if retval and retval.rval:
+                subscription = name
+            else:
+                LOG().warn("Failed to subscribe to setting indications: %s",
+                           retval.errorstr if retval else "unknown error")
+
+    deadline = time.time() + timeout if timeout is not None else None
+    interval = POLL_INTERVAL_INITIAL
+    try:
+        while not _is_setting_in_state(ns, setting, current):
+            if deadline is None:
+                wait = interval
+            else:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise LmiFailed("Timeout while waiting for %s of setting %s" % (
+                        "activation" if current else "deactivation", setting.Caption))
+                wait = min(interval, remaining)
+            changed.wait(wait)
+            changed.clear()
+            interval = min(interval * POLL_INTERVAL_MULTIPLIER, POLL_INTERVAL_MAX)
+    finally:
+        if subscription is not None:
+            ns.connection.unsubscribe_indication(subscription)
+
+def _start_apply_setting(service, setting, device, mode):
+    '''
+    Invoke ApplySettingToIPNetworkConnection asynchronously.
+
+    :return: Reference to the started job or None if the method finished immediately
+    :rtype: LMIInstanceName or None
+    '''
+    result = service.ApplySettingToIPNetworkConnection(SettingData=setting,
+            IPNetworkConnection=device, Mode=mode)
+    if result.rval == 0:
+        return None
+    if result.rval != 4096:
+        msg = "rval=%d" % result.rval
+        if result.errorstr:
+            msg += ": " + result.errorstr
+        raise LmiFailed(msg)
+    return result.rparams['Job']
+
+def _get_job_error(job):
+    '''
+    Get the error message of failed job.
+    '''
+    rval, oparms, _ = job.GetError()
+    if oparms and oparms.get('Error') is not None:
+        return oparms['Error'].Message
+    return job.ErrorDescription or "job failed"
+
+def _wait_for_jobs(jobs, timeout=ACTIVATION_TIMEOUT):
+    '''
+    Wait until all the jobs finish.
+
+    Jobs are polled together with increasing intervals, the same way as in
+    :py:func:`wait_for_setting_state`.
+
+    :param dict jobs: Dictionary mapping a label to the LMIInstanceName of job.
+    :param timeout: Maximum number of seconds to wait or None to wait forever.
+    :type timeout: float or None
+    :return: List of (label, error message) pairs of jobs that did not complete successfully.
+    :rtype: list
+    '''
+    errors = []
+    pending = dict(jobs)
+    deadline = time.time() + timeout if timeout is not None else None
+    interval = POLL_INTERVAL_INITIAL
+    while pending:
+        for label, job_name in pending.items():
+            job = job_name.to_instance()
+            if job is None:
+                errors.append((label, "job disappeared"))
+                del pending[label]
+            elif LMIJob.lmi_is_job_finished(job):
+                if not LMIJob.lmi_is_job_completed(job):
+                    errors.append((label, _get_job_error(job)))
+                del pending[label]
+        if not pending:
+            break
+        if deadline is None:
+            wait = interval
+        else:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                errors.extend((label, "timeout") for label in pending)
+                break
+            wait = min(interval, remaining)
+        time.sleep(wait)
+        interval = min(interval * POLL_INTERVAL_MULTIPLIER, POLL_INTERVAL_MAX)
+    return errors
+
+def activate(ns, setting, device=None, timeout=ACTIVATION_TIMEOUT, listener=None):
     '''
     Activate network setting on given device
 
     :param LMI_IPAssignmentSettingData setting: Setting to be activated.
     :param device: Device to activate the setting on or None for autodetection
     :type device: LMI_IPNetworkConnection or None
+    :param timeout: Seconds to wait for activation of slave settings and bond or bridge master setting
+    :type timeout: float or None
+    :param listener: Started indication listener used to notice activation sooner, see :py:func:`wait_for_setting_state`
+    :type listener: LMIIndicationListener or None
     '''
     service = ns.LMI_IPConfigurationService.first_instance()
     if (setting.classname in ('LMI_BridgingMasterSettingData', 'LMI_BondingMasterSettingData')
@@ -387,23 +887,26 @@ def activate(ns, setting, device=None):
         elif setting.classname == 'LMI_BondingMasterSettingData':
             slave_class = 'LMI_BondingSlaveSettingData'
 
-        # Autodetect and activate slaves
+        # Autodetect and activate slaves, all of them are applied at once
+        # and their jobs are awaited together
+        mode = service.ApplySettingToIPNetworkConnection.ModeValues.Mode32768
+        jobs = {}
+        errors = []
         for slave_setting in setting.associators(AssocClass='LMI_OrderedIPAssignmentComponent', ResultClass=slave_class):
             device = slave_setting.first_associator(AssocClass="LMI_IPElementSettingData")
-            LOG().debug('Activating setting %s on device %s', setting.Caption, device.ElementName)
-            result = service.SyncApplySettingToIPNetworkConnection(SettingData=slave_setting,
-                    IPNetworkConnection=device,
-                    Mode=service.ApplySettingToIPNetworkConnection.ModeValues.Mode32768)
-            if result.errorstr:
-                raise LmiFailed("Unable to activate setting: %s" % result.errorstr)
-        # TODO: rework using indications
-        isCurrent = False
-        while not isCurrent:
-            for esd in setting.references(ResultClass="LMI_IPElementSettingData"):
-                if esd.IsCurrent == ns.LMI_IPElementSettingData.IsCurrentValues.IsCurrent:
-                    isCurrent = True
-                    break
-            time.sleep(1)
+            LOG().debug('Activating setting %s on device %s', slave_setting.Caption, device.ElementName)
+            try:
+                job = _start_apply_setting(service, slave_setting, device, mode)
+            except LmiFailed as e:
+                errors.append((device.ElementName, str(e)))
+                continue
+            if job is not None:
+                jobs[device.ElementName] = job
+        errors.extend(_wait_for_jobs(jobs, timeout))
+        if errors:
+            raise LmiFailed("Unable to activate setting: %s" % ", ".join(
+                "%s (%s)" % (name, error) for name, error in sorted(errors)))
+        wait_for_setting_state(ns, setting, True, timeout, listener)
         LOG().info("Setting %s activated", setting.Caption)
         return 0
 
@@ -426,13 +929,17 @@ def activate(ns, setting, device=None):
     LOG().info("Setting %s activated", setting.Caption)
     return 0
 
-def deactivate(ns, setting, device=None):
+def deactivate(ns, setting, device=None, timeout=ACTIVATION_TIMEOUT, listener=None):
     '''
     Deactivate network setting.
 
     :param LMI_IPAssignmentSettingData setting: Setting to deactivate.
     :param device: Device to deactivate the setting on
     :type device: LMI_IPNetworkConnection or None
+    :param timeout: Seconds to wait for deactivation of slave settings with older providers
+    :type timeout: float or None
+    :param listener: Started indication listener used to notice deactivation sooner, see :py:func:`wait_for_setting_state`
+    :type listener: LMIIndicationListener or None
     '''
     service = ns.LMI_IPConfigurationService.first_instance()
 
@@ -459,14 +966,7 @@ def deactivate(ns, setting, device=None):
                         Mode=service.ApplySettingToIPNetworkConnection.ModeValues.Mode32769)
                 if result.errorstr:
                     raise LmiFailed("Unable to deactivate setting: %s" % result.errorstr)
-                # TODO: rework using indications
-                isCurrent = True
-                while isCurrent:
-                    for esd in slave_setting.references(ResultClass="LMI_IPElementSettingData"):
-                        if esd.IsCurrent == ns.LMI_IPElementSettingData.IsCurrentValues.IsNotCurrent:
-                            isCurrent = False
-                            break
-                    time.sleep(1)
+                wait_for_setting_state(ns, slave_setting, False, timeout, listener)
             LOG().info("Setting %s deactivated", setting.Caption)
             return 0
 
@@ -518,14 +1018,17 @@ def set_autoconnect(ns, setting, device=None, state=True):
         raise LmiFailed("Unable to change setting autoconnect: %s" % result.errorstr)
     return result.rval
 
-def get_autoconnect(ns, setting, device=None):
+def get_autoconnect(ns, setting, device=None, index=None):
     '''
     Return True if device is activated automatically.
 
     :param LMI_IPAssignmentSettingData setting: Setting whose autoconnection status will be read
+    :param index: index of associations of settings and devices, see :py:class:`ElementSettingIndex`
+    :type index: ElementSettingIndex or None
     '''
-    for esd in setting.references(ResultClass="LMI_IPElementSettingData"):
-        if device is None or esd.ManagedElement.to_instance() == device:
+    device_key = _path_key(device.path) if device is not None else None
+    for esd in _get_elements(setting, index):
+        if device is None or _path_key(esd.ManagedElement) == device_key:
             break
     else:
         if device is not None:
@@ -545,6 +1048,7 @@ def enslave(ns, master_setting, device):
     capability = device.first_associator(ResultClass="LMI_IPNetworkConnectionCapabilities",
                                          AssocClass="LMI_IPNetworkConnectionElementCapabilities")
     result = capability.LMI_CreateSlaveSetting(MasterSettingData=master_setting)
+    invalidate_lookup_index(ns)
     if result.rval != 0:
         raise LmiFailed("Unable to create setting: %s" % result.errorstr)
     LOG().info("Device %s enslaved to setting %s", device.ElementName, master_setting.Caption)
@@ -569,6 +1073,7 @@ def create_setting(ns, caption, device, type, ipv4method, ipv6method):
                                             Type=type,
                                             IPv4Type=ipv4method,
                                             IPv6Type=ipv6method)
+    invalidate_lookup_index(ns)
     if result.rval != 0:
         raise LmiFailed("Unable to create setting: %s" % result.errorstr)
     LOG().info("Setting %s created", caption)
@@ -582,9 +1087,395 @@ def delete_setting(ns, setting):
     '''
     caption = setting.Caption
     setting.delete()
+    invalidate_lookup_index(ns)
     LOG().info("Setting %s deleted", caption)
     return 0
 
+class SettingEditor(object):
+    '''
+    Batch of changes of IP addresses, static routes and DNS servers of one setting.
+
+    Sub-settings of the setting are loaded only once, all changes are made in
+    memory and each modified sub-setting is pushed only once by :py:meth:`commit`.
+    If the commit fails, already applied changes are reverted.
+
+    Editor can be used as a context manager, changes are committed when
+    the block finishes without an exception::
+
+        with SettingEditor(ns, setting) as editor:
+            editor.add_ip_address("192.168.1.10", 24)
+            editor.add_dns_server("192.168.1.1")
+
+    :param LMI_IPAssignmentSettingData setting: network setting to edit.
+    '''
+    def __init__(self, ns, setting):
+        self.ns = ns
+        self.setting = setting
+        self._sub_settings = None
+        # id of modified sub-setting -> (sub-setting, original property values)
+        self._modified = {}
+        self._removed_routes = []
+        self._new_routes = []
+        self._messages = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        return False
+
+    @property
+    def sub_settings(self):
+        '''
+        :return: detailed settings of the setting, see :py:func:`get_sub_setting`
+        :rtype: list of LMI_IPAssignmentSettingData subclasses
+        '''
+        if self._sub_settings is None:
+            self._sub_settings = get_sub_setting(self.ns, self.setting)
+        return self._sub_settings
+
+    def _set(self, settingData, name, value):
+        '''
+        Set property of sub-setting and remember its original value.
+        '''
+        _, original = self._modified.setdefault(id(settingData), (settingData, {}))
+        if name not in original:
+            original[name] = getattr(settingData, name)
+        # lmishell doesn't handle in-place editing of array parameters properly,
+        # we always need to assign new arrays
+        setattr(settingData, name, value)
+
+    def _ip_setting_data(self, version):
+        protocol = self.ns.LMI_IPAssignmentSettingData.ProtocolIFTypeValues.values_dict()["IPv%s" % version]
+        return [settingData for settingData in self.sub_settings
+                if settingData.ProtocolIFType is not None
+                and int(settingData.ProtocolIFType) == protocol
+                and hasattr(settingData, "IPAddresses")]
+
+    def _dns_setting_data(self, version):
+        protocolIFType = self.ns.LMI_IPAssignmentSettingData.ProtocolIFTypeValues.value("IPv%d" % version)
+        for settingData in self.sub_settings:
+            if (settingData.classname == "LMI_DNSSettingData" and settingData.ProtocolIFType == protocolIFType):
+                return settingData
+        return None
+
+    def _route_setting_data(self):
+        removed = set(id(route) for route in self._removed_routes)
+        return [settingData for settingData in self.sub_settings
+                if settingData.classname == "LMI_IPRouteSettingData"
+                and id(settingData) not in removed]
+
+    def add_ip_address(self, address, prefix, gateway=None):
+        '''
+        Add an IP address to the setting.
+
+        :param str address: IPv4 or IPv6 address.
+        :param int prefix: network prefix.
+        :param gateway: default gateway or None
+        :type gateway: str or None
+        '''
+        address, version = util.address_check(address)
+        prefix = util.prefix_check(prefix, version)
+        gateway = _gateway_check(gateway, version)
+
+        found = False
+        for settingData in self._ip_setting_data(version):
+            self._set(settingData, "IPAddresses", settingData.IPAddresses + [address])
+            if version == 4:
+                self._set(settingData, "SubnetMasks", settingData.SubnetMasks + [util.netmask_from_prefix(prefix)])
+            else:
+                self._set(settingData, "IPv6SubnetPrefixLengths", settingData.IPv6SubnetPrefixLengths + [str(prefix)])
+            self._set(settingData, "GatewayAddresses", settingData.GatewayAddresses + [gateway or ""])
+            found = True
+        if not found:
+            raise LmiInvalidOptions("Can't add IP address to setting: invalid setting type.")
+        self._messages.append("IP address %s/%d added to setting %s" % (address, prefix, self.setting.Caption))
+
+    def remove_ip_address(self, address):
+        '''
+        Remove the IP address from the setting.
+
+        :param str address: IPv4 or IPv6 address.
+        '''
+        self.remove_ip_addresses([address])
+
+    def remove_ip_addresses(self, addresses):
+        '''
+        Remove several IP addresses from the setting at once.
+
+        :param addresses: IPv4 or IPv6 addresses.
+        :type addresses: list of str
+        '''
+        addresses = [util.address_check(address) for address in addresses]
+        keys = util.address_set(address for address, _ in addresses)
+
+        found = set()
+        for version in sorted(set(version for _, version in addresses)):
+            if version == 4:
+                masks_property = "SubnetMasks"
+            else:
+                masks_property = "IPv6SubnetPrefixLengths"
+            for settingData in self._ip_setting_data(version):
+                kept = []
+                for i, addr in enumerate(settingData.IPAddresses):
+                    key = util.address_key(addr)
+                    if key in keys:
+                        found.add(key)
+                    else:
+                        kept.append(i)
+                if len(kept) == len(settingData.IPAddresses):
+                    continue
+                masks = getattr(settingData, masks_property)
+                self._set(settingData, "IPAddresses", [settingData.IPAddresses[i] for i in kept])
+                self._set(settingData, masks_property, [masks[i] for i in kept])
+                self._set(settingData, "GatewayAddresses", [settingData.GatewayAddresses[i] for i in kept])
+        if len(found) != len(keys):
+            raise LmiInvalidOptions("Can't remove IP address from setting: invalid setting type or address doesn't exist.")
+        for address, _ in addresses:
+            self._messages.append("IP address %s removed from setting %s" % (address, self.setting.Caption))
+
+    def replace_ip_address(self, address, prefix, gateway=None):
+        '''
+        Remove all IP addresses from the setting and add new IP address.
+
+        :param str address: IPv4 or IPv6 address.
+        :param int prefix: network prefix.
+        :param gateway: default gateway or None
+        :type gateway: str or None
+        '''
+        address, version = util.address_check(address)
+        prefix = util.prefix_check(prefix, version)
+        gateway = _gateway_check(gateway, version)
+
+        found = False
+        for settingData in self._ip_setting_data(version):
+            self._set(settingData, "IPAddresses", [address])
+            if version == 4:
+                self._set(settingData, "SubnetMasks", [util.netmask_from_prefix(prefix)])
+            else:
+                self._set(settingData, "IPv6SubnetPrefixLengths", [prefix])
+            self._set(settingData, "GatewayAddresses", [gateway or ""])
+            found = True
+        if not found:
+            raise LmiInvalidOptions("Can't add IP address to setting: invalid setting type.")
+        self._messages.append("Existing addresses replaced with IP address %s/%d in setting %s" % (address, prefix, self.setting.Caption))
+
+    def add_static_route(self, address, prefix, metric=None, next_hop=None):
+        '''
+        Add a static route to the setting.
+
+        :param str address: IPv4 or IPv6 address.
+        :param int prefix: network prefix.
+        :param metric: metric for the route or None
+        :type gateway: int or None
+        :param next_hop: IPv4 or IPv6 address for the next hop of the route or None
+        :type next_hop: str or None
+        '''
+        address, version = util.address_check(address)
+        prefix = util.prefix_check(prefix, version)
+        if version == 4:
+            prefix_or_mask = util.netmask_from_prefix(prefix)
+        else:
+            prefix_or_mask = prefix
+        self._new_routes.append((version, address, prefix_or_mask, metric, next_hop))
+        self._messages.append("Static route to %s/%d added to setting %s" % (address, prefix, self.setting.Caption))
+
+    def remove_static_route(self, address):
+        '''
+        Remove static route from the setting.
+
+        :param str address: IPv4 or IPv6 address.
+        '''
+        address, version = util.address_check(address)
+
+        key = util.address_key(address)
+        found = False
+        for settingData in self._route_setting_data():
+            if util.address_key(settingData.DestinationAddress) == key:
+                self._removed_routes.append(settingData)
+                found = True
+        new_routes = [route for route in self._new_routes
+                      if util.address_key(route[1]) != key]
+        if len(new_routes) != len(self._new_routes):
+            self._new_routes = new_routes
+            found = True
+        if not found:
+            raise LmiInvalidOptions("No such route: %s" % address)
+        self._messages.append("Static route to %s removed from setting %s" % (address, self.setting.Caption))
+
+    def replace_static_route(self, address, prefix, metric=None, next_hop=None):
+        '''
+        Remove all static routes and add given static route to the setting.
+
+        :param str address: IPv4 or IPv6 address.
+        :param int prefix: network prefix.
+        :param metric: metric for the route or None
+        :type gateway: int or None
+        :param next_hop: IPv4 or IPv6 address for the next hop of the route or None
+        :type next_hop: str or None
+        '''
+        self._removed_routes.extend(self._route_setting_data())
+        self._new_routes = []
+        self.add_static_route(address, prefix, metric, next_hop)
+        self._messages[-1] = "Static routes replaced with route to %s/%s in setting %s" % (address, prefix, self.setting.Caption)
+
+    def add_dns_server(self, address):
+        '''
+        Add a dns server to the setting.
+
+        :param str address: IPv4 or IPv6 address.
+        '''
+        address, version = util.address_check(address)
+
+        settingData = self._dns_setting_data(version)
+        if settingData is None:
+            raise LmiInvalidOptions("Can't assign DNS address to setting %s, invalid setting type" % self.setting.Caption)
+        self._set(settingData, "DNSServerAddresses", settingData.DNSServerAddresses + [address])
+        self._messages.append("DNS server %s added to setting %s" % (address, self.setting.Caption))
+
+    def remove_dns_server(self, address):
+        '''
+        Remove dns server from the setting.
+
+        :param str address: IPv4 or IPv6 address.
+        '''
+        self.remove_dns_servers([address])
+
+    def remove_dns_servers(self, addresses):
+        '''
+        Remove several dns servers from the setting at once.
+
+        :param addresses: IPv4 or IPv6 addresses.
+        :type addresses: list of str
+        '''
+        addresses = [util.address_check(address) for address in addresses]
+
+        for version in sorted(set(version for _, version in addresses)):
+            settingData = self._dns_setting_data(version)
+            if settingData is None:
+                raise LmiInvalidOptions("Can't remove DNS address to setting %s, invalid setting type" % self.setting.Caption)
+            keys = util.address_set(address for address, v in addresses if v == version)
+            dns = [addr for addr in settingData.DNSServerAddresses
+                   if util.address_key(addr) not in keys]
+            found = util.address_set(settingData.DNSServerAddresses) & keys
+            for address, v in addresses:
+                if v == version and util.address_key(address) not in found:
+                    raise LmiInvalidOptions("No DNS with address %s found for setting %s" % (address, self.setting.Caption))
+            self._set(settingData, "DNSServerAddresses", dns)
+        for address, _ in addresses:
+            self._messages.append("DNS server %s removed from setting %s" % (address, self.setting.Caption))
+
+    def replace_dns_server(self, address):
+        '''
+        Remove all dns servers and add given dns server to the setting.
+
+        :param str address: IPv4 or IPv6 address.
+        '''
+        address, version = util.address_check(address)
+
+        settingData = self._dns_setting_data(version)
+        if settingData is None:
+            raise LmiInvalidOptions("Can't remove DNS address to setting %s, invalid setting type" % self.setting.Caption)
+        self._set(settingData, "DNSServerAddresses", [address])
+        self._messages.append("Existing DNS servers replaced with %s in setting %s" % (address, self.setting.Caption))
+
+    def _create_route(self, version, address, prefix_or_mask, metric, next_hop):
+        if version == 4:
+            result = self.setting.LMI_AddStaticIPRoute(
+                    AddressType=self.setting.LMI_AddStaticIPRoute.AddressTypeValues.IPv4,
+                    DestinationAddress=address,
+                    DestinationMask=prefix_or_mask)
+        else:
+            result = self.setting.LMI_AddStaticIPRoute(
+                    AddressType=self.setting.LMI_AddStaticIPRoute.AddressTypeValues.IPv6,
+                    DestinationAddress=address,
+                    PrefixLength=prefix_or_mask)
+        if result.rval != 0:
+            raise LmiFailed("Unable to add static route: %s" % (result.errorstr or "unknown error"))
+        route = result.rparams["Route"].to_instance()
+        if metric is not None or next_hop is not None:
+            if metric is not None:
+                route.RouteMetric = metric
+            if next_hop is not None:
+                route.NextHop = next_hop
+            route.push()
+        return route
+
+    def _find_route(self, route):
+        '''
+        Query the provider for a static route with the same destination as
+        given (possibly stale) route instance.
+
+        :return: current instance of the route or None if it doesn't exist
+        :rtype: LMI_IPRouteSettingData or None
+        '''
+        key = (util.address_key(route.DestinationAddress), route.DestinationMask, route.PrefixLength)
+        for settingData in get_static_routes(self.ns, self.setting):
+            if (util.address_key(settingData.DestinationAddress),
+                    settingData.DestinationMask, settingData.PrefixLength) == key:
+                return settingData
+        return None
+
+    def _rollback(self, pushed, removed, created):
+        for route in created:
+            route.delete()
+        for route in removed:
+            _, version = util.address_check(route.DestinationAddress)
+            if version == 4:
+                prefix_or_mask = route.DestinationMask
+            else:
+                prefix_or_mask = route.PrefixLength
+            self._create_route(version, route.DestinationAddress, prefix_or_mask,
+                               route.RouteMetric, route.NextHop)
+        for settingData, original in pushed:
+            for name, value in original.items():
+                setattr(settingData, name, value)
+            settingData.push()
+
+    def commit(self):
+        '''
+        Push all changes to the provider.
+
+        Each modified sub-setting is pushed once, then removed static routes are
+        deleted and new ones created. If any of these steps fails, already applied
+        changes are reverted and the error is re-raised.
+        '''
+        pushed = []
+        removed = []
+        created = []
+        try:
+            for settingData, original in self._modified.values():
+                settingData.push()
+                pushed.append((settingData, original))
+            # this is workaround for crashing provider, see:
+            # https://bugzilla.redhat.com/show_bug.cgi?id=1067487
+            # paths of routes change after each delete, so every route
+            # is looked up again right before it is deleted
+            for route in self._removed_routes:
+                current = self._find_route(route)
+                if current is not None:
+                    current.delete()
+                    removed.append(route)
+            for version, address, prefix_or_mask, metric, next_hop in self._new_routes:
+                created.append(self._create_route(version, address, prefix_or_mask, metric, next_hop))
+        except Exception:
+            exc_info = sys.exc_info()
+            LOG().warn("Failed to modify setting %s, reverting changes", self.setting.Caption)
+            try:
+                self._rollback(pushed, removed, created)
+            except Exception as e:
+                LOG().warn("Failed to revert changes of setting %s: %s", self.setting.Caption, e)
+            raise exc_info[0], exc_info[1], exc_info[2]
+        for message in self._messages:
+            LOG().info(message)
+        self._modified = {}
+        self._removed_routes = []
+        self._new_routes = []
+        self._messages = []
+        self._sub_settings = None
+
 def add_ip_address(ns, setting, address, prefix, gateway=None):
     '''
     Add an IP address to the given static setting.
@@ -595,33 +1486,8 @@ def add_ip_address(ns, setting, address, prefix, gateway=None):
     :param gateway: default gateway or None
     :type gateway: str or None
     '''
-    address, version = util.address_check(address)
-    prefix = util.prefix_check(prefix, version)
-    gateway = _gateway_check(gateway, version)
-
-    protocol = ns.LMI_IPAssignmentSettingData.ProtocolIFTypeValues.values_dict()["IPv%s" % version]
-    found = False
-    for settingData in setting.associators(AssocClass="LMI_OrderedIPAssignmentComponent"):
-        if (settingData.ProtocolIFType is not None and
-                int(settingData.ProtocolIFType) == protocol and
-                hasattr(settingData, "IPAddresses")):
-
-            # lmishell doesn't handle in-place editing of array parameters properly,
-            # we need to create new arrays and then copy them back
-            settingData.IPAddresses = settingData.IPAddresses + [address]
-            if version == 4:
-                settingData.SubnetMasks = settingData.SubnetMasks + [util.netmask_from_prefix(prefix)]
-            else:
-                settingData.IPv6SubnetPrefixLengths = settingData.IPv6SubnetPrefixLengths + [str(prefix)]
-            if gateway:
-                settingData.GatewayAddresses = settingData.GatewayAddresses + [gateway]
-            else:
-                settingData.GatewayAddresses = settingData.GatewayAddresses + [""]
-            found = True
-            settingData.push()
-    if not found:
-        raise LmiInvalidOptions("Can't add IP address to setting: invalid setting type.")
-    LOG().info("IP address %s/%d added to setting %s", address, prefix, setting.Caption)
+    with SettingEditor(ns, setting) as editor:
+        editor.add_ip_address(address, prefix, gateway)
     return 0
 
 def remove_ip_address(ns, setting, address):
@@ -631,42 +1497,8 @@ def remove_ip_address(ns, setting, address):
     :param LMI_IPAssignmentSettingData setting: network setting.
     :param str address: IPv4 or IPv6 address.
     '''
-    address, version = util.address_check(address)
-
-    protocol = ns.LMI_IPAssignmentSettingData.ProtocolIFTypeValues.values_dict()["IPv%s" % version]
-    found = False
-    for settingData in setting.associators(AssocClass="LMI_OrderedIPAssignmentComponent"):
-        if (settingData.ProtocolIFType is not None and
-                int(settingData.ProtocolIFType) == protocol and
-                hasattr(settingData, "IPAddresses")):
-
-            i = 0
-            # lmishell doesn't handle in-place editing of array parameters properly,
-            # we need to create new arrays and then copy them back
-            addresses = []
-            masks = []
-            gateways = []
-            while i < len(settingData.IPAddresses):
-                if not util.compare_address(settingData.IPAddresses[i], address):
-                    addresses.append(settingData.IPAddresses[i])
-                    if version == 4:
-                        masks.append(settingData.SubnetMasks[i])
-                    else:
-                        masks.append(settingData.IPv6SubnetPrefixLengths[i])
-                    gateways.append(settingData.GatewayAddresses[i])
-                else:
-                    found = True
-                i += 1
-            settingData.IPAddresses = addresses
-            if version == 4:
-                settingData.SubnetMasks = masks
-            else:
-                settingData.IPv6SubnetPrefixLengths = masks
-            settingData.GatewayAddresses = gateways
-            settingData.push()
-    if not found:
-        raise LmiInvalidOptions("Can't remove IP address from setting: invalid setting type or address doesn't exist.")
-    LOG().info("IP address %s removed from setting %s", address, setting.Caption)
+    with SettingEditor(ns, setting) as editor:
+        editor.remove_ip_address(address)
     return 0
 
 def replace_ip_address(ns, setting, address, prefix, gateway=None):
@@ -679,34 +1511,10 @@ def replace_ip_address(ns, setting, address, prefix, gateway=None):
     :param gateway: default gateway or None
     :type gateway: str or None
     '''
-    address, version = util.address_check(address)
-    prefix = util.prefix_check(prefix, version)
-    gateway = _gateway_check(gateway, version)
-
-    protocol = ns.LMI_IPAssignmentSettingData.ProtocolIFTypeValues.values_dict()["IPv%s" % version]
-    found = False
-    for settingData in setting.associators(AssocClass="LMI_OrderedIPAssignmentComponent"):
-        if (settingData.ProtocolIFType is not None and
-                int(settingData.ProtocolIFType) == protocol and
-                hasattr(settingData, "IPAddresses")):
-
-            settingData.IPAddresses = [address]
-            if version == 4:
-                settingData.SubnetMasks = [util.netmask_from_prefix(prefix)]
-            else:
-                settingData.IPv6SubnetPrefixLengths = [prefix]
-            if gateway:
-                settingData.GatewayAddresses = [gateway]
-            else:
-                settingData.GatewayAddresses = [""]
-            found = True
-            settingData.push()
-    if not found:
-        raise LmiInvalidOptions("Can't add IP address to setting: invalid setting type.")
-    LOG().info("Existing addresses replaced with IP address %s/%d in setting %s", address, prefix, setting.Caption)
+    with SettingEditor(ns, setting) as editor:
+        editor.replace_ip_address(address, prefix, gateway)
     return 0
 
-
 def add_static_route(ns, setting, address, prefix, metric=None, next_hop=None):
     '''
     Add a static route to the given setting.
@@ -719,32 +1527,8 @@ def add_static_route(ns, setting, address, prefix, metric=None, next_hop=None):
     :param next_hop: IPv4 or IPv6 address for the next hop of the route or None
     :type next_hop: str or None
     '''
-    # Check the IP address
-    address, version = util.address_check(address)
-    prefix = util.prefix_check(prefix, version)
-
-    if version == 4:
-        result = setting.LMI_AddStaticIPRoute(
-                AddressType=setting.LMI_AddStaticIPRoute.AddressTypeValues.IPv4,
-                DestinationAddress=address,
-                DestinationMask=util.netmask_from_prefix(prefix))
-    elif version == 6:
-        result = setting.LMI_AddStaticIPRoute(
-                AddressType=setting.LMI_AddStaticIPRoute.AddressTypeValues.IPv6,
-                DestinationAddress=address,
-                PrefixLength=prefix)
-    else:
-        raise LmiInvalidOptions("Invalid IP address: %s" % address)
-    if result.rval != 0:
-        raise LmiFailed("Unable to add static route: %s" % (result.errorstr or "unknown error"))
-    route = result.rparams["Route"].to_instance()
-    if metric is not None or next_hop is not None:
-        if metric is not None:
-            route.RouteMetric = metric
-        if next_hop is not None:
-            route.NextHop = next_hop
-        route.push()
-    LOG().info("Static route to %s/%d added to setting %s", address, prefix, setting.Caption)
+    with SettingEditor(ns, setting) as editor:
+        editor.add_static_route(address, prefix, metric, next_hop)
     return 0
 
 def remove_static_route(ns, setting, address):
@@ -754,17 +1538,8 @@ def remove_static_route(ns, setting, address):
     :param LMI_IPAssignmentSettingData setting: network setting.
     :param str address: IPv4 or IPv6 address.
     '''
-    # Check the IP address
-    address, version = util.address_check(address)
-
-    found = False
-    for settingData in setting.associators(AssocClass="LMI_OrderedIPAssignmentComponent", ResultClass="LMI_IPRouteSettingData"):
-        if util.compare_address(settingData.DestinationAddress, address):
-            found = True
-            settingData.delete()
-    if not found:
-        raise LmiInvalidOptions("No such route: %s" % address)
-    LOG().info("Static route to %s removed from setting %s", address, setting.Caption)
+    with SettingEditor(ns, setting) as editor:
+        editor.remove_static_route(address)
     return 0
 
 def replace_static_route(ns, setting, address, prefix, metric=None, next_hop=None):
@@ -779,18 +1554,9 @@ def replace_static_route(ns, setting, address, prefix, metric=None, next_hop=Non
     :param next_hop: IPv4 or IPv6 address for the next hop of the route or None
     :type next_hop: str or None
     '''
-    # Check the IP address
-    address, version = util.address_check(address)
-
-    # this is workaround for crashing provider, see:
-    # https://bugzilla.redhat.com/show_bug.cgi?id=1067487
-    while 1:
-        settingData = setting.first_associator(AssocClass="LMI_OrderedIPAssignmentComponent", ResultClass="LMI_IPRouteSettingData")
-        if settingData is None:
-            break
-        settingData.delete()
-    LOG().info("Static routes replaced with route to %s/%d in setting %s", address, prefix, setting.Caption)
-    return add_static_route(ns, setting, address, prefix, metric, next_hop)
+    with SettingEditor(ns, setting) as editor:
+        editor.replace_static_route(address, prefix, metric, next_hop)
+    return 0
 
 def add_dns_server(ns, setting, address):
     '''
@@ -799,18 +1565,8 @@ def add_dns_server(ns, setting, address):
     :param LMI_IPAssignmentSettingData setting: network setting.
     :param str address: IPv4 or IPv6 address.
     '''
-    # Check the IP address
-    address, version = util.address_check(address)
-
-    protocolIFType = ns.LMI_IPAssignmentSettingData.ProtocolIFTypeValues.value("IPv%d" % version)
-    for settingData in setting.associators(AssocClass="LMI_OrderedIPAssignmentComponent"):
-        if (settingData.classname == "LMI_DNSSettingData" and settingData.ProtocolIFType == protocolIFType):
-            settingData.DNSServerAddresses = settingData.DNSServerAddresses + [address]
-            settingData.push()
-            break
-    else:
-        raise LmiInvalidOptions("Can't assign DNS address to setting %s, invalid setting type" % setting.Caption)
-    LOG().info("DNS server %s added to setting %s", address, setting.Caption)
+    with SettingEditor(ns, setting) as editor:
+        editor.add_dns_server(address)
     return 0
 
 def remove_dns_server(ns, setting, address):
@@ -820,24 +1576,8 @@ def remove_dns_server(ns, setting, address):
     :param LMI_IPAssignmentSettingData setting: network setting.
     :param str address: IPv4 or IPv6 address.
     '''
-    # Check the IP address
-    address, version = util.address_check(address)
-
-    protocolIFType = ns.LMI_IPAssignmentSettingData.ProtocolIFTypeValues.value("IPv%d" % version)
-    for settingData in setting.associators(AssocClass="LMI_OrderedIPAssignmentComponent"):
-        if (settingData.classname == "LMI_DNSSettingData" and settingData.ProtocolIFType == protocolIFType):
-            dns = []
-            for addr in settingData.DNSServerAddresses:
-                if not util.compare_address(addr, address):
-                    dns.append(addr)
-            if len(dns) == len(settingData.DNSServerAddresses):
-                raise LmiInvalidOptions("No DNS with address %s found for setting %s" % (address, setting.Caption))
-            settingData.DNSServerAddresses = dns
-            settingData.push()
-            return 0
-    else:
-        raise LmiInvalidOptions("Can't remove DNS address to setting %s, invalid setting type" % setting.Caption)
-    LOG().info("DNS server %s removed from setting %s", address, setting.Caption)
+    with SettingEditor(ns, setting) as editor:
+        editor.remove_dns_server(address)
     return 0
 
 def replace_dns_server(ns, setting, address):
@@ -847,16 +1587,6 @@ def replace_dns_server(ns, setting, address):
     :param LMI_IPAssignmentSettingData setting: network setting.
     :param str address: IPv4 or IPv6 address.
     '''
-    # Check the IP address
-    address, version = util.address_check(address)
-
-    protocolIFType = ns.LMI_IPAssignmentSettingData.ProtocolIFTypeValues.value("IPv%d" % version)
-    for settingData in setting.associators(AssocClass="LMI_OrderedIPAssignmentComponent"):
-        if (settingData.classname == "LMI_DNSSettingData" and settingData.ProtocolIFType == protocolIFType):
-            settingData.DNSServerAddresses = [address]
-            settingData.push()
-            return 0
-    else:
-        raise LmiInvalidOptions("Can't remove DNS address to setting %s, invalid setting type" % setting.Caption)
-    LOG().info("Existing DNS servers replaced with %s in setting %s", address, setting.Caption)
+    with SettingEditor(ns, setting) as editor:
+        editor.replace_dns_server(address)
     return 0
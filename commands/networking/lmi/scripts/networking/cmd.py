@@ -22,18 +22,20 @@
 Networking service management.
 
 Usage:
-    %(cmd)s device (--help | show [<device_name> ...] | list [<device_name> ...])
+    %(cmd)s device (--help | show [<device_name> ...] | list [<device_name> ...] | inventory [<device_name> ...])
     %(cmd)s setting (--help | <operation> [<args>...])
-    %(cmd)s activate <caption> [<device_name>]
-    %(cmd)s deactivate <caption> [<device_name>]
+    %(cmd)s activate [--indications] [--timeout <seconds>] <caption> [<device_name>]
+    %(cmd)s deactivate [--indications] [--timeout <seconds>] <caption> [<device_name>]
     %(cmd)s autoconnect (--help | <operation> [<args>...])
     %(cmd)s enslave <master_caption> <device_name>
     %(cmd)s address (--help | <operation> [<args>...])
     %(cmd)s route (--help | <operation> [<args>...])
     %(cmd)s dns (--help | <operation> [<args>...])
+    %(cmd)s watch [--poll] [--interval <seconds>]
 
 Commands:
-    device           Display information about network devices.
+    device           Display information about network devices or list
+                     their inventory.
     setting          Manage the network settings.
     activate         Activate setting on given network device.
     deactivate       Deactivate the setting.
@@ -42,12 +44,27 @@ Commands:
     address          Manipulate the list of IP addresses on given setting.
     route            Manipulate the list of static routes on given setting.
     dns              Manipulate the list of DNS servers on given setting.
+    watch            Print changes of operating status of devices and their
+                     IP addresses until interrupted.
+
+Options:
+    --indications         Subscribe to changes of settings to notice their
+                          (de)activation sooner than by polling.
+    --timeout <seconds>   Fail if the setting is not (de)activated in given
+                          number of seconds. Wait forever by default.
+    --poll                Compare periodically fetched state instead of
+                          receiving indications.
+    --interval <seconds>  Number of seconds between two polls [default: 5].
 """
 
+import time
+
 from lmi.scripts.common import command
 from lmi.scripts.common import errors
 from lmi.scripts.common.formatter import command as fcmd
 from lmi.scripts.networking import *
+from lmi.scripts.networking import monitor
+from lmi.scripts.networking import snapshot
 
 ## DEVICE
 
@@ -63,22 +80,35 @@ def cmd_show_devices(ns, device_names=None):
     Implementation of 'net show devices' command.
     """
     for device in list_devices(ns, device_names):
+        info = get_device_info(ns, device)
         yield fcmd.NewTableCommand(title="Device %s" % device.ElementName)
         yield ("Operating Status", ns.LMI_IPNetworkConnection.OperatingStatusValues.value_name(device.OperatingStatus))
-        yield ("MAC Address", get_mac(ns, device))
-        for ip, prefix in get_ipv4_addresses(ns, device):
+        yield ("MAC Address", info.mac)
+        for ip, prefix in info.ipv4_addresses:
             yield ("IPv4 Address", "%s/%s" % (ip, prefix))
-        for ip, mask in get_ipv6_addresses(ns, device):
+        for ip, mask in info.ipv6_addresses:
             yield ("IPv6 Address", "%s/%s" % (ip, mask))
-        for gw in get_default_gateways(ns, device):
+        for gw in info.default_gateways:
             yield ("Default Gateway", gw)
-        for dns in get_dns_servers(ns, device):
+        for dns in info.dns_servers:
             yield ("DNS Server", dns)
-        for setting in get_active_settings(ns, device):
+        for setting in info.active_settings:
             yield ("Active Setting", setting.Caption)
-        for setting in get_available_settings(ns, device):
+        for setting in info.available_settings:
             yield ("Available Setting", setting.Caption)
 
+def cmd_inventory_devices(ns, device_names=None):
+    """
+    Implementation of 'net device inventory' command.
+    """
+    for info in get_network_inventory(ns, device_names):
+        yield (info.device.ElementName,
+               ns.LMI_IPNetworkConnection.OperatingStatusValues.value_name(info.device.OperatingStatus),
+               info.mac,
+               ", ".join(["%s/%s" % a for a in info.ipv4_addresses + info.ipv6_addresses]),
+               ", ".join(info.default_gateways),
+               ", ".join(info.dns_servers),
+               ", ".join([s.Caption for s in info.active_settings]))
 
 class ListDevice(command.LmiLister):
     CALLABLE = 'lmi.scripts.networking.cmd:cmd_list_devices'
@@ -102,6 +132,18 @@ class ShowDevice(command.LmiLister):
         """
         options['<device_names>'] = options.pop('<device_name>')
 
+class InventoryDevice(command.LmiLister):
+    CALLABLE = 'lmi.scripts.networking.cmd:cmd_inventory_devices'
+    COLUMNS = ('ElementName', 'OperatingStatus', 'MAC Address', 'IP Addresses',
+               'Default Gateways', 'DNS Servers', 'Active Settings')
+
+    def transform_options(self, options):
+        """
+        Rename 'device_name' option to 'devices' parameter name for better
+        readability.
+        """
+        options['<device_names>'] = options.pop('<device_name>')
+
 class Device(command.LmiCommandMultiplexer):
     """
     Display the devices present on the system.
@@ -109,12 +151,17 @@ class Device(command.LmiCommandMultiplexer):
     Usage:
         %(cmd)s list [<device_name> ...]
         %(cmd)s show [<device_name> ...]
+        %(cmd)s inventory [<device_name> ...]
 
     Commands:
-        list     List basic information about devices.
-        show     Show detailed information about devices.
+        list       List basic information about devices.
+        show       Show detailed information about devices.
+        inventory  List addresses, gateways, DNS servers and active settings
+                   of devices in one table. Information about all devices is
+                   fetched at once, which is much faster on systems with many
+                   devices.
     """
-    COMMANDS = { 'list': ListDevice, 'show': ShowDevice }
+    COMMANDS = { 'list': ListDevice, 'show': ShowDevice, 'inventory': InventoryDevice }
     OWN_USAGE = True
 
 ## SETTING
@@ -155,6 +202,7 @@ def cmd_list_settings(ns, captions=None):
         yield (setting.Caption, SETTING_TYPE_DESC.get(get_setting_type(ns, setting), 'Unknown'))
 
 def cmd_show_settings(ns, captions=None):
+    index = ElementSettingIndex(ns)
     for setting in list_settings(ns, captions):
         yield fcmd.NewTableCommand(title="Setting %s" % setting.Caption)
 
@@ -212,13 +260,13 @@ def cmd_show_settings(ns, captions=None):
                 yield ("Slave Setting", subsetting.Caption)
         # Don't show device for bridge and bond master
         if setting.classname not in ('LMI_BondingMasterSettingData', 'LMI_BridgingMasterSettingData'):
-            for device in get_applicable_devices(ns, setting):
+            for device in get_applicable_devices(ns, setting, index):
                 yield ("Device", device.ElementName)
-        if is_setting_active(ns, setting):
+        if is_setting_active(ns, setting, index):
             yield ("Status", "Active")
         else:
             yield ("Status", "Inactive")
-        if get_autoconnect(ns, setting):
+        if get_autoconnect(ns, setting, index=index):
             yield ("Autoconnect", "Enabled")
         else:
             yield ("Autoconnect", "Disabled")
@@ -231,7 +279,25 @@ def cmd_show_settings(ns, captions=None):
 
 ## Activation
 
-def cmd_activate(ns, caption, device_name):
+def _parse_timeout(timeout):
+    """
+    Convert value of --timeout option to float or None.
+    """
+    return float(timeout) if timeout is not None else None
+
+def _verify_timeout(options):
+    """
+    Check value of --timeout option.
+    """
+    if options.get('--timeout') is None:
+        return
+    try:
+        if float(options['--timeout']) <= 0:
+            raise ValueError()
+    except ValueError:
+        raise errors.LmiInvalidOptions("Invalid --timeout option: %s" % options['--timeout'])
+
+def cmd_activate(ns, caption, device_name, timeout=None, use_indications=False):
     setting = get_setting_by_caption(ns, caption)
     if setting is None:
         raise errors.LmiFailed("No such setting: %s" % caption)
@@ -241,9 +307,14 @@ def cmd_activate(ns, caption, device_name):
             raise errors.LmiFailed("No such device: %s" % device_name)
     else:
         device = None
-    return activate(ns, setting, device)
-
-def cmd_deactivate(ns, caption, device_name):
+    listener = start_indication_listener() if use_indications else None
+    try:
+        return activate(ns, setting, device, timeout, listener)
+    finally:
+        if listener is not None:
+            listener.stop()
+
+def cmd_deactivate(ns, caption, device_name, timeout=None, use_indications=False):
     setting = get_setting_by_caption(ns, caption)
     if setting is None:
         raise errors.LmiFailed("No such setting: %s" % caption)
@@ -253,12 +324,21 @@ def cmd_deactivate(ns, caption, device_name):
             raise errors.LmiFailed("No such device: %s" % device_name)
     else:
         device = None
-    return deactivate(ns, setting, device)
+    listener = start_indication_listener() if use_indications else None
+    try:
+        return deactivate(ns, setting, device, timeout, listener)
+    finally:
+        if listener is not None:
+            listener.stop()
 
 class Activate(command.LmiCheckResult):
     EXPECT = 0
-    def execute(self, ns, caption, device_name):
-        return cmd_activate(ns, caption, device_name)
+    def verify_options(self, options):
+        _verify_timeout(options)
+
+    def execute(self, ns, caption, device_name, _indications=False, _timeout=None):
+        return cmd_activate(ns, caption, device_name,
+                            _parse_timeout(_timeout), _indications)
 
     def transform_options(self, options):
         """
@@ -270,8 +350,12 @@ class Activate(command.LmiCheckResult):
 
 class Deactivate(command.LmiCheckResult):
     EXPECT = 0
-    def execute(self, ns, caption, device_name):
-        return cmd_deactivate(ns, caption, device_name)
+    def verify_options(self, options):
+        _verify_timeout(options)
+
+    def execute(self, ns, caption, device_name, _indications=False, _timeout=None):
+        return cmd_deactivate(ns, caption, device_name,
+                              _parse_timeout(_timeout), _indications)
 
     def transform_options(self, options):
         """
@@ -409,6 +493,28 @@ class DeleteSetting(command.LmiCheckResult):
         if '<caption>' in options and len(options['<caption>']) > 0:
             options['<caption>'] = options['<caption>'][0]
 
+class ExportSetting(command.LmiCheckResult):
+    EXPECT = 0
+    def execute(self, ns, file, caption):
+        exported = snapshot.export_settings(ns, caption)
+        snapshot.save_snapshot(exported, file)
+        return 0
+
+class ImportSetting(command.LmiCheckResult):
+    EXPECT = 0
+    def verify_options(self, options):
+        try:
+            if int(options['--parallel']) < 1:
+                raise ValueError()
+        except ValueError:
+            raise errors.LmiInvalidOptions("Invalid --parallel option: %s" % options['--parallel'])
+
+    def execute(self, ns, file, _replace, _parallel):
+        failed = snapshot.import_settings(ns, snapshot.load_snapshot(file), _replace, int(_parallel))
+        if failed:
+            raise errors.LmiFailed("Unable to import settings: %s" % ", ".join(caption for caption, _ in failed))
+        return 0
+
 class Setting(command.LmiCommandMultiplexer):
     """
     Manage the network configuration settings.
@@ -420,12 +526,17 @@ class Setting(command.LmiCommandMultiplexer):
                       [--ethernet | --bridging | --bonding]
                       [--ipv4 <ipv4_method>]  [--ipv6 <ipv6_method>]
         %(cmd)s delete <caption>
+        %(cmd)s export <file> [<caption> ...]
+        %(cmd)s import [--replace] [--parallel <count>] <file>
 
     Commands:
         list     List basic information about settings.
         show     Show detailed information about settings.
         create   Create new setting.
         delete   Delete existing setting.
+        export   Save settings including their addresses, routes, DNS servers,
+                 slaves and autoconnect status to the file.
+        import   Create settings saved by export command.
 
     Options:
         --ethernet  Create ethernet setting [default].
@@ -435,8 +546,19 @@ class Setting(command.LmiCommandMultiplexer):
                     IPv4 method [default: dhcp].
         --ipv6 (disabled | static | dhcpv6 | stateless)
                     IPv6 method [default: stateless].
+        --replace   Delete existing settings with the same caption instead of
+                    skipping them.
+        --parallel <count>
+                    Number of settings created at once [default: 4].
     """
-    COMMANDS = { 'list': ListSetting, 'show': ShowSetting, 'create' : CreateSetting, 'delete' : DeleteSetting }
+    COMMANDS = {
+        'list': ListSetting,
+        'show': ShowSetting,
+        'create' : CreateSetting,
+        'delete' : DeleteSetting,
+        'export': ExportSetting,
+        'import': ImportSetting
+    }
     OWN_USAGE = True
 
 # ADDRESS
@@ -664,6 +786,36 @@ class Enslave(command.LmiCheckResult):
         if '<device_name>' in options and len(options['<device_name>']) > 0:
             options['<device_name>'] = options['<device_name>'][0]
 
+## WATCH
+
+def _format_watched_value(ns, prop, value):
+    if value is None:
+        return "(none)"
+    if prop == 'OperatingStatus':
+        return ns.LMI_IPNetworkConnection.OperatingStatusValues.value_name(value)
+    return str(value)
+
+class Watch(command.LmiCheckResult):
+    EXPECT = 0
+    def verify_options(self, options):
+        try:
+            if float(options['--interval']) <= 0:
+                raise ValueError()
+        except ValueError:
+            raise errors.LmiInvalidOptions("Invalid --interval option: %s" % options['--interval'])
+
+    def execute(self, ns, _poll, _interval):
+        try:
+            for class_name, name, prop, old, new in monitor.watch(ns, float(_interval), not _poll):
+                self.app.stdout.write("%s %s %s: %s -> %s\n" % (
+                    time.strftime("%Y-%m-%d %H:%M:%S"), name, prop,
+                    _format_watched_value(ns, prop, old),
+                    _format_watched_value(ns, prop, new)))
+                self.app.stdout.flush()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
 Networking = command.register_subcommands(
     'Networking', __doc__,
     {
@@ -675,6 +827,7 @@ Networking = command.register_subcommands(
         'enslave':    Enslave,
         'address':    Address,
         'route':      Route,
-        'dns':        Dns
+        'dns':        Dns,
+        'watch':      Watch
     },
 )
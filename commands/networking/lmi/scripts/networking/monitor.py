@@ -0,0 +1,186 @@
+# Copyright (C) 2013-2014 Red Hat, Inc. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+#
+# Authors: Radek Novacek <rnovacek@redhat.com>
+#
+"""
+Monitoring of network devices and their IP addresses.
+
+Changes are reported by indications, when the indication listener can not
+be set up, the state is polled periodically and compared with the previous
+one. Polling transfers only the watched properties.
+"""
+import Queue
+import socket
+import time
+
+from lmi.scripts.common.errors import LmiFailed
+from lmi.scripts.common import get_logger
+from lmi.scripts.networking import start_indication_listener
+
+LOG = get_logger(__name__)
+
+WATCH_INTERVAL = 5
+''' Default number of seconds between two polls of network state '''
+
+WATCHED_PROPERTIES = {
+    'LMI_IPNetworkConnection': ('ElementName', ['OperatingStatus']),
+    'LMI_IPProtocolEndpoint': ('Name', ['IPv4Address', 'SubnetMask',
+                                        'IPv6Address', 'IPv6SubnetPrefixLength']),
+}
+''' Watched classes mapped to pairs (name property, list of watched properties) '''
+
+INDICATION_QUERIES = (
+    ('LMI_NetworkInstModification', False),
+    ('LMI_NetworkInstCreation', False),
+    ('LMI_NetworkInstDeletion', True),
+)
+''' Pairs of (indication class, whether the source instance was deleted) '''
+
+def _object_state(class_name, instance):
+    name_property, properties = WATCHED_PROPERTIES[class_name]
+    return (instance[name_property], dict((p, instance[p]) for p in properties))
+
+def get_network_state(ns):
+    '''
+    Get current values of watched properties of devices and IP protocol endpoints.
+
+    :return: dictionary mapping pairs (class name, device or endpoint name)
+             to dictionaries of property values
+    :rtype: dict
+    '''
+    state = {}
+    for class_name, (name_property, properties) in WATCHED_PROPERTIES.items():
+        result = ns.connection.client.get_instances(class_name, ns.name,
+                PropertyList=[name_property] + properties)
+        if result.errorstr:
+            raise LmiFailed("Unable to get %s instances: %s" % (class_name, result.errorstr))
+        for instance in result.rval:
+            name, values = _object_state(class_name, instance)
+            state[(class_name, name)] = values
+    return state
+
+def diff_network_state(old, new):
+    '''
+    Compare two network states returned by :py:func:`get_network_state`.
+
+    :return: Changes as tuples (class name, name, property, old value, new value).
+             Values of properties of removed objects are None and so are old
+             values of properties of new objects.
+    :rtype: list
+    '''
+    changes = []
+    for key in sorted(set(old) | set(new)):
+        old_values = old.get(key, {})
+        new_values = new.get(key, {})
+        for prop in sorted(set(old_values) | set(new_values)):
+            if old_values.get(prop) != new_values.get(prop):
+                changes.append(key + (prop, old_values.get(prop), new_values.get(prop)))
+    return changes
+
+def _subscribe(ns, queue):
+    '''
+    Start indication listener and subscribe to changes of watched classes.
+
+    :return: pair of started listener and names of subscriptions or None if
+             the subscription failed, the listener is stopped then
+    :rtype: tuple or None
+    '''
+    listener = start_indication_listener()
+    if listener is None:
+        return None
+    subscribed = []
+    for indication_class, deleted in INDICATION_QUERIES:
+        for class_name in WATCHED_PROPERTIES:
+            def handler(indication, class_name=class_name, deleted=deleted, **kwargs):
+                for obj in indication.exported_objects():
+                    queue.put((class_name, deleted, obj["SourceInstance"]))
+            name = listener.add_handler("lmiscript_networking_watch-XXXXXXXX", handler)
+            retval = ns.connection.subscribe_indication(
+                Name=name,
+                Query="SELECT * FROM %s WHERE SourceInstance ISA %s" % (indication_class, class_name),
+                Destination="http://%s:%d" % (socket.gethostname(), listener.port))
+            if not retval or not retval.rval:
+                LOG().warn("Failed to register indication: %s",
+                           retval.errorstr if retval else "unknown error")
+                _unsubscribe(ns, listener, subscribed)
+                return None
+            subscribed.append(name)
+    return listener, subscribed
+
+def _unsubscribe(ns, listener, subscriptions):
+    '''
+    Cancel subscriptions and stop the indication listener.
+    '''
+    try:
+        for name in subscriptions:
+            ns.connection.unsubscribe_indication(name)
+    finally:
+        listener.stop()
+
+def watch(ns, interval=WATCH_INTERVAL, use_indications=True):
+    '''
+    Watch operating status of network devices and IP addresses of their
+    protocol endpoints. This is a generator, changes are yielded as they
+    are noticed, until the generator is closed.
+
+    Indications are used when possible, otherwise the network state is polled
+    every interval seconds.
+
+    :param float interval: Number of seconds between polls.
+    :param bool use_indications: Set to False to always poll.
+    :return: Changes in the format of :py:func:`diff_network_state`
+    :rtype: generator of tuples
+    '''
+    state = get_network_state(ns)
+    queue = Queue.Queue()
+    subscription = _subscribe(ns, queue) if use_indications else None
+    if subscription is None:
+        LOG().info("Polling network state every %s seconds", interval)
+    try:
+        while True:
+            if subscription is None:
+                time.sleep(interval)
+                new_state = get_network_state(ns)
+            else:
+                # wait in short intervals to remain responsive to Ctrl+C
+                try:
+                    class_name, deleted, instance = queue.get(True, 1)
+                except Queue.Empty:
+                    continue
+                new_state = dict(state)
+                name, values = _object_state(class_name, instance)
+                if deleted:
+                    new_state.pop((class_name, name), None)
+                else:
+                    new_state[(class_name, name)] = values
+            for change in diff_network_state(state, new_state):
+                yield change
+            state = new_state
+    finally:
+        if subscription is not None:
+            _unsubscribe(ns, subscription[0], subscription[1])
@@ -0,0 +1,316 @@
+# Copyright (C) 2013-2014 Red Hat, Inc. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+#
+# Authors: Radek Novacek <rnovacek@redhat.com>
+#
+"""
+Export and import of network settings.
+
+All settings are exported with a fixed number of requests: settings, devices
+and the associations between them are enumerated at once and joined locally.
+Exported settings are stored in JSON file and can be imported on the same or
+another system.
+"""
+import json
+from multiprocessing.pool import ThreadPool
+
+from lmi.scripts.common.errors import LmiFailed, LmiInvalidOptions
+from lmi.scripts.common import get_logger
+from lmi.scripts import networking
+from lmi.scripts.networking import util
+
+LOG = get_logger(__name__)
+
+SNAPSHOT_VERSION = 1
+''' Version of the format of exported settings '''
+
+MASTER_TYPES = (networking.SETTING_TYPE_BOND_MASTER, networking.SETTING_TYPE_BRIDGE_MASTER)
+SLAVE_TYPES = (networking.SETTING_TYPE_BOND_SLAVE, networking.SETTING_TYPE_BRIDGE_SLAVE)
+
+def _prefix(ns, protocol, mask):
+    if protocol == ns.LMI_IPAssignmentSettingData.ProtocolIFTypeValues.IPv4:
+        return util.prefix_from_netmask(mask)
+    return int(mask)
+
+def _export_sub_settings(ns, entry, sub_settings):
+    '''
+    Store addresses, routes and DNS servers of sub-settings to the exported setting.
+    '''
+    for sub in sub_settings:
+        if sub.classname == 'LMI_ExtendedStaticIPAssignmentSettingData':
+            if sub.ProtocolIFType == ns.LMI_IPAssignmentSettingData.ProtocolIFTypeValues.IPv4:
+                masks = sub.SubnetMasks
+            else:
+                masks = sub.IPv6SubnetPrefixLengths
+            for i, address in enumerate(sub.IPAddresses):
+                gateway = sub.GatewayAddresses[i] if i < len(sub.GatewayAddresses) else None
+                entry["addresses"].append([address, _prefix(ns, sub.ProtocolIFType, masks[i]), gateway or None])
+        elif sub.classname == 'LMI_DNSSettingData':
+            entry["dns"].extend(sub.DNSServerAddresses)
+        elif sub.classname == 'LMI_IPRouteSettingData':
+            if sub.AddressType == ns.LMI_IPRouteSettingData.AddressTypeValues.IPv4:
+                prefix = util.prefix_from_netmask(sub.DestinationMask)
+            else:
+                prefix = int(sub.PrefixLength)
+            entry["routes"].append([sub.DestinationAddress, prefix, sub.RouteMetric, sub.NextHop])
+
+def export_settings(ns, captions=None):
+    '''
+    Export network settings with their IP addresses, static routes,
+    DNS servers, devices, masters of slave settings and autoconnect status.
+
+    :param captions: List of setting captions that will be used as filter for settings.
+    :type captions: list of str
+    :return: exported settings, see :py:func:`save_snapshot`
+    :rtype: dict
+    '''
+    cumulative = ns.LMI_IPAssignmentSettingData.AddressOriginValues.cumulativeconfiguration
+    is_next = ns.LMI_IPElementSettingData.IsNextValues.IsNext
+
+    settings = dict((networking._path_key(i.path), i) for i in ns.LMI_IPAssignmentSettingData.instances())
+    for route in ns.LMI_IPRouteSettingData.instances():
+        settings.setdefault(networking._path_key(route.path), route)
+    devices = dict((networking._path_key(i.path), i.ElementName) for i in ns.LMI_IPNetworkConnection.instances())
+    parts = {}
+    groups = {}
+    for assoc in ns.LMI_OrderedIPAssignmentComponent.instance_names():
+        keybindings = assoc.wrapped_object.keybindings
+        group = networking._path_key(keybindings['GroupComponent'])
+        part = networking._path_key(keybindings['PartComponent'])
+        parts.setdefault(group, []).append(part)
+        groups.setdefault(part, []).append(group)
+    elements = {}
+    for esd in ns.LMI_IPElementSettingData.instances():
+        elements.setdefault(networking._path_key(esd.SettingData), []).append(esd)
+
+    exported = []
+    for key, setting in settings.iteritems():
+        if setting.AddressOrigin != cumulative:
+            continue
+        if captions and setting.Caption not in captions:
+            continue
+        esds = elements.get(key, [])
+        entry = {
+            "caption": setting.Caption,
+            "type": networking.get_setting_type(ns, setting),
+            "ipv4": networking.get_setting_ip4_method(ns, setting),
+            "ipv6": networking.get_setting_ip6_method(ns, setting),
+            "devices": sorted(devices[networking._path_key(esd.ManagedElement)] for esd in esds
+                              if networking._path_key(esd.ManagedElement) in devices),
+            "autoconnect": any(esd.IsNext == is_next for esd in esds),
+            "master": None,
+            "addresses": [],
+            "routes": [],
+            "dns": [],
+        }
+        if entry["type"] in SLAVE_TYPES:
+            for group in groups.get(key, ()):
+                master = settings.get(group)
+                if master is not None and networking.get_setting_type(ns, master) in MASTER_TYPES:
+                    entry["master"] = master.Caption
+                    break
+        _export_sub_settings(ns, entry, [settings[part] for part in parts.get(key, ()) if part in settings])
+        exported.append(entry)
+    exported.sort(key=lambda e: e["caption"])
+    return {"version": SNAPSHOT_VERSION, "settings": exported}
+
+def save_snapshot(snapshot, path):
+    '''
+    Write exported settings to the file.
+
+    :param dict snapshot: exported settings, see :py:func:`export_settings`
+    :param str path: path to the file
+    '''
+    with open(path, "w") as f:
+        json.dump(snapshot, f, indent=2, sort_keys=True)
+    LOG().info("%d settings saved to %s", len(snapshot["settings"]), path)
+
+def load_snapshot(path):
+    '''
+    Read exported settings from the file.
+
+    :param str path: path to the file
+    :return: exported settings, see :py:func:`export_settings`
+    :rtype: dict
+    :raises: LmiInvalidOptions if the file is not valid
+    '''
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except (IOError, ValueError) as e:
+        raise LmiInvalidOptions("Unable to read settings from %s: %s" % (path, e))
+    if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+        raise LmiInvalidOptions("Unsupported format of settings in %s" % path)
+    return snapshot
+
+def _run_parallel(items, function, max_threads=1):
+    '''
+    Call function for each item using at most max_threads threads.
+    Unexpected exceptions are re-raised in the calling thread.
+
+    :return: dictionary mapping index of failed item to the error message
+    :rtype: dict
+    '''
+    def _call(item):
+        try:
+            function(item)
+        except (LmiFailed, LmiInvalidOptions) as e:
+            return str(e)
+        return None
+
+    if max_threads < 2 or len(items) < 2:
+        results = [_call(item) for item in items]
+    else:
+        pool = ThreadPool(min(max_threads, len(items)))
+        try:
+            results = pool.map(_call, items)
+        finally:
+            pool.close()
+    return dict((index, error) for index, error in enumerate(results) if error is not None)
+
+def _find_slaves(ns, masters):
+    '''
+    Find slave settings of given master settings with a fixed number of requests.
+
+    :param list masters: master settings
+    :return: dictionary mapping pairs (master caption, device name) to slave settings
+    :rtype: dict
+    '''
+    index = networking.ElementSettingIndex(ns)
+    settings = dict((networking._path_key(s.path), s) for s in networking.list_settings(ns))
+    slaves = {}
+    for master in masters:
+        for part in index.get_parts(master):
+            slave = settings.get(part)
+            if slave is None or networking.get_setting_type(ns, slave) not in SLAVE_TYPES:
+                continue
+            for device in index.get_devices(slave):
+                slaves[(master.Caption, device.ElementName)] = slave
+    return slaves
+
+def import_settings(ns, snapshot, replace=False, max_threads=1):
+    '''
+    Create network settings from exported settings.
+
+    Settings are created in three steps, operations within each step are
+    independent and are run in parallel in up to max_threads threads:
+    ethernet and master settings are created first, then slave settings are
+    enslaved to their masters and finally addresses, routes, DNS servers and
+    autoconnect of each setting are set with a single :py:class:`~lmi.scripts.networking.SettingEditor`.
+    Provider chooses captions of slave settings, they are matched with
+    exported settings by their master and device.
+
+    :param dict snapshot: exported settings, see :py:func:`export_settings`
+    :param bool replace: Delete existing settings with the same caption
+        instead of skipping them.
+    :param int max_threads: Maximum number of operations issued at once.
+    :return: list of pairs (caption, error message) of settings that failed to import
+    :rtype: list
+    '''
+    entries = snapshot.get("settings", [])
+    existing = dict((s.Caption, s) for s in networking.list_settings(ns))
+    devices = dict((d.ElementName, d) for d in networking.list_devices(ns))
+    failed = []
+
+    def _fail(entry, error):
+        LOG().warn("Unable to import setting %s: %s", entry["caption"], error)
+        failed.append((entry["caption"], error))
+
+    # Settings that will be created, existing ones are skipped or deleted
+    entries_to_import = []
+    for entry in entries:
+        if entry["caption"] in existing:
+            if not replace:
+                LOG().warn("Setting %s already exists, skipping", entry["caption"])
+                continue
+            networking.delete_setting(ns, existing[entry["caption"]])
+        entries_to_import.append(entry)
+
+    captions = set(e["caption"] for e in entries_to_import)
+    masters = [e for e in entries_to_import if e["type"] not in SLAVE_TYPES]
+    slaves = [e for e in entries_to_import if e["type"] in SLAVE_TYPES]
+
+    def _device(entry):
+        names = entry["devices"]
+        if not names and entry["type"] in MASTER_TYPES:
+            # inactive master setting is associated with devices of its slaves
+            for slave in entries:
+                if slave["master"] == entry["caption"]:
+                    names = names + slave["devices"]
+        for name in names:
+            if name in devices:
+                return devices[name]
+        raise LmiFailed("No such device: %s" % ", ".join(names or ["(none)"]))
+
+    def _create(entry):
+        networking.create_setting(ns, entry["caption"], _device(entry), entry["type"], entry["ipv4"], entry["ipv6"])
+    for index, error in _run_parallel(masters, _create, max_threads).items():
+        _fail(masters[index], error)
+        captions.discard(masters[index]["caption"])
+
+    created = dict((s.Caption, s) for s in networking.list_settings(ns) if s.Caption in captions)
+
+    for entry in [e for e in slaves if e["master"] not in created]:
+        _fail(entry, "Master setting %s was not imported" % entry["master"])
+    slaves = [e for e in slaves if e["master"] in created]
+    slave_devices = {}
+    def _enslave(entry):
+        device = _device(entry)
+        slave_devices[entry["caption"]] = device.ElementName
+        networking.enslave(ns, created[entry["master"]], device)
+    enslave_errors = _run_parallel(slaves, _enslave, max_threads)
+    for index, error in enslave_errors.items():
+        _fail(slaves[index], error)
+
+    # provider chooses captions of slave settings, find them by master and device
+    targets = dict((e["caption"], created[e["caption"]]) for e in masters if e["caption"] in created)
+    enslaved = [e for i, e in enumerate(slaves) if i not in enslave_errors]
+    if enslaved:
+        found = _find_slaves(ns, [created[caption] for caption in set(e["master"] for e in enslaved)])
+        for entry in enslaved:
+            slave = found.get((entry["master"], slave_devices[entry["caption"]]))
+            if slave is None:
+                _fail(entry, "Slave setting of device %s was not found" % slave_devices[entry["caption"]])
+            else:
+                targets[entry["caption"]] = slave
+
+    configured = [e for e in entries_to_import if e["caption"] in targets]
+    def _configure(entry):
+        setting = targets[entry["caption"]]
+        if entry["addresses"] or entry["routes"] or entry["dns"]:
+            with networking.SettingEditor(ns, setting) as editor:
+                for address, prefix, gateway in entry["addresses"]:
+                    editor.add_ip_address(address, prefix, gateway)
+                for address, prefix, metric, next_hop in entry["routes"]:
+                    editor.add_static_route(address, prefix, metric, next_hop)
+                for address in entry["dns"]:
+                    editor.add_dns_server(address)
+        networking.set_autoconnect(ns, setting, None, entry["autoconnect"])
+    for index, error in _run_parallel(configured, _configure, max_threads).items():
+        _fail(configured[index], error)
+
+    return failed
@@ -31,12 +31,48 @@
 LMI networking script utilities library.
 """
 
+import socket
+import struct
+
 from lmi.scripts.common.errors import LmiInvalidOptions
 import IPy
 
 class IPCheckFailed(LmiInvalidOptions):
     pass
 
+MAX_CACHE_SIZE = 4096
+''' Maximum number of parsed addresses kept in the cache '''
+
+_ADDRESS_CACHE = {}
+
+NETMASKS = tuple(socket.inet_ntoa(struct.pack("!I", (0xffffffff << (32 - prefix)) & 0xffffffff))
+                 for prefix in range(33))
+''' IPv4 netmasks indexed by prefix length '''
+
+def _parse_address(address):
+    '''
+    Parse the IP address, results are cached.
+
+    :param str address: IP address to parse
+    :return: tuple of (address_int, version, address), where address is
+             cleaned up IP address
+    :rtype: tuple of (int, int, str)
+    :raises: IPCheckFailed
+    '''
+    try:
+        return _ADDRESS_CACHE[address]
+    except (KeyError, TypeError):
+        pass
+    try:
+        address_int, version = IPy.parseAddress(address)
+    except (ValueError, TypeError, AttributeError):
+        raise IPCheckFailed("Invalid IP address: %s" % address)
+    result = (address_int, version, IPy.intToIp(address_int, version))
+    if len(_ADDRESS_CACHE) >= MAX_CACHE_SIZE:
+        _ADDRESS_CACHE.clear()
+    _ADDRESS_CACHE[address] = result
+    return result
+
 def address_check(address):
     '''
     Check if the IP address is valid.
@@ -47,13 +83,34 @@ def address_check(address):
     :rtype: tuple of (str, int)
     :raises: IPCheckFailed
     '''
-    try:
-        address_int, version = IPy.parseAddress(address)
-    except ValueError:
-        raise IPCheckFailed("Invalid IP address: %s" % address)
-    address = IPy.intToIp(address_int, version)
+    address_int, version, address = _parse_address(address)
     return (address, version)
 
+def address_key(address):
+    '''
+    Get hashable key of the IP address. Keys of the same addresses are equal
+    regardless of their textual form.
+
+    :param str address: IP address
+    :return: tuple of (version, address_int)
+    :rtype: tuple of (int, int)
+    :raises: IPCheckFailed
+    '''
+    address_int, version, _ = _parse_address(address)
+    return (version, address_int)
+
+def address_set(addresses):
+    '''
+    Create set of keys of given IP addresses usable for fast matching
+    with :py:func:`address_key`.
+
+    :param addresses: IP addresses
+    :type addresses: iterable of str
+    :rtype: set of tuples
+    :raises: IPCheckFailed
+    '''
+    return set(address_key(address) for address in addresses)
+
 def prefix_check(prefix, version):
     '''
     Check if the IP prefix is valid
@@ -70,7 +127,8 @@ def prefix_check(prefix, version):
         prefix_int = int(prefix)
     except ValueError:
         raise IPCheckFailed("Invalid prefix: %s" % prefix)
-    if (version == 4 and prefix_int > 32) or (version == 6 and prefix_int > 128):
+    if (prefix_int < 0 or (version == 4 and prefix_int > 32)
+            or (version == 6 and prefix_int > 128)):
         raise IPCheckFailed("Invalid prefix: %s" % prefix)
     return prefix_int
 
@@ -83,13 +141,34 @@ def netmask_from_prefix(prefix):
     :rtype: str
     '''
     try:
-        return IPy.IP("0.0.0.0/%s" % prefix).netmask().strFullsize()
-    except ValueError:
+        prefix_int = int(prefix)
+    except (ValueError, TypeError):
+        raise IPCheckFailed("Invalid prefix: %s" % prefix)
+    if not 0 <= prefix_int <= 32:
         raise IPCheckFailed("Invalid prefix: %s" % prefix)
+    return NETMASKS[prefix_int]
+
+def prefix_from_netmask(netmask):
+    '''
+    Convert IPv4 netmask to the prefix
+
+    :param str netmask: IPv4 network mask
+    :return: IPv4 prefix
+    :rtype: int
+    :raises: IPCheckFailed
+    '''
+    try:
+        return NETMASKS.index(netmask)
+    except ValueError:
+        raise IPCheckFailed("Invalid netmask: %s" % netmask)
 
 def compare_address(address1, address2):
-    address_int1, version1 = IPy.parseAddress(address1)
-    address_int2, version2 = IPy.parseAddress(address2)
-    if version1 != version2:
-        return False
-    return address_int1 == address_int2
+    '''
+    Check if two IP addresses are the same.
+
+    :param str address1: IP address
+    :param str address2: IP address
+    :rtype: bool
+    :raises: IPCheckFailed
+    '''
+    return address_key(address1) == address_key(address2)
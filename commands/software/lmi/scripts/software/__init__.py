@@ -77,9 +77,10 @@ Functions
 """
 
 from collections import defaultdict
-import heapq
+import fnmatch
+from multiprocessing.pool import ThreadPool
 import re
-import time
+import urlparse
 try:
     import lmiwbem as wbem
 except ImportError:
@@ -87,28 +88,38 @@ except ImportError:
 
 from lmi.shell import LMIInstance, LMIInstanceName
 from lmi.shell import LMIJob
-from lmi.shell import LMIMethod
 from lmi.shell import LMIUtil
-from lmi.shell import LMIExceptions
 from lmi.scripts.common.errors import LmiFailed
 from lmi.scripts.common import get_computer_system
 from lmi.scripts.common import get_logger
 from lmi.scripts.common import versioncheck
-
-MAX_CONNECTION_PROBLEM_COUNT = 3
-INITIAL_SLEEP_TIME = 0.5
-SLEEP_TIME_MULTIPLIER = 1.5
-CONNECTION_PROBLEM_SLEEP_TIME = 4
-
-# matches <name>.<arch>
-RE_NA  = re.compile(r'^(?P<name>.+)\.(?P<arch>[^.]+)$')
-# matches both nevra and nvra
-RE_NEVRA = re.compile(
-    r'^(?P<name>.+)-(?P<evra>(?:(?P<epoch>\d+):)?(?P<version>[\w.+{}]+)'
-    r'-(?P<release>[\w.+{}]+)\.(?P<arch>[^.]+))$')
-RE_ENVRA = re.compile(
-    r'^(?P<epoch>\d+):(?P<name>.+)-(?P<version>[\w.+{}]+)'
-    r'-(?P<release>[\w.+{}]+)\.(?P<arch>[^.]+)$')
+from lmi.scripts.software.jobs import JobWaiter, wait_for_job
+from lmi.scripts.software.nevra import Nevra
+from lmi.scripts.software.nevra import RE_NA, RE_NEVRA, RE_ENVRA
+from lmi.scripts.software.nevra import parse_pkg_spec
+
+#: Default number of verification jobs running at once.
+DEFAULT_VERIFY_JOBS = 4
+
+# matches wildcard characters of shell-style patterns
+RE_GLOB = re.compile(r'[*?[]')
+# matches characters, that need to be escaped in WQL string literals
+RE_WQL_ESCAPE = re.compile(r'(["\\])')
+
+#: Package would be installed.
+PLAN_INSTALL = 'install'
+#: Older version of package would be replaced.
+PLAN_UPGRADE = 'upgrade'
+#: Newer version of package would be replaced.
+PLAN_DOWNGRADE = 'downgrade'
+#: The same version of package would be installed again.
+PLAN_REINSTALL = 'reinstall'
+#: Nothing would be done with package.
+PLAN_NOTHING = 'nothing'
+#: Maximum number of packages, whose newest versions are looked up one by
+#: one when planning an update. Newest versions of more packages are taken
+#: from a single listing of available packages.
+PLAN_FIND_LIMIT = 20
 
 #: Array of file type names.
 FILE_TYPES = (
@@ -121,44 +132,28 @@ FILE_TYPES = (
     'Block Device'
 )
 
+#: Properties of ``LMI_SoftwareIdentityFileCheck`` always fetched by
+#: :py:func:`list_package_files`.
+FILE_CHECK_LIST_PROPERTIES = ('Name', 'FileType')
+
 BACKEND_YUM, BACKEND_PACKAGEKIT = range(2)
 
 LOG = get_logger(__name__)
 
-def _wait_for_job_finished(job):
-    """
-    This function waits for asynchronous job to be finished.
+# values cached for one namespace object, see _get_ns_cache()
+_NS_CACHE = {'ns' : None, 'values' : {}}
 
-    :param job: Instance of ``LMI_SoftwareJob``.
-    :type job: :py:class:`lmi.shell.LMIInstance`
+def _get_ns_cache(ns):
     """
-    if not isinstance(job, LMIInstance):
-        raise TypeError("job must be an LMIInstance")
-    LOG().debug('Waiting for a job "%s" to finish.', job.InstanceID)
-    sleep_time = INITIAL_SLEEP_TIME
-    connection_problem_count = 0
-    while not LMIJob.lmi_is_job_finished(job):
-        # Sleep, a bit longer in every iteration
-        time.sleep(sleep_time)
-        if sleep_time < LMIMethod._POLLING_ADAPT_MAX_WAITING_TIME:
-            sleep_time = min(sleep_time * SLEEP_TIME_MULTIPLIER,
-                    LMIMethod._POLLING_ADAPT_MAX_WAITING_TIME)
-        try:
-            (refreshed, _, errorstr) = job.refresh()
-        except wbem.CIMError as err:
-            if      (   err.args[0] == 0
-                    and err.args[1].lower().startswith('socket error')):
-                if connection_problem_count >= MAX_CONNECTION_PROBLEM_COUNT:
-                    raise
-                LOG().warn("Connection problem: %s", err.args[1])
-                if connection_problem_count == 0:
-                    sleep_time = CONNECTION_PROBLEM_SLEEP_TIME
-                connection_problem_count += 1
-            else:
-                raise
+    Get dictionary for caching values obtained from particular namespace.
+    Cache is cleared once the namespace object changes.
 
-        if not refreshed:
-            raise LMIExceptions.LMISynchroMethodCallError(errorstr)
+    :rtype: dictionary
+    """
+    if _NS_CACHE['ns'] is not ns:
+        _NS_CACHE['ns'] = ns
+        _NS_CACHE['values'] = {}
+    return _NS_CACHE['values']
 
 def get_package_nevra(package):
     """
@@ -236,6 +231,23 @@ def list_installed_packages(ns):
             ResultClass="LMI_SoftwareIdentity"):
         yield identity
 
+def list_installed_nevras(ns):
+    """
+    Get identifications of all installed packages with a single enumeration
+    of instance names. This is much cheaper than
+    :py:func:`list_installed_packages`, when just package versions are
+    needed.
+
+    :returns: Set of installed packages.
+    :rtype: set of :py:class:`~lmi.scripts.software.nevra.Nevra`
+    """
+    return set(Nevra.from_identity(iname)
+            for iname in get_computer_system(ns).associator_names(
+                Role="System",
+                ResultRole="InstalledSoftware",
+                AssocClass='LMI_InstalledSoftwareIdentity',
+                ResultClass="LMI_SoftwareIdentity"))
+
 def list_available_packages(ns,
         allow_installed=False,
         allow_duplicates=False,
@@ -273,11 +285,10 @@ def list_available_packages(ns,
         installed_nevras = set(get_package_nevra(p)
             for p in list_installed_packages(ns))
 
-    pkg_names = []
-    data = defaultdict(list)    # (pkg_name, [instance, ...])
+    enabled_value = get_enabled_state_values(ns)[0]
+    data = defaultdict(list)    # ((name, arch), [(nevra, instance), ...])
     for repo in repos:
-        if repo.EnabledState != \
-                ns.LMI_SoftwareIdentityResource.EnabledStateValues.Enabled:
+        if repo.EnabledState != enabled_value:
             continue                  # skip disabled repositories
         for identity in repo.associators(
                 Role="AvailableSAP",
@@ -287,16 +298,16 @@ def list_available_packages(ns,
             if not allow_installed and \
                     is_package_installed(identity, installed_nevras):
                 continue
-            if not identity.Name in data:
-                heapq.heappush(pkg_names, identity.Name)
-            identities = data[identity.Name]
+            nevra = Nevra.from_identity(identity)
+            identities = data[nevra.key]
             if allow_duplicates:
-                identities.append(identity)
-            else:
-                identities[:] = [identity]
+                identities.append((nevra, identity))
+            elif not identities or identities[0][0] < nevra:
+                # keep just the newest one
+                identities[:] = [(nevra, identity)]
 
-    for pkg_name in pkg_names:
-        for identity in data[pkg_name]:
+    for key in sorted(data):
+        for _, identity in sorted(data[key], key=lambda i: i[0]):
             yield identity
 
 def pkg_spec_to_filter(pkg_spec):
@@ -312,26 +323,16 @@ def pkg_spec_to_filter(pkg_spec):
         Values are non-empty parts of ``pkg_spec`` string.
     :rtype: dictionary
     """
-    if not isinstance(pkg_spec, basestring):
-        raise TypeError("pkg_spec must be a string")
+    nevra = parse_pkg_spec(pkg_spec)
     result = {}
-    for notation in ('envra', 'nevra'):
-        match = globals()['RE_' + notation.upper()].match(pkg_spec)
-        if match:
-            for key in ('name', 'version', 'release', 'arch'):
-                result[key] = match.group(key)
-            if match.group('epoch'):
-                result['epoch'] = match.group('epoch')
-            return result
-    match = RE_NA.match(pkg_spec)
-    if match:
-        for key in ('name', 'arch'):
-            result[key] = match.group(key)
-        return result
-    result['name'] = pkg_spec
+    for key in Nevra.__slots__:
+        value = getattr(nevra, key)
+        if value:
+            result[key] = value
     return result
 
-def find_package(ns, allow_duplicates=False, exact_match=True, installed=None, **kwargs):
+def find_package(ns, allow_duplicates=False, exact_match=True, installed=None,
+        installed_nevras=None, **kwargs):
     """
     Yields just a limited set of packages matching particular filter.
     Keyword arguments are used to specify this filter, which can contain
@@ -372,6 +373,9 @@ def find_package(ns, allow_duplicates=False, exact_match=True, installed=None, *
     :param boolean installed: Limit the search to installed or not installed
         packages. Unless set to boolean value, all packages will be searched
         for matching one.
+    :param set installed_nevras: Nevra strings of installed packages. They
+        are used instead of enumerating installed packages, when provider
+        can not limit the search itself.
     :returns: Instance names of ``LMI_SoftwareIdentity``.
     :rtype: generator over :py:class:`lmi.shell.LmiInstanceName`
     """
@@ -406,14 +410,61 @@ def find_package(ns, allow_duplicates=False, exact_match=True, installed=None, *
                     ExactMatch=exact_match, **opts)
     matches = ret.rparams['Matches']
     if installed is not None and 'Installed' not in opts:
-        installed_nevras = set(get_package_nevra(p)
-            for p in list_installed_packages(ns))
+        if installed_nevras is None:
+            installed_nevras = set(get_package_nevra(p)
+                for p in list_installed_packages(ns))
         matches = [iname for iname in matches
                     if is_package_installed(iname, installed_nevras) ==
                         bool(installed)]
     for identity in matches:
         yield identity
 
+def _identity_matches_filter(identity, pkg_filter):
+    """
+    :param identity: Instance of ``LMI_SoftwareIdentity``.
+    :param dictionary pkg_filter: Result of :py:func:`pkg_spec_to_filter`.
+    :returns: Whether the software identity satisfies given filter.
+    :rtype: boolean
+    """
+    for key, prop in (
+            ('name', 'Name'),
+            ('epoch', 'Epoch'),
+            ('version', 'Version'),
+            ('release', 'Release'),
+            ('arch', 'Architecture')):
+        if key not in pkg_filter:
+            continue
+        value = getattr(identity, prop)
+        if key == 'epoch' and value is None:
+            value = 0
+        if str(value) != pkg_filter[key]:
+            return False
+    return True
+
+def find_installed_packages(ns, pkg_specs):
+    """
+    Find installed packages matching any of given package specifications.
+    Installed packages are enumerated just once and matched against all the
+    specifications on client side. This is much faster than calling
+    :py:func:`find_package` for each specification.
+
+    :param list pkg_specs: Package specification strings (see
+        :py:ref:`package_specification`).
+    :returns: Dictionary with package specifications as keys and lists of
+        matching instances of ``LMI_SoftwareIdentity`` as values.
+    :rtype: dictionary
+    """
+    result = dict((pkg_spec, []) for pkg_spec in pkg_specs)
+    by_name = defaultdict(list)     # (pkg_name, [(pkg_spec, filter), ...])
+    for pkg_spec in pkg_specs:
+        pkg_filter = pkg_spec_to_filter(pkg_spec)
+        by_name[pkg_filter['name']].append((pkg_spec, pkg_filter))
+    for identity in list_installed_packages(ns):
+        for pkg_spec, pkg_filter in by_name.get(identity.Name, []):
+            if _identity_matches_filter(identity, pkg_filter):
+                result[pkg_spec].append(identity)
+    return result
+
 def list_repositories(ns, enabled=True):
     """
     Yields instances of ``LMI_SoftwareIdentityResource`` representing software
@@ -429,26 +480,114 @@ def list_repositories(ns, enabled=True):
     if not isinstance(enabled, bool) and enabled is not None:
         raise TypeError("kind must be a boolean or None")
 
+    enabled_value, disabled_value = get_enabled_state_values(ns)
     for repo in ns.LMI_SoftwareIdentityResource.instances():
-        if enabled and repo.EnabledState != \
-                ns.LMI_SoftwareIdentityResource.EnabledStateValues.Enabled:
+        if enabled and repo.EnabledState != enabled_value:
             continue
-        if enabled is False and repo.EnabledState != \
-                ns.LMI_SoftwareIdentityResource.EnabledStateValues.Disabled:
+        if enabled is False and repo.EnabledState != disabled_value:
             continue
         yield repo
 
-def list_package_files(ns, package, file_type=None):
+def get_enabled_state_values(ns):
+    """
+    Get and cache values of ``EnabledState`` property of repositories. Cache
+    is cleared once the namespace object changes.
+
+    :returns: Pair of values ``(enabled, disabled)``.
+    :rtype: tuple
+    """
+    cache = _get_ns_cache(ns)
+    if 'enabled_state_values' not in cache:
+        values = ns.LMI_SoftwareIdentityResource.EnabledStateValues
+        cache['enabled_state_values'] = (values.Enabled, values.Disabled)
+    return cache['enabled_state_values']
+
+def count_repository_packages(ns):
+    """
+    Count available packages of all enabled repositories with a single
+    enumeration of ``LMI_ResourceForSoftwareIdentity`` instance names.
+
+    :returns: Dictionary with repository identification strings as keys and
+        numbers of packages as values. Repositories without any package
+        are missing.
+    :rtype: dictionary
+    """
+    counts = defaultdict(int)
+    for assoc in ns.LMI_ResourceForSoftwareIdentity.instance_names():
+        counts[assoc.AvailableSAP.Name] += 1
+    return dict(counts)
+
+def get_repository_last_update(repository):
+    """
+    Get the time of the last update of repository metadata.
+
+    :param repository: Instance of ``LMI_SoftwareIdentityResource``.
+    :type repository: :py:class:`lmi.shell.LMIInstance`
+    :returns: Time of the last update or ``None`` if not known.
+    :rtype: :py:class:`datetime.datetime`
+    """
+    for prop in ('TimeOfLastUpdate', 'TimeOfLastChange'):
+        value = getattr(repository, prop, None)
+        if value is not None:
+            return value.datetime
+    return None
+
+def _query_package_files(ns, package, file_type, properties=None):
+    """
+    Let the broker filter file checks of given package by their type with a
+    *WQL* query. This is much cheaper than transferring all the file checks
+    of large packages.
+
+    :param package: Instance of ``LMI_SoftwareIdentity``.
+    :param integer file_type: Index to :py:data:`FILE_TYPES` array.
+    :param list properties: Properties to fetch. All of them if ``None``.
+    :returns: Instances of ``LMI_SoftwareIdentityFileCheck`` or ``None`` if
+        the query is not supported.
+    :rtype: list
+    """
+    cache = _get_ns_cache(ns)
+    if cache.get('file_query_unsupported'):
+        return None
+    query = 'SELECT %s FROM LMI_SoftwareIdentityFileCheck' \
+            ' WHERE SoftwareElementID="%s" AND FileType=%d' % (
+                ', '.join(properties) if properties else '*',
+                RE_WQL_ESCAPE.sub(r'\\\1', package.ElementName),
+                file_type)
+    try:
+        files = ns.wql(query)
+    except wbem.CIMError as err:
+        if err.args[0] not in (
+                wbem.CIM_ERR_NOT_SUPPORTED,
+                wbem.CIM_ERR_INVALID_QUERY,
+                wbem.CIM_ERR_QUERY_LANGUAGE_NOT_SUPPORTED):
+            raise
+        LOG().debug('Querying of file checks is not supported: %s', err)
+        cache['file_query_unsupported'] = True
+        return None
+    return files
+
+def list_package_files(ns, package, file_type=None, properties=None,
+        sort=True):
     """
     Get a list of files belonging to particular installed *RPM* package. Yields
     instances of ``LMI_SoftwareIdentityFileCheck``.
 
+    When ``file_type`` is given, the broker is asked to filter the files by
+    their type. If it can not do that, files are filtered on client side as
+    they are received.
+
     :param package: Instance or instance name of ``LMI_SoftwareIdentity``.
     :type package: :py:class:`lmi.shell.LMIInstance`
         or :py:class:`lmi.shell.LMIInstanceName`
     :param file_type: Either an index to :py:data:`FILE_TYPES` array or one of:
         ``{ "all", "file", "directory", "symlink", "fifo", "device" }``.
     :type file_type: string, integer or ``None``
+    :param list properties: Names of properties of file checks to fetch.
+        ``Name`` and ``FileType`` are always fetched. All properties are
+        fetched if ``None``. Fetching just the needed properties
+        significantly reduces the amount of transferred data.
+    :param boolean sort: Whether to sort the files by their name. Otherwise
+        files are yielded in the order given by provider.
     :returns: Instances of ``LMI_SoftwareIdentityFileCheck``.
     :rtype: generator over :py:class:`lmi.shell.LMIInstance`
     """
@@ -467,19 +606,29 @@ def list_package_files(ns, package, file_type=None):
                         (set(file_types), file_type))
             else:
                 file_type = file_types.index(file_type.lower()) + 1
+    if properties is not None:
+        properties = list(FILE_CHECK_LIST_PROPERTIES) + [
+                p for p in properties if p not in FILE_CHECK_LIST_PROPERTIES]
     if isinstance(package, LMIInstanceName):
         package = package.to_instance()
     if not is_package_installed(package):
         raise LmiFailed('Can not list files of not installed package "%s".' %
                 package.ElementName)
-    files = package.associators(
-            Role="Element",
-            ResultRole="Check",
-            AssocClass="LMI_SoftwareIdentityChecks",
-            ResultClass="LMI_SoftwareIdentityFileCheck")
-    for file_inst in sorted(files, key=lambda i: i.Name):
-        if file_type is not None and file_inst.FileType != file_type:
-            continue
+    files = None
+    if file_type is not None:
+        files = _query_package_files(ns, package, file_type, properties)
+    if files is None:
+        files = package.associators(
+                Role="Element",
+                ResultRole="Check",
+                AssocClass="LMI_SoftwareIdentityChecks",
+                ResultClass="LMI_SoftwareIdentityFileCheck",
+                PropertyList=properties)
+    if file_type is not None:
+        files = (f for f in files if f.FileType == file_type)
+    if sort:
+        files = sorted(files, key=lambda i: i.Name)
+    for file_inst in files:
         yield file_inst
 
 def get_repository(ns, repoid):
@@ -497,6 +646,35 @@ def get_repository(ns, repoid):
         raise LmiFailed('No such repository "%s".' % repoid)
     return repo
 
+def find_repositories(ns, patterns):
+    """
+    Find repositories matching any of given identification strings with a
+    single enumeration.
+
+    :param list patterns: Repository identification strings. They may contain
+        shell-style wildcards (e.g. ``"epel*"``).
+    :returns: Pair with a list of pairs ``(pattern, [repository, ...])``, in
+        the same order as ``patterns``, and a list of patterns, that did not
+        match any repository. Repositories are instances of
+        ``LMI_SoftwareIdentityResource``.
+    :rtype: tuple
+    """
+    repos = ns.LMI_SoftwareIdentityResource.instances()
+    found = []
+    unmatched = []
+    for pattern in patterns:
+        if not isinstance(pattern, basestring):
+            raise TypeError("repoid must be a string")
+        if RE_GLOB.search(pattern):
+            matching = [r for r in repos if fnmatch.fnmatchcase(r.Name, pattern)]
+        else:
+            matching = [r for r in repos if r.Name == pattern]
+        if matching:
+            found.append((pattern, matching))
+        else:
+            unmatched.append(pattern)
+    return found, unmatched
+
 def set_repository_enabled(ns, repository, enable=True):
     """
     Enable or disable repository.
@@ -510,12 +688,11 @@ def set_repository_enabled(ns, repository, enable=True):
     """
     if not isinstance(repository, (LMIInstance, LMIInstanceName)):
         raise TypeError("repository must be an LMIInstance")
-    cls = ns.LMI_SoftwareIdentityResource
-    if not LMIUtil.lmi_isinstance(repository, cls):
+    if not LMIUtil.lmi_isinstance(repository, ns.LMI_SoftwareIdentityResource):
         raise ValueError("repository must be an instance of"
             " LMI_SoftwareIdentityResource")
-    requested_state = cls.EnabledStateValues.Enabled if enable else \
-            cls.EnabledStateValues.Disabled
+    enabled_value, disabled_value = get_enabled_state_values(ns)
+    requested_state = enabled_value if enable else disabled_value
     if repository.EnabledState != requested_state:
         results = repository.RequestStateChange(RequestedState=requested_state)
         if results.rval != 0:
@@ -531,25 +708,52 @@ def set_repository_enabled(ns, repository, enable=True):
                 "enabled" if enable else "disabled")
     return repository.EnabledState
 
-def install_package(ns, package, force=False, update=False):
+def set_repositories_enabled(ns, repositories, enable=True, max_threads=1):
     """
-    Install package on system.
+    Enable or disable several repositories.
 
-    :param package: Instance or instance name of ``LMI_SoftwareIdentity``
-        representing package to install.
-    :type package: :py:class:`lmi.shell.LMIInstance`
-        or :py:class:`lmi.shell.LMIInstanceName`
-    :param boolean force: Whether the installation shall be done even if
-        installing the same (reinstalling) or older version than already
-        installed.
-    :param boolean update: Whether this is an update. Update fails if
-        package is not already installed on system.
-    :returns: Software identity installed on remote system.
-        It's an instance ``LMI_SoftwareIdentity``.
+    :param list repositories: Instances of ``LMI_SoftwareIdentityResource``.
+    :param boolean enable: New value of ``EnabledState`` property.
+    :param integer max_threads: Maximum number of state change requests
+        issued at once. Requests are sent one by one by default.
+    :returns: List of pairs ``(repository, result)``, in the same order as
+        ``repositories``. Result is either a previous value of repository's
+        ``EnabledState`` or an instance of
+        :py:exc:`~lmi.scripts.common.errors.LmiFailed`.
+    :rtype: list
+    """
+    get_enabled_state_values(ns)    # fill the cache before threads start
+
+    def _set(repo):
+        try:
+            return set_repository_enabled(ns, repo, enable)
+        except LmiFailed as err:
+            return err
+        except wbem.CIMError as err:
+            LOG().debug('RequestStateChange failed.', exc_info=True)
+            return LmiFailed('Failed to %s repository "%s": %s' % (
+                    'enable' if enable else 'disable', repo.Name,
+                    err.args[1]))
+
+    if max_threads < 2 or len(repositories) < 2:
+        results = [_set(repo) for repo in repositories]
+    else:
+        # other exceptions are re-raised by map() in this thread
+        pool = ThreadPool(min(max_threads, len(repositories)))
+        try:
+            results = pool.map(_set, repositories)
+        finally:
+            pool.close()
+    return zip(repositories, results)
+
+def _start_install_job(ns, package, force=False, update=False):
+    """
+    Submit installation of package and return the job without waiting for
+    it.
+
+    :returns: Instance of ``LMI_SoftwareInstallationJob``.
     :rtype: :py:class:`lmi.shell.LMIInstance`
     """
-    if not isinstance(package, (LMIInstance, LMIInstanceName)):
-        raise TypeError("package must be an LMIInstance or LMIInstanceName")
     options = [4 if not update else 5]  # Install (4) or Update (5)
     if force:
         options.append(3) # Force Installation
@@ -560,16 +764,25 @@ def install_package(ns, package, force=False, update=False):
                 if isinstance(package, LMIInstance) else package,
             Collection=ns.LMI_SystemSoftwareCollection.first_instance_name(),
             InstallOptions=options)
-    nevra = get_package_nevra(package)
     if results.rval != 4096:
         msg = 'Failed to %s package "%s" (rval=%d).' % (
-                'update' if update else 'install', nevra, results.rval)
+                'update' if update else 'install',
+                get_package_nevra(package), results.rval)
         if results.errorstr:
             msg += ': ' + results.errorstr
         raise LmiFailed(msg)
 
-    job = results.rparams['Job'].to_instance()
-    _wait_for_job_finished(job)
+    return results.rparams['Job'].to_instance()
+
+def _finish_install_job(ns, package, job, update=False):
+    """
+    Check the result of finished installation job.
+
+    :returns: Software identity installed on remote system or ``None``
+        if the package has already been installed.
+    :rtype: :py:class:`lmi.shell.LMIInstance`
+    """
+    nevra = get_package_nevra(package)
     if not LMIJob.lmi_is_job_completed(job):
         if not update:
             if not isinstance(package, LMIInstance):
@@ -605,35 +818,338 @@ def install_package(ns, package, force=False, update=False):
 
     return installed[-1]
 
-def install_from_uri(ns, uri, force=False, update=False):
+def install_package(ns, package, force=False, update=False, listener=None):
     """
-    Install package from *URI* on remote system.
+    Install package on system.
 
-    :param string uri: Identifier of *RPM* package available via http, https,
-        or ftp service.
+    :param package: Instance or instance name of ``LMI_SoftwareIdentity``
+        representing package to install.
+    :type package: :py:class:`lmi.shell.LMIInstance`
+        or :py:class:`lmi.shell.LMIInstanceName`
     :param boolean force: Whether the installation shall be done even if
         installing the same (reinstalling) or older version than already
         installed.
     :param boolean update: Whether this is an update. Update fails if
         package is not already installed on system.
+    :param listener: Optional started indication listener used to get
+        notified about job's progress (see :py:mod:`.jobs`).
+    :type listener: :py:class:`lmi.shell.LMIIndicationListener`
+    :returns: Software identity installed on remote system.
+        It's an instance ``LMI_SoftwareIdentity``.
+    :rtype: :py:class:`lmi.shell.LMIInstance`
+    """
+    if not isinstance(package, (LMIInstance, LMIInstanceName)):
+        raise TypeError("package must be an LMIInstance or LMIInstanceName")
+    job = _start_install_job(ns, package, force=force, update=update)
+    wait_for_job(ns, job, listener=listener)
+    return _finish_install_job(ns, package, job, update=update)
+
+def install_packages(ns, packages, force=False, update=False, listener=None):
+    """
+    Install or update several packages in one transaction. Jobs for all the
+    packages are submitted to provider before waiting on any of them. Thus
+    the provider can process them one after another without waiting for
+    the client to ask for the next one. Each package is submitted just once
+    even if it is listed multiple times.
+
+    :param list packages: Instances or instance names of
+        ``LMI_SoftwareIdentity`` representing packages to install.
+    :param boolean force: Whether the installation shall be done even if
+        installing the same (reinstalling) or older version than already
+        installed.
+    :param boolean update: Whether this is an update. Update fails if
+        package is not already installed on system.
+    :param listener: Optional started indication listener used to get
+        notified about jobs' progress (see :py:mod:`.jobs`).
+    :type listener: :py:class:`lmi.shell.LMIIndicationListener`
+    :returns: List of pairs ``(package, result)`` in the same order as
+        ``packages``. The ``result`` is either the value returned by
+        :py:func:`install_package` or an instance of
+        :py:exc:`~lmi.scripts.common.errors.LmiFailed` describing the
+        failure.
+    :rtype: list
+    """
+    for package in packages:
+        if not isinstance(package, (LMIInstance, LMIInstanceName)):
+            raise TypeError("packages must contain instances or instance"
+                    " names of LMI_SoftwareIdentity")
+    outcomes = {}       # (nevra, identity or error)
+    submitted = {}      # (job id, (nevra, package))
+    waiter = JobWaiter(ns, listener=listener)
+    try:
+        for package in packages:
+            nevra = get_package_nevra(package)
+            if nevra in outcomes:
+                continue
+            outcomes[nevra] = None
+            try:
+                job = _start_install_job(
+                        ns, package, force=force, update=update)
+            except LmiFailed as err:
+                outcomes[nevra] = err
+                continue
+            submitted[job.InstanceID] = (nevra, package)
+            waiter.add(job)
+        LOG().debug('Submitted %d installation jobs for %d packages.',
+                len(submitted), len(packages))
+
+        for job in waiter.wait_all():
+            nevra, package = submitted[job.InstanceID]
+            try:
+                outcomes[nevra] = _finish_install_job(
+                        ns, package, job, update=update)
+            except LmiFailed as err:
+                outcomes[nevra] = err
+    finally:
+        waiter.close()
+    return [(p, outcomes[get_package_nevra(p)]) for p in packages]
+
+def plan_install(ns, packages, force=False, update=False):
+    """
+    Find out, what would :py:func:`install_packages` do with given packages,
+    without modifying the system. Installed packages are enumerated just
+    once and versions are compared on client side. For an update, the newest
+    version is looked up once per package name and architecture, or with
+    a single listing of available packages for more than
+    :py:data:`PLAN_FIND_LIMIT` of them.
+
+    .. note::
+        Dependencies of packages are not resolved by provider until the
+        installation is run. Thus they are not part of the plan.
+
+    :param list packages: Instances or instance names of
+        ``LMI_SoftwareIdentity`` representing packages to install.
+    :param boolean force: Whether the installation shall be done even if
+        installing the same (reinstalling) or older version than already
+        installed.
+    :param boolean update: Whether this is an update. Then the given packages
+        are the installed ones and the newest available versions are looked
+        up.
+    :returns: List of quadruples ``(package, action, installed, target)``,
+        in the same order as ``packages``. ``action`` is one of ``PLAN_*``
+        constants. ``installed`` is a
+        :py:class:`~lmi.scripts.software.nevra.Nevra` of package being
+        replaced or ``None``. ``target`` is a
+        :py:class:`~lmi.scripts.software.nevra.Nevra` of package, that would
+        be installed, or ``None`` if there is no such package.
+    :rtype: list
+    """
+    installed_nevras = list_installed_nevras(ns)
+    installed_by_key = defaultdict(list)
+    for nevra in installed_nevras:
+        installed_by_key[nevra.key].append(nevra)
+    if update:
+        newest = _find_newest_available(ns,
+                set(Nevra.from_identity(p).key for p in packages),
+                set(str(n) for n in installed_nevras))
+
+    plan = []
+    for package in packages:
+        target = Nevra.from_identity(package)
+        installed = sorted(installed_by_key.get(target.key, ()))
+        current = installed[-1] if installed else None
+        if update:
+            target = newest.get(target.key)
+            if current is None or target is None or target <= current:
+                action = PLAN_NOTHING
+                target = None
+            else:
+                action = PLAN_UPGRADE
+        elif current is None:
+            action = PLAN_INSTALL
+        elif target in installed:
+            action = PLAN_REINSTALL if force else PLAN_NOTHING
+        elif target > current:
+            action = PLAN_UPGRADE
+        else:
+            # provider refuses to downgrade unless forced
+            action = PLAN_DOWNGRADE if force else PLAN_NOTHING
+        plan.append((package, action, current, target))
+    return plan
+
+def _find_newest_available(ns, keys, installed_nevras):
+    """
+    Find the newest not installed versions of packages.
+
+    :param set keys: Pairs ``(name, arch)`` of packages to look up.
+    :param set installed_nevras: Nevra strings of installed packages.
+    :returns: Dictionary with the newest
+        :py:class:`~lmi.scripts.software.nevra.Nevra` for each of ``keys``,
+        that has any.
+    :rtype: dictionary
+    """
+    newest = {}
+    if len(keys) > PLAN_FIND_LIMIT:
+        for identity in list_available_packages(ns,
+                installed_nevras=installed_nevras):
+            nevra = Nevra.from_identity(identity)
+            if nevra.key in keys:
+                newest[nevra.key] = nevra
+        return newest
+    for name, arch in keys:
+        found = [ Nevra.from_identity(i)
+                for i in find_package(ns, name=name, arch=arch,
+                    installed=False, installed_nevras=installed_nevras)]
+        if found:
+            newest[(name, arch)] = max(found)
+    return newest
+
+#: URI schemes accepted by :py:func:`install_from_uri`.
+URI_SCHEMES = ('http', 'https', 'ftp', 'file')
+
+def check_uri(uri):
+    """
+    Check, that the *URI* may identify an *RPM* package, that can be
+    installed.
+
+    :param string uri: *URI* to check.
+    :raises: :py:exc:`~lmi.scripts.common.errors.LmiFailed` if the *URI* is
+        not valid.
     """
     if not isinstance(uri, basestring):
         raise TypeError("uri must be a string")
+    parsed = urlparse.urlparse(uri)
+    if parsed.scheme not in URI_SCHEMES:
+        raise LmiFailed('Unsupported scheme of uri "%s", expected one of: %s.'
+                % (uri, ', '.join(URI_SCHEMES)))
+    if parsed.scheme != 'file' and not parsed.netloc:
+        raise LmiFailed('Missing host in uri "%s".' % uri)
+    if not parsed.path or parsed.path.endswith('/'):
+        raise LmiFailed('Missing package file name in uri "%s".' % uri)
+
+def _start_uri_install_job(ns, uri, force=False, update=False):
+    """
+    Submit installation of package from *URI* and return the job without
+    waiting for it.
+
+    :returns: Instance of ``LMI_SoftwareInstallationJob`` or ``None`` if the
+        installation finished immediately.
+    :rtype: :py:class:`lmi.shell.LMIInstance`
+    """
     options = [4 if not update else 5]  # Install (4) or Update (5)
     if force:
         options.append(3) # Force Installation
-    results = get_installation_service(ns).SyncInstallFromURI(
+    results = get_installation_service(ns).InstallFromURI(
             URI=uri,
             Target=get_computer_system(ns).path,
             InstallOptions=options)
-    if results.rval != 0:
-        msg = 'Failed to %s package from uri (rval=%d).' % (
-                'update' if update else 'install', results.rval)
+    if results.rval == 0:
+        return None
+    if results.rval != 4096:
+        msg = 'Failed to %s package from uri "%s" (rval=%d).' % (
+                'update' if update else 'install', uri, results.rval)
         if results.errorstr:
             msg += ': ' + results.errorstr
         raise LmiFailed(msg)
-    else:
-        LOG().info('Installed package from uri %s.', uri)
+    return results.rparams['Job'].to_instance()
+
+def _finish_uri_install_job(ns, uri, job, update=False):
+    """
+    Check the result of finished installation job started with
+    :py:func:`_start_uri_install_job`.
+    """
+    if job is not None and not LMIJob.lmi_is_job_completed(job):
+        msg = 'Failed to %s package from uri "%s".' % (
+                'update' if update else 'install', uri)
+        rval, oparms, _ = job.GetError()
+        if oparms:
+            msg += ': ' + oparms['Error'].Message
+        elif job.ErrorDescription:
+            msg += ': ' + job.ErrorDescription
+        raise LmiFailed(msg)
+    LOG().info('Installed package from uri %s.', uri)
+
+def install_from_uri(ns, uri, force=False, update=False, listener=None):
+    """
+    Install package from *URI* on remote system.
+
+    :param string uri: Identifier of *RPM* package available via http, https,
+        or ftp service.
+    :param boolean force: Whether the installation shall be done even if
+        installing the same (reinstalling) or older version than already
+        installed.
+    :param boolean update: Whether this is an update. Update fails if
+        package is not already installed on system.
+    :param listener: Optional started indication listener used to get
+        notified about job's progress (see :py:mod:`.jobs`).
+    :type listener: :py:class:`lmi.shell.LMIIndicationListener`
+    """
+    check_uri(uri)
+    job = _start_uri_install_job(ns, uri, force=force, update=update)
+    if job is not None:
+        wait_for_job(ns, job, listener=listener)
+    _finish_uri_install_job(ns, uri, job, update=update)
+
+def install_from_uris(ns, uris, force=False, update=False, listener=None):
+    """
+    Install packages from several *URIs*. All the *URIs* are checked before
+    anything is installed. Then installation jobs are submitted for all of
+    them at once, so the managed system can download the packages without
+    waiting for the client. Each *URI* is submitted just once even if it is
+    listed multiple times.
+
+    .. note::
+        Provider accepts just one *URI* per installation request. Thus each
+        package is installed by a separate job.
+
+    :param list uris: Identifiers of *RPM* packages available via http,
+        https, or ftp service.
+    :param boolean force: Whether the installation shall be done even if
+        installing the same (reinstalling) or older version than already
+        installed.
+    :param boolean update: Whether this is an update. Update fails if
+        package is not already installed on system.
+    :param listener: Optional started indication listener used to get
+        notified about jobs' progress (see :py:mod:`.jobs`).
+    :type listener: :py:class:`lmi.shell.LMIIndicationListener`
+    :raises: :py:exc:`~lmi.scripts.common.errors.LmiFailed` if any of
+        *URIs* is not valid.
+    :returns: List of pairs ``(uri, result)`` in the same order as ``uris``.
+        The ``result`` is ``None`` on success or an instance of
+        :py:exc:`~lmi.scripts.common.errors.LmiFailed` describing the
+        failure.
+    :rtype: list
+    """
+    invalid = []
+    for uri in uris:
+        try:
+            check_uri(uri)
+        except LmiFailed as err:
+            invalid.append(str(err))
+    if invalid:
+        raise LmiFailed('Invalid uris given:\n    ' + '\n    '.join(invalid))
+
+    outcomes = {}       # (uri, error)
+    submitted = {}      # (job id, uri)
+    waiter = JobWaiter(ns, listener=listener)
+    try:
+        for uri in uris:
+            if uri in outcomes:
+                continue
+            outcomes[uri] = None
+            try:
+                job = _start_uri_install_job(
+                        ns, uri, force=force, update=update)
+                if job is None:
+                    _finish_uri_install_job(ns, uri, job, update=update)
+                    continue
+            except LmiFailed as err:
+                outcomes[uri] = err
+                continue
+            submitted[job.InstanceID] = uri
+            waiter.add(job)
+        LOG().debug('Submitted %d installation jobs for %d uris.',
+                len(submitted), len(uris))
+
+        for job in waiter.wait_all():
+            uri = submitted[job.InstanceID]
+            try:
+                _finish_uri_install_job(ns, uri, job, update=update)
+            except LmiFailed as err:
+                outcomes[uri] = err
+    finally:
+        waiter.close()
+    return [(uri, outcomes[uri]) for uri in uris]
 
 def remove_package(ns, package):
     """
@@ -666,6 +1182,50 @@ def remove_package(ns, package):
         assoc.to_instance().delete()
         LOG().info('Removed package %s.', nevra)
 
+def remove_packages(ns, packages):
+    """
+    Uninstall several packages. Installed software associations of all the
+    packages are looked up with a single query instead of one query per
+    package.
+
+    :param list packages: Instances or instance names of
+        ``LMI_SoftwareIdentity`` representing packages to remove.
+    :returns: List of pairs ``(package, error)`` in the same order as
+        ``packages``. The ``error`` is ``None`` for successfuly removed
+        package or an instance of
+        :py:exc:`~lmi.scripts.common.errors.LmiFailed`.
+    :rtype: list
+    """
+    for package in packages:
+        if not isinstance(package, (LMIInstance, LMIInstanceName)):
+            raise TypeError("packages must contain instances or instance"
+                    " names of LMI_SoftwareIdentity")
+    installed_assocs = defaultdict(list)
+    for assoc in get_computer_system(ns).reference_names(
+            Role="System",
+            ResultClass="LMI_InstalledSoftwareIdentity"):
+        installed_assocs[get_package_nevra(assoc.InstalledSoftware)].append(
+                assoc)
+
+    outcomes = {}
+    for package in packages:
+        nevra = get_package_nevra(package)
+        if nevra in outcomes:
+            continue
+        if not installed_assocs.get(nevra):
+            outcomes[nevra] = LmiFailed(
+                    'Given package "%s" is not installed!' % nevra)
+            continue
+        try:
+            for assoc in installed_assocs.pop(nevra):
+                assoc.to_instance().delete()
+            LOG().info('Removed package %s.', nevra)
+            outcomes[nevra] = None
+        except wbem.CIMError as err:
+            outcomes[nevra] = LmiFailed(
+                    'Failed to remove package "%s": %s' % (nevra, err))
+    return [(p, outcomes[get_package_nevra(p)]) for p in packages]
+
 def render_failed_flags(failed_flags):
     """
     Make one liner string representing failed flags list of file that did not
@@ -697,36 +1257,38 @@ def render_failed_flags(failed_flags):
             result.append('.')
     return ''.join(result)
 
-def verify_package(ns, package):
+def _start_verify_job(ns, package):
     """
-    Returns the instances of ``LMI_SoftwareIdentityFileCheck`` representing
-    files, that did not pass the verification.
+    Submit verification of installed package and return the job without
+    waiting for it.
 
-    :param package: Instance or instance name of
-        ``LMI_SoftwareIdentity`` representing package to verify.
-    :type package: :py:class:`lmi.shell.LMIInstance`
-        or :py:class:`lmi.shell.LMIInstanceName`
-    :returns: List of instances of ``LMI_SoftwareIdentityFileCheck``
-        with non-empty ``FailedFlags`` property.
-    :rtype: list
+    :returns: Instance of ``LMI_SoftwareVerificationJob``.
+    :rtype: :py:class:`lmi.shell.LMIInstance`
     """
-    if not isinstance(package, (LMIInstance, LMIInstanceName)):
-        raise TypeError("package must be an LMIInstance or LMIInstanceName")
     # we can not use synchronous invocation because the reference to a job is
     # needed - for enumerating of affected software identities
     results = get_installation_service(ns).VerifyInstalledIdentity(
             Source=package.path
                 if isinstance(package, LMIInstance) else package,
             Target=get_computer_system(ns).path)
-    nevra = get_package_nevra(package)
     if results.rval != 4096:
-        msg = 'Failed to verify package "%s (rval=%d)".' % (nevra, results.rval)
+        msg = 'Failed to verify package "%s (rval=%d)".' % (
+                get_package_nevra(package), results.rval)
         if results.errorstr:
             msg += ': ' + results.errorstr
         raise LmiFailed(msg)
 
-    job = results.rparams['Job'].to_instance()
-    _wait_for_job_finished(job)
+    return results.rparams['Job'].to_instance()
+
+def _finish_verify_job(ns, package, job):
+    """
+    Check the result of finished verification job.
+
+    :returns: List of instances of ``LMI_SoftwareIdentityFileCheck``
+        with non-empty ``FailedFlags`` property.
+    :rtype: list
+    """
+    nevra = get_package_nevra(package)
     if not LMIJob.lmi_is_job_completed(job):
         msg = 'Failed to verify package "%s".' % nevra
         rval, oparms, _ = job.GetError()
@@ -744,3 +1306,81 @@ def verify_package(ns, package):
     LOG().debug('Verified package "%s" with %d failures.', nevra, len(failed))
 
     return failed
+
+def verify_package(ns, package, listener=None):
+    """
+    Returns the instances of ``LMI_SoftwareIdentityFileCheck`` representing
+    files, that did not pass the verification.
+
+    :param package: Instance or instance name of
+        ``LMI_SoftwareIdentity`` representing package to verify.
+    :type package: :py:class:`lmi.shell.LMIInstance`
+        or :py:class:`lmi.shell.LMIInstanceName`
+    :param listener: Optional started indication listener used to get
+        notified about job's progress (see :py:mod:`.jobs`).
+    :type listener: :py:class:`lmi.shell.LMIIndicationListener`
+    :returns: List of instances of ``LMI_SoftwareIdentityFileCheck``
+        with non-empty ``FailedFlags`` property.
+    :rtype: list
+    """
+    if not isinstance(package, (LMIInstance, LMIInstanceName)):
+        raise TypeError("package must be an LMIInstance or LMIInstanceName")
+    job = _start_verify_job(ns, package)
+    wait_for_job(ns, job, listener=listener)
+    return _finish_verify_job(ns, package, job)
+
+def verify_packages(ns, packages, max_jobs=DEFAULT_VERIFY_JOBS,
+        listener=None):
+    """
+    Verify several installed packages with a bounded number of verification
+    jobs running at once. Results are yielded as soon as particular jobs
+    finish, not in the order of ``packages``.
+
+    :param packages: Instances or instance names of ``LMI_SoftwareIdentity``
+        representing packages to verify.
+    :type packages: iterable
+    :param integer max_jobs: Maximum number of verification jobs submitted
+        to provider at any time.
+    :param listener: Optional started indication listener used to get
+        notified about jobs' progress (see :py:mod:`.jobs`).
+    :type listener: :py:class:`lmi.shell.LMIIndicationListener`
+    :returns: Pairs ``(package, result)``, where ``result`` is either a list
+        of failed file checks (see :py:func:`verify_package`) or an instance
+        of :py:exc:`~lmi.scripts.common.errors.LmiFailed` describing the
+        failure.
+    :rtype: generator over tuples
+    """
+    if not isinstance(max_jobs, (int, long)) or max_jobs < 1:
+        raise ValueError("max_jobs must be a positive integer")
+    packages = iter(packages)
+    running = {}        # (job id, package)
+    exhausted = False
+    waiter = JobWaiter(ns, listener=listener)
+    try:
+        while running or not exhausted:
+            while not exhausted and len(running) < max_jobs:
+                try:
+                    package = next(packages)
+                except StopIteration:
+                    exhausted = True
+                    break
+                if not isinstance(package, (LMIInstance, LMIInstanceName)):
+                    raise TypeError("packages must contain instances or"
+                            " instance names of LMI_SoftwareIdentity")
+                try:
+                    job = _start_verify_job(ns, package)
+                except LmiFailed as err:
+                    yield (package, err)
+                    continue
+                running[job.InstanceID] = package
+                waiter.add(job)
+
+            for job in waiter.wait_any():
+                package = running.pop(job.InstanceID)
+                try:
+                    result = _finish_verify_job(ns, package, job)
+                except LmiFailed as err:
+                    result = err
+                yield (package, result)
+    finally:
+        waiter.close()
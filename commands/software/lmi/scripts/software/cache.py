@@ -0,0 +1,148 @@
+# Copyright (C) 2014 Red Hat, Inc. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+#
+# Authors: Michal Minar <miminar@redhat.com>
+#
+"""
+Client side cache of data obtained from hosts.
+
+Cached items are stored as JSON files in ``$XDG_CACHE_HOME/openlmi-scripts/
+software`` directory (``~/.cache`` is used, if ``XDG_CACHE_HOME`` is not
+set). Each item is identified by a key made out of host's URI and any
+number of additional strings (see :py:func:`make_key`). Failures to read
+or write the cache are never fatal; they are just logged.
+"""
+
+import errno
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from lmi.scripts.common import get_logger
+
+LOG = get_logger(__name__)
+
+def get_cache_dir():
+    """
+    :returns: Path to directory with cached items. It may not exist yet.
+    :rtype: string
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or \
+            os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'openlmi-scripts', 'software')
+
+def make_key(ns, *parts):
+    """
+    Make a key identifying cached item of particular host.
+
+    :param ns: Namespace object of connection to host.
+    :param parts: Strings further identifying cached item. First of them
+        shall denote the kind of cached data.
+    :returns: String usable as a file name.
+    :rtype: string
+    """
+    digest = hashlib.sha1(ns.connection.uri.encode('utf-8'))
+    for part in parts[1:]:
+        digest.update('\0' + unicode(part).encode('utf-8'))
+    return '%s-%s' % (parts[0] if parts else 'item', digest.hexdigest())
+
+def _get_path(key):
+    """ :returns: Path to file of cached item. """
+    return os.path.join(get_cache_dir(), key + '.json')
+
+def load(key, max_age=None):
+    """
+    Read cached item.
+
+    :param string key: Key of the item (see :py:func:`make_key`).
+    :param float max_age: Maximum age of the item in seconds. Older items
+        are ignored.
+    :returns: Cached data or ``None`` if the item is missing or too old.
+    """
+    path = _get_path(key)
+    if max_age is not None:
+        timestamp = get_timestamp(key)
+        if timestamp is not None and time.time() - timestamp > max_age:
+            LOG().debug('Cached item "%s" is too old.', key)
+            return None
+    try:
+        with open(path, 'r') as cache_file:
+            item = json.load(cache_file)
+    except IOError as err:
+        if err.errno != errno.ENOENT:
+            LOG().warn('Failed to read cache file "%s": %s', path, err)
+        return None
+    except ValueError as err:
+        LOG().warn('Ignoring corrupted cache file "%s": %s', path, err)
+        return None
+    return item['data']
+
+def get_timestamp(key):
+    """
+    :param string key: Key of the item (see :py:func:`make_key`).
+    :returns: Time, when the item was stored, in seconds since epoch or
+        ``None``, if it is not cached. This is the modification time of its
+        file, so the item does not need to be read.
+    :rtype: float
+    """
+    try:
+        return os.path.getmtime(_get_path(key))
+    except OSError:
+        return None
+
+def store(key, data):
+    """
+    Write item to cache. The file is replaced atomically, so concurrent
+    readers never see partially written data.
+
+    :param string key: Key of the item (see :py:func:`make_key`).
+    :param data: Any data serializable to JSON.
+    """
+    cache_dir = get_cache_dir()
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0700)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix='.' + key)
+        with os.fdopen(fd, 'w') as cache_file:
+            json.dump({'data' : data}, cache_file)
+        os.rename(tmp_path, _get_path(key))
+    except (IOError, OSError) as err:
+        LOG().warn('Failed to write cache item "%s": %s', key, err)
+
+def remove(key):
+    """
+    Remove item from cache. Missing item is silently ignored.
+
+    :param string key: Key of the item (see :py:func:`make_key`).
+    """
+    try:
+        os.remove(_get_path(key))
+    except OSError as err:
+        if err.errno != errno.ENOENT:
+            LOG().warn('Failed to remove cache item "%s": %s', key, err)
@@ -32,28 +32,37 @@ System software management.
 
 Usage:
     %(cmd)s search [(--repoid <repository>)] [--allow-duplicates]
-        [(--installed | --available)] <package>...
+        [(--installed | --available)] [--refresh-index] <package>...
     %(cmd)s list (--help | <what> [<args>...])
     %(cmd)s show (--help | <what> [<args>...])
-    %(cmd)s install [--force] [--repoid <repository>] <package> ...
-    %(cmd)s install --uri <uri>
-    %(cmd)s update [--force] [--repoid <repository>] <package> ...
+    %(cmd)s install [--force] [--dry-run] [--repoid <repository>] <package> ...
+    %(cmd)s install [--force] (--uri <uri>) ...
+    %(cmd)s update [--force] [--dry-run] [--repoid <repository>] <package> ...
     %(cmd)s remove <package> ...
-    %(cmd)s verify <package> ...
-    %(cmd)s enable <repository> ...
-    %(cmd)s disable <repository> ...
+    %(cmd)s verify [--jobs <count>] [--cache] (--all-installed | <package> ...)
+    %(cmd)s diff [--save] <manifest>
+    %(cmd)s inventory [--changes]
+    %(cmd)s enable [--parallel <count>] <repository> ...
+    %(cmd)s disable [--parallel <count>] <repository> ...
 
 Commands:
     search      Search packages. Produces a list of packages matching given
                 package specifications (see below). All packages with name with
                 given pattern as a substring will match. Allows filtering by
                 repository. By default only newest packages will be printed.
+                If a local snapshot of package metadata is available (see
+                --refresh-index), it is searched instead of asking the
+                provider. Then packages with the pattern in their summary
+                match as well. Results are ordered by name match: exact,
+                prefix, substring and summary match. Snapshots older than
+                one day are not used.
     list        List various information about packages, repositories or
                 files.
     show        Show detailed informations about package or repository.
     install     Install packages on system. See below, how package can be
                 specified. Installation from URI is also supported, it must
-                be prefixed with --uri option.
+                be prefixed with --uri option. Several URIs may be given.
+                All of them are checked first, then installed at once.
     update      Update package.
     remove      Remove installed package.
     verify      Verify package. Files that did not pass the verification are
@@ -70,8 +79,28 @@ Commands:
                    * T mTime differs
                    * P caPabilities differ
 
-    enable      Enable one or more repositories.
-    disable     Disable one or more repositories.
+                Several packages are verified at once. Failures are printed
+                as soon as particular package is verified. A summary is
+                printed at the end when more than one package is verified.
+
+                With --cache, packages, that passed the verification before
+                and whose files have not changed their size nor modification
+                time since, are not verified again.
+
+    diff        Compare installed packages with a manifest file. Manifest
+                contains one package in nevra notation per line. It can be
+                created on a reference host with --save option. Packages
+                installed, but missing in manifest, are reported as added.
+                Packages listed in manifest, but not installed, are reported
+                as removed.
+    inventory   List installed packages with their install dates. Inventory
+                is kept on client side. Just the newly installed packages
+                are queried for install dates, so repeated runs are cheap.
+    enable      Enable one or more repositories. Repository may be given
+                as a shell-style pattern (e.g. 'epel*'), all matching
+                repositories will be enabled.
+    disable     Disable one or more repositories. Patterns are accepted
+                as well.
 
 Options:
     --force        Force installation. This allows to install package already
@@ -82,8 +111,30 @@ Options:
                    searched for.
     --uri <uri>    Operate upon an rpm package available on remote system
                    through http or ftp service.
+    --dry-run      Just print, what would be installed, upgraded or
+                   downgraded, without modifying the system. Packages
+                   found are remembered for a few minutes, so the same
+                   command run without this option does not need to look
+                   them up again. Dependencies are not listed.
     --installed    Limit the query to installed packages only.
+    --refresh-index
+                   Make a new snapshot of package metadata before searching.
+                   Packages of repositories updated since the previous
+                   snapshot are listed again, which takes a while.
+    --all-installed
+                   Verify all installed packages.
+    --cache        Skip verification of packages, whose files have not
+                   changed since they passed the previous verification.
+    --jobs <count>
+                   Maximum number of verification jobs running at once
+                   [default: 4].
     --available    Limit the query just to not installed packages.
+    --save         Write installed packages to manifest file instead of
+                   comparing them.
+    --changes      List just packages installed, removed, upgraded or
+                   downgraded since the previous inventory.
+    --parallel <count>
+                   Change state of up to <count> repositories at once.
     --help         Get a detailed help for subcommand.
 
 Specifying <package>:
@@ -103,18 +154,28 @@ from lmi.scripts.common import command
 from lmi.scripts.common import errors
 from lmi.scripts.common import get_logger
 from lmi.scripts.common.formatter import command as fcmd
+from lmi.scripts.software import cache
+from lmi.scripts.software import inventory
+from lmi.scripts.software import manifest
+from lmi.scripts.software import search
+from lmi.scripts.software import verify_cache
 from lmi.scripts.software.cmd_list import Lister
 
 LOG = get_logger(__name__)
 
+#: Number of seconds, for which packages found during a dry run are reused
+#: by the following transaction.
+RESOLUTION_CACHE_TTL = 5*60
+
 class Search(command.LmiLister):
-    CONNECTION_TIMEOUT = 10*60   # timeout after 10 minutes
+    CONNECTION_TIMEOUT = 15*60   # timeout after 15 minutes
     ARG_ARRAY_SUFFIX = '_array'
 
     def execute(self, ns, package_array,
             _allow_duplicates=False,
             _installed=False,
             _available=False,
+            _refresh_index=False,
             _repoid=None):
         if _installed or _available:
             _installed = not _available
@@ -124,7 +185,22 @@ class Search(command.LmiLister):
             yield ('NEVRA', 'Installed', 'Summary')
         else:
             yield ('NEVRA', 'Summary')
+        index = None
+        if _repoid is None:
+            # snapshot does not know, which repository provides a package
+            index = search.get_search_index(ns, refresh=_refresh_index)
+        elif _refresh_index:
+            LOG().warn('Index is not used with --repoid option.')
         for pkg_spec in package_array:
+            if index is not None:
+                for nevra, summary, installed in index.search(pkg_spec,
+                        installed=_installed,
+                        allow_duplicates=_allow_duplicates):
+                    if _installed is None:
+                        yield (nevra, 'Yes' if installed else 'No', summary)
+                    else:
+                        yield (nevra, summary)
+                continue
             for pkg in software.find_package(ns,
                     allow_duplicates=_allow_duplicates,
                     exact_match=False,
@@ -208,28 +284,29 @@ class Show(command.LmiCommandMultiplexer):
     COMMANDS = { 'pkg' : PkgInfo, 'repo' : RepoInfo }
     OWN_USAGE = True
 
-def for_each_package_specs(ns, pkg_specs, info, func,
-        repoid=None, just_on_installed=True):
+def resolve_package_specs(ns, pkg_specs, repoid=None, just_on_installed=True):
     """
-    Iterate over package specification strings, find them on remote host,
-    make them into ``LMI_SoftwareIdentity``, and pass them to given function.
+    Find software identities for all given package specification strings
+    before any operation is done with them.
 
     :param list pkg_specs: Package specification strings.
-    :param string info: What is done with package. This is used in log messages.
-    :param callable func: Any callable taking instance of
-        ``LMI_SoftwareIdentity`` as the first and only argument.
     :param string repoid: Optional repository id used in a search
         for corresponding software identity.
     :param boolean just_on_installed: Skip uninstalled software identities
         found.
-    :returns: Pair with list containing a subset of ``pkg_specs`` with items,
-        that were processed successfuly and a list of errors for other packages.
+    :returns: Pair with list of pairs ``(pkg_spec, identity)`` for each
+        specification, that was found, and a list of errors for the rest.
     :rtype: tuple
     """
-    done_on = []
+    resolved = []
     failed = []
+    if just_on_installed and repoid is None:
+        # one enumeration of installed packages for all the specifications
+        found = software.find_installed_packages(ns, pkg_specs)
     for pkg_spec in pkg_specs:
-        if just_on_installed:
+        if just_on_installed and repoid is None:
+            identities = found[pkg_spec]
+        elif just_on_installed:
             identities = [
                         i.to_instance()
                     for i in software.find_package(ns,
@@ -253,85 +330,208 @@ def for_each_package_specs(ns, pkg_specs, info, func,
                     pkg_spec,
                     ', '.join(software.get_package_nevra(i)
                         for i in identities))
-        try:
-            func(identities[-1])
+        resolved.append((pkg_spec, identities[-1]))
+    return resolved, failed
+
+def get_resolution_cache_key(ns, transaction_kind, pkg_specs, repoid=None):
+    """
+    :param string transaction_kind: Either ``'install'`` or ``'update'``.
+    :returns: Key of cached result of :py:func:`resolve_package_specs` for
+        particular host, transaction and package specifications.
+    :rtype: string
+    """
+    return cache.make_key(ns, 'resolved', transaction_kind, repoid or '',
+            *sorted(set(pkg_specs)))
+
+def load_resolved_package_specs(ns, cache_key):
+    """
+    Get and drop the result of :py:func:`resolve_package_specs` cached by
+    :py:func:`plan_package_transaction`.
+
+    :returns: The same pair as :py:func:`resolve_package_specs` with
+        instance names of software identities or ``None`` if nothing is
+        cached.
+    :rtype: tuple
+    """
+    data = cache.load(cache_key, max_age=RESOLUTION_CACHE_TTL)
+    if data is None:
+        return None
+    # the system is going to change, do not use the result again
+    cache.remove(cache_key)
+    LOG().debug('Using packages found during previous dry run.')
+    resolved = [ (pkg_spec, ns.LMI_SoftwareIdentity.new_instance_name({
+                    'InstanceID' : 'LMI:LMI_SoftwareIdentity:' + nevra}))
+               for pkg_spec, nevra in data['resolved']]
+    return resolved, data['failed']
+
+def plan_package_transaction(ns, pkg_specs, repoid=None,
+        just_on_installed=True, force=False, update=False, cache_key=None):
+    """
+    Resolve all package specification strings and find out, what would the
+    transaction do with them. The resolution is cached under ``cache_key``
+    for the following transaction.
+
+    :returns: Pair with the list of ``(pkg_spec, action, installed, target)``
+        quadruples (see :py:func:`lmi.scripts.software.plan_install`) and
+        a list of errors for packages, that could not be found.
+    :rtype: tuple
+    """
+    resolved, failed = resolve_package_specs(ns, pkg_specs,
+            repoid=repoid, just_on_installed=just_on_installed)
+    if cache_key is not None:
+        cache.store(cache_key, {
+            'resolved' : [ (pkg_spec, software.get_package_nevra(identity))
+                         for pkg_spec, identity in resolved],
+            'failed'   : [str(err) for err in failed]})
+    plan = software.plan_install(ns, [i for _, i in resolved],
+            force=force, update=update)
+    return ( [ (pkg_spec, action, installed, target)
+             for (pkg_spec, _), (_, action, installed, target)
+             in zip(resolved, plan)]
+           , failed)
+
+def render_plan(plan):
+    """
+    Yield rows for the result of :py:func:`plan_package_transaction`.
+    """
+    for pkg_spec, action, installed, target in plan:
+        yield (action, pkg_spec, installed or '', target or '')
+
+def check_package_transaction(pkg_specs, done_on, failed, verb):
+    """
+    Raise an error unless all the packages were processed.
+
+    :param list pkg_specs: Packages given on command line.
+    :param list done_on: Subset of ``pkg_specs`` processed successfuly.
+    :param list failed: Errors for the other packages.
+    :param string verb: Name of transaction used in error message.
+    """
+    if pkg_specs != done_on:
+        if len(pkg_specs) == 1 and failed:
+            raise errors.LmiFailed(str(failed[0]))
+        raise errors.LmiFailed('Failed to %s packages: %s' % (verb,
+                ", ".join(set(pkg_specs) - set(done_on))))
+
+def run_package_transaction(ns, pkg_specs, transaction,
+        repoid=None, just_on_installed=True, cache_key=None):
+    """
+    Resolve all package specification strings at first and then pass all
+    the found software identities at once to a transaction function.
+
+    :param list pkg_specs: Package specification strings.
+    :param callable transaction: Callable taking a list of instances of
+        ``LMI_SoftwareIdentity`` and returning a list of pairs
+        ``(identity, result)``, where result is an instance of
+        :py:exc:`~lmi.scripts.common.errors.LmiFailed` for packages, that
+        could not be processed.
+    :param string repoid: Optional repository id used in a search
+        for corresponding software identity.
+    :param boolean just_on_installed: Skip uninstalled software identities
+        found.
+    :param string cache_key: Key of resolution cached by previous dry run
+        (see :py:func:`get_resolution_cache_key`). If given and the
+        resolution is still cached, packages are not searched for again.
+    :returns: Pair with list containing a subset of ``pkg_specs`` with items,
+        that were processed successfuly and a list of errors for other packages.
+    :rtype: tuple
+    """
+    done_on = []
+    cached = None
+    if cache_key is not None:
+        cached = load_resolved_package_specs(ns, cache_key)
+    if cached is not None:
+        resolved, failed = cached
+    else:
+        resolved, failed = resolve_package_specs(ns, pkg_specs,
+                repoid=repoid, just_on_installed=just_on_installed)
+    results = transaction([identity for _, identity in resolved])
+    for (pkg_spec, _), (_, result) in zip(resolved, results):
+        if isinstance(result, errors.LmiFailed):
+            failed.append(result)
+        else:
             done_on.append(pkg_spec)
-        except errors.LmiFailed as err:
-            failed.append(err)
     return done_on, failed
 
-class Install(command.LmiCheckResult):
+class Install(command.LmiLister):
     CONNECTION_TIMEOUT = 4*60   # timeout after 4 minutes
     ARG_ARRAY_SUFFIX = '_array'
-
-    def check_result(self, options, result):
-        """
-        :param tuple result: A pair of (done, failed) where the former is a
-            subset of packages given on command line and the latter a list of
-            errors for the rest. For ``--uri`` option, the first item should
-            contain 1 argument equal to uri. Otherwise we expect the same list
-            as ``<package_array>``.
-        """
-        done_on, failed = result
-        if options['--uri']:
-            return [options['--uri']] == done_on
-        if options['<package_array>'] != done_on:
-            if len(options['<package_array>']) == 1:
-                return (False, failed[0])
-            return (False, ('Failed to install packages: %s' %
-                    ", ".join(set(options['<package_array>']) - set(done_on))))
-        return True
+    COLUMNS = ('Action', 'Package', 'Installed', 'Target')
 
     def execute(self, ns,
             package_array=None,
             _uri=None,
             _force=False,
+            _dry_run=False,
             _repoid=None):
-        if _uri is not None:
-            try:
-                software.install_from_uri(ns, _uri, force=_force)
-                return ([_uri], [])
-            except errors.LmiFailed as err:
-                LOG().warn('Failed to install "%s": %s', _uri, err)
-                return ([], [err])
-
+        """
+        Yields rows of transaction plan with ``--dry-run``. Otherwise
+        nothing is yielded and an error is raised for packages, that
+        could not be installed.
+        """
+        if _uri:
+            done_on = []
+            failed = []
+            for uri, result in software.install_from_uris(
+                    ns, _uri, force=_force):
+                if result is None:
+                    done_on.append(uri)
+                else:
+                    LOG().warn(str(result))
+                    failed.append(result)
+            check_package_transaction(_uri, done_on, failed, 'install')
+            return
+
+        cache_key = get_resolution_cache_key(
+                ns, 'install', package_array, _repoid)
+        if _dry_run:
+            plan, failed = plan_package_transaction(ns, package_array,
+                    repoid=_repoid, just_on_installed=False, force=_force,
+                    cache_key=cache_key)
+            for row in render_plan(plan):
+                yield row
+            done_on = [pkg_spec for pkg_spec, _, _, _ in plan]
         else:
-            return for_each_package_specs(ns, package_array, 'install',
-                    lambda identity: software.install_package(
-                        ns, identity, force=_force),
+            done_on, failed = run_package_transaction(ns, package_array,
+                    lambda identities: software.install_packages(
+                        ns, identities, force=_force),
                     repoid=_repoid,
-                    just_on_installed=False)
+                    just_on_installed=False,
+                    cache_key=cache_key)
+        check_package_transaction(package_array, done_on, failed, 'install')
 
-class Update(command.LmiCheckResult):
+class Update(command.LmiLister):
     CONNECTION_TIMEOUT = 4*60   # timeout after 4 minutes
     ARG_ARRAY_SUFFIX = '_array'
-
-    def check_result(self, options, result):
-        """
-        :param tuple result: A pair of (done, failed) where the former is a
-            subset of packages given on command line and the latter a list of
-            errors for the rest. For ``--uri`` option, the first item should
-            contain 1 argument equal to uri. Otherwise we expect the same list
-            as ``<package_array>``.
-        """
-        done_on, failed = result
-        if options['<package_array>'] != done_on:
-            if len(options['<package_array>']) == 1:
-                return (False, failed[0])
-            return (False, ('Failed to update packages: %s' %
-                    ", ".join(set(options['<package_array>']) - set(done_on))))
-        return True
+    COLUMNS = ('Action', 'Package', 'Installed', 'Target')
 
     def execute(self, ns,
             package_array=None,
             _force=False,
+            _dry_run=False,
             _repoid=None):
-        return for_each_package_specs(ns, package_array, 'update',
-                lambda identity: software.install_package(ns,
-                        identity,
-                        force=_force,
-                        update=True),
-                repoid=_repoid)
+        """
+        Yields rows of transaction plan with ``--dry-run``. Otherwise
+        nothing is yielded and an error is raised for packages, that
+        could not be updated.
+        """
+        cache_key = get_resolution_cache_key(
+                ns, 'update', package_array, _repoid)
+        if _dry_run:
+            plan, failed = plan_package_transaction(ns, package_array,
+                    repoid=_repoid, force=_force, update=True,
+                    cache_key=cache_key)
+            for row in render_plan(plan):
+                yield row
+            done_on = [pkg_spec for pkg_spec, _, _, _ in plan]
+        else:
+            done_on, failed = run_package_transaction(ns, package_array,
+                    lambda identities: software.install_packages(ns,
+                            identities,
+                            force=_force,
+                            update=True),
+                    repoid=_repoid,
+                    cache_key=cache_key)
+        check_package_transaction(package_array, done_on, failed, 'update')
 
 class Remove(command.LmiCheckResult):
     ARG_ARRAY_SUFFIX = '_array'
@@ -357,32 +557,110 @@ class Remove(command.LmiCheckResult):
         :rtype: (``list``) Packages from ``package_array``, that were
             successfuly removed.
         """
-        return for_each_package_specs(ns, package_array, 'remove',
-                lambda identity: software.remove_package(ns, identity))
+        return run_package_transaction(ns, package_array,
+                lambda identities: software.remove_packages(ns, identities))
 
 class Verify(command.LmiLister):
     CONNECTION_TIMEOUT = 4*60   # timeout after 4 minutes
     ARG_ARRAY_SUFFIX = '_array'
     COLUMNS = []
 
-    def execute(self, ns, package_array):
-        identity_checks = []
-        def _verify_identity(identity):
-            failed_checks = list(software.verify_package(ns, identity))
-            identity_checks.append((identity, failed_checks))
-
-        for_each_package_specs(ns, package_array, 'verify', _verify_identity)
-        for identity, failed_checks in identity_checks:
-            if len(failed_checks):
-                yield fcmd.NewTableCommand(title=identity.ElementName)
-                for file_check in failed_checks:
+    def verify_options(self, options):
+        try:
+            if int(options['--jobs']) < 1:
+                raise ValueError(options['--jobs'])
+        except ValueError:
+            raise errors.LmiInvalidOptions(
+                    '--jobs must be a positive integer, not "%s".' %
+                    options['--jobs'])
+
+    def execute(self, ns, package_array=None,
+            _all_installed=False,
+            _cache=False,
+            _jobs=None):
+        if _all_installed:
+            identities = list(software.list_installed_packages(ns))
+            unresolved = []
+        else:
+            resolved, unresolved = resolve_package_specs(ns, package_array)
+            identities = [identity for _, identity in resolved]
+
+        passed = 0
+        failed = 0
+        cached = 0
+        errs = len(unresolved)
+        max_jobs = int(_jobs or software.DEFAULT_VERIFY_JOBS)
+        if _cache:
+            results = verify_cache.verify_packages(ns, identities,
+                    max_jobs=max_jobs)
+        else:
+            results = (   (identity, result, False)
+                      for identity, result in software.verify_packages(
+                          ns, identities, max_jobs=max_jobs))
+        for identity, result, from_cache in results:
+            nevra = software.get_package_nevra(identity)
+            if from_cache:
+                cached += 1
+                LOG().debug('Package "%s" is clean according to cache.', nevra)
+            elif isinstance(result, errors.LmiFailed):
+                LOG().warn(str(result))
+                errs += 1
+            elif len(result):
+                failed += 1
+                yield fcmd.NewTableCommand(title=nevra)
+                for file_check in result:
                     yield ( software.render_failed_flags(file_check.FailedFlags)
                           , file_check.Name)
-            elif self.app.config.verbose:
-                yield fcmd.NewTableCommand(title=identity.ElementName)
-                yield ('', 'passed')
             else:
-                LOG().debug('Package "%s" passed.', identity.ElementName)
+                passed += 1
+                if self.app.config.verbose:
+                    yield fcmd.NewTableCommand(title=nevra)
+                    yield ('', 'passed')
+                else:
+                    LOG().debug('Package "%s" passed.', nevra)
+
+        if passed + failed + cached + errs > 1:
+            yield fcmd.NewTableCommand(title='Summary')
+            yield ('Verified', passed + failed)
+            yield ('Passed', passed)
+            yield ('Failed', failed)
+            if _cache:
+                yield ('Cached clean', cached)
+            yield ('Errors', errs)
+
+class Diff(command.LmiLister):
+    CONNECTION_TIMEOUT = 4*60   # timeout after 4 minutes
+    COLUMNS = ('Change', 'Manifest', 'Installed')
+
+    def execute(self, ns, manifest_file, _save=False):
+        installed = software.list_installed_nevras(ns)
+        if _save:
+            manifest.save_manifest(manifest_file, installed)
+            LOG().info('Saved %d packages to "%s".',
+                    len(installed), manifest_file)
+            return
+        for change, old, new in manifest.diff_nevras(
+                manifest.load_manifest(manifest_file), installed):
+            yield (change, old or '', new or '')
+
+    def transform_options(self, options):
+        options['manifest_file'] = options.pop('<manifest>')
+
+class Inventory(command.LmiLister):
+    CONNECTION_TIMEOUT = 4*60   # timeout after 4 minutes
+
+    def execute(self, ns, _changes=False):
+        old, new = inventory.refresh_inventory(ns)
+        if not _changes:
+            yield ('NEVRA', 'Install Date')
+            for nevra in sorted(new):
+                yield (str(nevra), new[nevra] or '')
+            return
+        yield ('Change', 'Previous', 'Current', 'Install Date')
+        for change, previous, current in manifest.diff_nevras(
+                set(old), set(new)):
+            yield ( change, previous or '', current or ''
+                  , new[current] or '' if current is not None else '')
 
 class ChangeEnabledState(command.LmiCheckResult):
     """
@@ -398,23 +676,49 @@ class ChangeEnabledState(command.LmiCheckResult):
         """ Whether to enable or disable repository. """
         return True
 
+    def verify_options(self, options):
+        if options['--parallel'] is not None:
+            try:
+                if int(options['--parallel']) < 1:
+                    raise ValueError(options['--parallel'])
+            except ValueError:
+                raise errors.LmiInvalidOptions(
+                        '--parallel must be a positive integer.')
+
     def check_result(self, options, result):
+        """
+        :param list result: Subset of repositories given on command line,
+            that were successfuly modified. Patterns are listed only if all
+            the matching repositories were modified.
+        """
         if options['<repository_array>'] != result:
             return (False, ('Failed to %s repositories: %s' % (
                 'enable' if self.enable else 'disable',
                 ", ".join(set(options['<repository_array>']) - set(result)))))
         return True
 
-    def execute(self, ns, repository_array):
-        modified = []
-        for repoid in repository_array:
-            try:
-                repo = software.get_repository(ns, repoid)
-                software.set_repository_enabled(ns, repo, enable=self.enable)
-                modified.append(repoid)
-            except errors.LmiFailed as err:
-                LOG().warn(str(err))
-        return modified
+    def execute(self, ns, repository_array, _parallel=None):
+        found, unmatched = software.find_repositories(ns, repository_array)
+        for pattern in unmatched:
+            LOG().warn('No such repository "%s".', pattern)
+
+        # each repository is modified just once even if matched repeatedly
+        repos = {}
+        for _, matching in found:
+            for repo in matching:
+                repos.setdefault(repo.Name, repo)
+        results = dict((repo.Name, result)
+            for repo, result in software.set_repositories_enabled(ns,
+                sorted(repos.values(), key=lambda r: r.Name),
+                enable=self.enable,
+                max_threads=int(_parallel or 1)))
+        for result in results.values():
+            if isinstance(result, errors.LmiFailed):
+                LOG().warn(str(result))
+
+        return [ pattern for pattern, matching in found
+               if not any(isinstance(results[r.Name], errors.LmiFailed)
+                          for r in matching)]
 
 class DisableRepository(ChangeEnabledState):
 
@@ -424,14 +728,16 @@ class DisableRepository(ChangeEnabledState):
 
 Software = command.register_subcommands(
         'Software', __doc__,
-        { 'list'    : Lister
-        , 'search'  : Search
-        , 'show'    : Show
-        , 'install' : Install
-        , 'update'  : Update
-        , 'remove'  : Remove
-        , 'verify'  : Verify
-        , 'enable'  : ChangeEnabledState
-        , 'disable' : DisableRepository
+        { 'list'      : Lister
+        , 'search'    : Search
+        , 'show'      : Show
+        , 'install'   : Install
+        , 'update'    : Update
+        , 'remove'    : Remove
+        , 'verify'    : Verify
+        , 'diff'      : Diff
+        , 'inventory' : Inventory
+        , 'enable'    : ChangeEnabledState
+        , 'disable'   : DisableRepository
         }
     )
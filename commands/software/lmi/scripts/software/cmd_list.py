@@ -34,8 +34,8 @@ Usage:
     %(cmd)s all [--allow-duplicates]
     %(cmd)s installed
     %(cmd)s available [--repoid <repository>] [--allow-duplicates]
-    %(cmd)s repos [--disabled | --all]
-    %(cmd)s files [-t <file_type>] <package>
+    %(cmd)s repos [--disabled | --all] [--stats]
+    %(cmd)s files [-t <file_type>] [--unsorted] <package>
 
 Commands:
     all        - List installed and available packages. Only nevra strings
@@ -43,6 +43,8 @@ Commands:
     installed  - List installed packages.
     available  - List available packages.
     repos      - List repositories. Only enabled ones are listed by default.
+                 With --stats, number of available packages and age of
+                 repository metadata are shown as well.
     files      - List files belonging to a package.
 
 Options:
@@ -51,9 +53,14 @@ Options:
     --repoid <repository>  List just packages available in given <repository>.
     --all                  List all repositories.
     --disabled             List only disabled repositories.
+    --stats                Show statistics of repositories.
     -t --type (file | directory | device | symlink | fifo)
                            List only particular file type.
+    --unsorted             Print files in the order given by provider. They
+                           are printed as soon as they are received.
 """
+from datetime import datetime
+
 from lmi.scripts import software
 from lmi.scripts.common import command
 from lmi.scripts.common import errors
@@ -61,6 +68,25 @@ from lmi.scripts.common import get_logger
 
 LOG = get_logger(__name__)
 
+def _render_age(timestamp):
+    """
+    :param timestamp: Point in time in the past or ``None``.
+    :type timestamp: :py:class:`datetime.datetime`
+    :returns: Human readable time elapsed since ``timestamp``.
+    :rtype: string
+    """
+    if timestamp is None:
+        return ''
+    age = datetime.now(timestamp.tzinfo) - timestamp
+    if age.days < 0:
+        # clocks of hosts are not synchronized
+        return '0m ago'
+    if age.days > 0:
+        return '%dd %dh ago' % (age.days, age.seconds // 3600)
+    if age.seconds >= 3600:
+        return '%dh %dm ago' % (age.seconds // 3600, age.seconds % 3600 // 60)
+    return '%dm ago' % (age.seconds // 60)
+
 class AllLister(command.LmiLister):
     CONNECTION_TIMEOUT = 15*60  # timeout after 15 minutes
     COLUMNS = []
@@ -96,18 +122,26 @@ class RepoLister(command.LmiInstanceLister):
     CONNECTION_TIMEOUT = 4*60  # timeout after 4 minutes
     DYNAMIC_PROPERTIES = True
 
-    def execute(self, ns, _all, _disabled):
+    def execute(self, ns, _all, _disabled, _stats=False):
         if _all:
-            properties = (
+            properties = [
                     ('Repo id', 'Name'),
                     ('Name', 'Caption'),
-                    ('Enabled', lambda i: i.EnabledState == 2))
+                    ('Enabled', lambda i: i.EnabledState == 2)]
             enabled = None
         else:
-            properties = (
+            properties = [
                     ('Repo id', 'Name'),
-                    ('Name', 'Caption'))
+                    ('Name', 'Caption')]
             enabled = not _disabled
+        if _stats:
+            enabled_value = software.get_enabled_state_values(ns)[0]
+            counts = software.count_repository_packages(ns)
+            properties.extend([
+                ('Packages', lambda i: counts.get(i.Name, 0)
+                            if i.EnabledState == enabled_value else ''),
+                ('Updated', lambda i: _render_age(
+                            software.get_repository_last_update(i)))])
 
         return (properties, software.list_repositories(ns, enabled))
 
@@ -122,7 +156,7 @@ class FileLister(command.LmiInstanceLister):
             raise errors.LmiInvalidOptions(
                     'Invalid file type given, must be one of %s.' % file_types)
 
-    def execute(self, ns, package, _type=None):
+    def execute(self, ns, package, _type=None, _unsorted=False):
         properties = [
                 ('Name'),
                 ('Type', lambda i:
@@ -145,7 +179,11 @@ class FileLister(command.LmiInstanceLister):
                     ', '.join(p.ElementName for p in pkgs))
 
         return ( properties
-               , software.list_package_files(ns, pkgs[-1], file_type=_type))
+               , software.list_package_files(ns, pkgs[-1],
+                   file_type=_type,
+                   properties=[ 'Name', 'FileType', 'FileExists', 'FileSize'
+                              , 'FailedFlags'],
+                   sort=not _unsorted))
 
 class Lister(command.LmiCommandMultiplexer):
     COMMANDS = {
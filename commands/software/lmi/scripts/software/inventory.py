@@ -0,0 +1,158 @@
+# Copyright (C) 2014 Red Hat, Inc. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+#
+# Authors: Michal Minar <miminar@redhat.com>
+#
+"""
+Inventory of installed packages kept on client side.
+
+Inventory of each host is stored in the client side cache (see
+:py:mod:`~lmi.scripts.software.cache`). It records installed packages
+together with their install dates. When refreshed, installed packages are
+enumerated just by their instance names, which is enough to find out,
+which packages were installed or removed since the last refresh. Install
+dates are then fetched only for newly installed packages. On a host
+without changes, a refresh costs a single enumeration of instance names.
+When many packages were installed, their dates are taken from a single
+enumeration of installed packages limited to a few properties.
+"""
+
+from lmi.scripts.common import get_computer_system
+from lmi.scripts.common import get_logger
+from lmi.scripts import software
+from lmi.scripts.software import cache
+from lmi.scripts.software.nevra import Nevra, parse_nevra
+
+LOG = get_logger(__name__)
+
+#: Format of install dates stored in inventory.
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+#: Maximum number of newly installed packages, whose install dates are
+#: fetched one by one. Dates of more packages are fetched with a single
+#: enumeration.
+INVENTORY_FETCH_LIMIT = 20
+
+# properties of installed packages needed for their inventory
+INVENTORY_PROPERTIES = ['Name', 'Epoch', 'Version', 'Release',
+        'Architecture', 'InstallDate']
+
+def _format_date(install_date):
+    """
+    :returns: Formatted date or ``None``.
+    :rtype: string
+    """
+    if install_date is None:
+        return None
+    return install_date.datetime.strftime(DATE_FORMAT)
+
+def _get_install_date(ns, nevra):
+    """
+    Get the install date of installed package.
+
+    :param nevra: Installed package.
+    :type nevra: :py:class:`~lmi.scripts.software.nevra.Nevra`
+    :returns: Formatted date or ``None``, if the date is not known.
+    :rtype: string
+    """
+    iname = ns.LMI_SoftwareIdentity.new_instance_name({
+        'InstanceID' : 'LMI:LMI_SoftwareIdentity:' + str(nevra)})
+    try:
+        result = ns.connection.client.get_instance(iname.wrapped_object,
+                PropertyList=['InstallDate'])
+        if result.rval is None:
+            LOG().debug('Failed to get install date of "%s": %s',
+                    nevra, result.errorstr)
+            return None
+        install_date = result.rval['InstallDate']
+    except (AttributeError, TypeError):
+        # broker connection does not support fetching selected properties
+        install_date = iname.to_instance().InstallDate
+    return _format_date(install_date)
+
+def _get_install_dates(ns):
+    """
+    Get install dates of all installed packages with a single enumeration.
+
+    :returns: Dictionary with installed packages
+        (:py:class:`~lmi.scripts.software.nevra.Nevra`) as keys and formatted
+        dates (or ``None``) as values.
+    :rtype: dictionary
+    """
+    return dict((Nevra.from_identity(identity),
+                 _format_date(identity.InstallDate))
+            for identity in get_computer_system(ns).associators(
+                Role="System",
+                ResultRole="InstalledSoftware",
+                AssocClass='LMI_InstalledSoftwareIdentity',
+                ResultClass="LMI_SoftwareIdentity",
+                PropertyList=INVENTORY_PROPERTIES))
+
+def load_inventory(ns):
+    """
+    Get the inventory of host without contacting it.
+
+    :returns: Dictionary with installed packages
+        (:py:class:`~lmi.scripts.software.nevra.Nevra`) as keys and their
+        install dates (strings or ``None``) as values. ``None`` is returned
+        if there is no inventory of the host.
+    :rtype: dictionary
+    """
+    data = cache.load(cache.make_key(ns, 'inventory'))
+    if data is None:
+        return None
+    return dict((parse_nevra(nevra), install_date)
+            for nevra, install_date in data.iteritems())
+
+def refresh_inventory(ns):
+    """
+    Update the inventory of host and store it.
+
+    :returns: Pair of inventories ``(old, new)``. Inventory is a dictionary
+        described in :py:func:`load_inventory`. ``old`` is an empty
+        dictionary if the host has not been inventoried yet.
+    :rtype: tuple
+    """
+    old = load_inventory(ns) or {}
+    installed = software.list_installed_nevras(ns)
+    new = dict((nevra, old[nevra]) for nevra in installed if nevra in old)
+    added = installed.difference(old)
+    LOG().debug('Fetching install dates of %d packages.', len(added))
+    if len(added) > INVENTORY_FETCH_LIMIT:
+        dates = _get_install_dates(ns)
+        for nevra in added:
+            new[nevra] = dates.get(nevra)
+    else:
+        for nevra in added:
+            new[nevra] = _get_install_date(ns, nevra)
+    removed = len(old) - (len(installed) - len(added))
+    if added or removed:
+        cache.store(cache.make_key(ns, 'inventory'),
+                dict((str(nevra), date) for nevra, date in new.iteritems()))
+    LOG().info('Inventory of %s: %d packages, %d added, %d removed.',
+            ns.connection.uri, len(new), len(added), removed)
+    return old, new
@@ -0,0 +1,365 @@
+# Copyright (C) 2014 Red Hat, Inc. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+#
+# Authors: Michal Minar <miminar@redhat.com>
+#
+"""
+Waiting for asynchronous jobs of software provider.
+
+Jobs are polled with adaptive intervals. Each poll asks just for
+``JobState`` and ``PercentComplete`` properties; the whole job instance is
+refreshed only when its state changes. Progress reported by provider is
+used to estimate, when the job will finish, so short jobs are noticed
+quickly and long ones are not polled needlessly often.
+
+If an indication listener is given, the waiter subscribes to modification
+indications of software jobs and polls any job immediately after its
+indication arrives. Polling continues with the same schedule as a safety
+net for indications, that never arrive.
+
+Any number of jobs can be waited upon in a single polling loop with
+:py:class:`JobWaiter`.
+"""
+
+import socket
+import threading
+import time
+try:
+    import lmiwbem as wbem
+except ImportError:
+    import pywbem as wbem
+
+from lmi.shell import LMIInstance
+from lmi.shell import LMIJob
+from lmi.shell import LMIMethod
+from lmi.shell import LMIExceptions
+from lmi.scripts.common import get_logger
+
+MAX_CONNECTION_PROBLEM_COUNT = 3
+#: Delay of the first poll after the job has been submitted.
+INITIAL_SLEEP_TIME = 0.1
+SLEEP_TIME_MULTIPLIER = 1.5
+CONNECTION_PROBLEM_SLEEP_TIME = 4
+#: Properties fetched when polling for job's state.
+JOB_STATE_PROPERTIES = ['JobState', 'PercentComplete']
+#: Query used to subscribe for modifications of software jobs.
+JOB_INDICATION_QUERY = \
+        "SELECT * FROM LMI_SoftwareInstModification" \
+        " WHERE SourceInstance ISA LMI_SoftwareJob"
+
+LOG = get_logger(__name__)
+
+def _is_connection_problem(err):
+    """
+    :returns: Whether the error is caused by broken connection.
+    :rtype: boolean
+    """
+    return err.args[0] == 0 and \
+            err.args[1].lower().startswith('socket error')
+
+def _refresh_job(job):
+    """
+    Refresh properties of a job. Connection problems are logged and
+    tolerated.
+
+    :param job: Instance of ``LMI_SoftwareJob``.
+    :type job: :py:class:`lmi.shell.LMIInstance`
+    :returns: Connection error if the job could not be refreshed due to
+        connection problem, ``None`` otherwise.
+    :rtype: :py:class:`wbem.CIMError`
+    """
+    try:
+        (refreshed, _, errorstr) = job.refresh()
+    except wbem.CIMError as err:
+        if _is_connection_problem(err):
+            LOG().warn("Connection problem: %s", err.args[1])
+            return err
+        raise
+    if not refreshed:
+        raise LMIExceptions.LMISynchroMethodCallError(errorstr)
+    return None
+
+class _JobRecord(object):
+    """
+    Polling state of single job.
+    """
+
+    __slots__ = ('job', 'state', 'percent', 'polled_at', 'interval',
+            'next_poll', 'connection_problem_count')
+
+    def __init__(self, job):
+        now = time.time()
+        self.job = job
+        self.state = job.JobState
+        self.percent = job.PercentComplete
+        self.polled_at = now
+        self.interval = INITIAL_SLEEP_TIME
+        self.next_poll = now + INITIAL_SLEEP_TIME
+        self.connection_problem_count = 0
+
+class JobWaiter(object):
+    """
+    Waits for any number of jobs of software provider in a single loop.
+
+    :param ns: Namespace object used to poll jobs.
+    :type ns: :py:class:`lmi.shell.LMINamespace`
+    :param listener: Optional started indication listener. If given, the
+        waiter subscribes to modifications of software jobs.
+    :type listener: :py:class:`lmi.shell.LMIIndicationListener`
+
+    Example usage: ::
+
+        waiter = JobWaiter(ns)
+        try:
+            for job in jobs:
+                waiter.add(job)
+            for job in waiter.wait_all():
+                print job.InstanceID, job.JobState
+        finally:
+            waiter.close()
+    """
+
+    def __init__(self, ns, listener=None):
+        self._ns = ns
+        self._records = {}
+        self._lightweight_poll = True
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._notified = set()
+        self._subscription = None
+        self._listener = None
+        self._handler = None
+        if listener is not None:
+            self._subscribe(listener)
+
+    def _subscribe(self, listener):
+        """
+        Subscribe to modifications of software jobs. Failure is not fatal,
+        jobs will be polled as if there were no listener.
+        """
+        name = listener.add_handler("lmiscript_software_job-XXXXXXXX",
+                self._handle_indication)
+        self._listener = listener
+        self._handler = name
+        try:
+            retval = self._ns.connection.subscribe_indication(
+                    Name=name,
+                    Query=JOB_INDICATION_QUERY,
+                    Destination="http://%s:%d" % (
+                        socket.gethostname(), listener.port))
+        except wbem.CIMError as err:
+            LOG().warn('Failed to subscribe to job indications: %s', err)
+            self._remove_handler()
+            return
+        if not retval or not retval.rval:
+            LOG().warn('Failed to subscribe to job indications: %s',
+                    retval.errorstr if retval else 'unknown error')
+            self._remove_handler()
+            return
+        LOG().debug('Subscribed to job indications as "%s".', name)
+        self._subscription = name
+
+    def _handle_indication(self, indication, **kwargs):
+        """
+        Called by indication listener in its own thread.
+        """
+        with self._lock:
+            for obj in indication.exported_objects():
+                self._notified.add(obj["SourceInstance"]["InstanceID"])
+        self._event.set()
+
+    def _remove_handler(self):
+        """
+        Unregister indication handler from listener if registered.
+        """
+        if self._handler is not None:
+            self._listener.remove_handler(self._handler)
+            self._listener = None
+            self._handler = None
+
+    def close(self):
+        """
+        Cancel subscription to job indications if any.
+        """
+        try:
+            if self._subscription is not None:
+                self._ns.connection.unsubscribe_indication(self._subscription)
+                self._subscription = None
+        finally:
+            self._remove_handler()
+
+    def __len__(self):
+        return len(self._records)
+
+    def add(self, job):
+        """
+        Add a job to the set of jobs being waited upon.
+
+        :param job: Instance of ``LMI_SoftwareJob``.
+        :type job: :py:class:`lmi.shell.LMIInstance`
+        """
+        if not isinstance(job, LMIInstance):
+            raise TypeError("job must be an LMIInstance")
+        LOG().debug('Waiting for a job "%s" to finish.', job.InstanceID)
+        self._records[job.InstanceID] = _JobRecord(job)
+
+    def _fetch_state(self, record):
+        """
+        Get current values of ``JobState`` and ``PercentComplete`` of a job.
+        Only these two properties are requested from broker if possible.
+
+        :returns: Pair ``(JobState, PercentComplete)``.
+        :rtype: tuple
+        """
+        if self._lightweight_poll:
+            try:
+                result = self._ns.connection.client.get_instance(
+                        record.job.path.wrapped_object,
+                        PropertyList=JOB_STATE_PROPERTIES)
+                if result.rval is not None:
+                    return ( result.rval['JobState']
+                           , result.rval['PercentComplete'])
+                LOG().debug('Failed to get state of job "%s": %s',
+                        record.job.InstanceID, result.errorstr)
+            except (AttributeError, TypeError, KeyError):
+                LOG().debug('Broker connection does not support fetching'
+                        ' of selected properties, refreshing whole jobs.')
+                self._lightweight_poll = False
+        err = _refresh_job(record.job)
+        if err is not None:
+            raise err
+        return (record.job.JobState, record.job.PercentComplete)
+
+    def _poll(self, record):
+        """
+        Poll the job and schedule the next poll.
+
+        :returns: Whether the job is finished.
+        :rtype: boolean
+        """
+        try:
+            state, percent = self._fetch_state(record)
+        except wbem.CIMError as err:
+            if not _is_connection_problem(err):
+                raise
+            if record.connection_problem_count >= \
+                    MAX_CONNECTION_PROBLEM_COUNT:
+                raise
+            LOG().warn("Connection problem: %s", err.args[1])
+            record.connection_problem_count += 1
+            record.interval = CONNECTION_PROBLEM_SLEEP_TIME
+            record.next_poll = time.time() + record.interval
+            return False
+        record.connection_problem_count = 0
+
+        if state != record.state:
+            # get all the other properties describing job's result
+            err = _refresh_job(record.job)
+            if err is not None:
+                raise err
+            record.state = record.job.JobState
+        if LMIJob.lmi_is_job_finished(record.job):
+            return True
+
+        now = time.time()
+        if      (   percent is not None and record.percent is not None
+                and percent > record.percent and percent < 100
+                and now > record.polled_at):
+            # poll again in a half of expected remaining time
+            rate = float(percent - record.percent) / (now - record.polled_at)
+            interval = (100 - percent) / rate / 2
+        else:
+            interval = record.interval * SLEEP_TIME_MULTIPLIER
+        record.interval = max(INITIAL_SLEEP_TIME, min(interval,
+            LMIMethod._POLLING_ADAPT_MAX_WAITING_TIME))
+        record.percent = percent
+        record.polled_at = now
+        record.next_poll = now + record.interval
+        return False
+
+    def wait_any(self, timeout=None):
+        """
+        Wait until at least one of the jobs finishes.
+
+        :param float timeout: Maximum number of seconds to wait. ``None``
+            means to wait without a limit.
+        :returns: Finished jobs, that are no longer waited upon. The list
+            is empty if there are no jobs or the timeout expired.
+        :rtype: list of :py:class:`lmi.shell.LMIInstance`
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while self._records:
+            with self._lock:
+                notified, self._notified = self._notified, set()
+            now = time.time()
+            finished = []
+            for job_id, record in self._records.items():
+                if      (   LMIJob.lmi_is_job_finished(record.job)
+                        or (   (record.next_poll <= now or job_id in notified)
+                           and self._poll(record))):
+                    finished.append(job_id)
+            if finished:
+                return [self._records.pop(job_id).job for job_id in finished]
+
+            delay = min(r.next_poll for r in self._records.values()) \
+                    - time.time()
+            if deadline is not None:
+                if time.time() >= deadline:
+                    break
+                delay = min(delay, deadline - time.time())
+            if delay > 0:
+                self._event.wait(delay)
+                self._event.clear()
+        return []
+
+    def wait_all(self):
+        """
+        Wait for all the jobs to finish.
+
+        :returns: Jobs in the order they finish.
+        :rtype: generator over :py:class:`lmi.shell.LMIInstance`
+        """
+        while self._records:
+            for job in self.wait_any():
+                yield job
+
+def wait_for_job(ns, job, listener=None):
+    """
+    Wait for asynchronous job to be finished.
+
+    :param job: Instance of ``LMI_SoftwareJob``.
+    :type job: :py:class:`lmi.shell.LMIInstance`
+    :param listener: Optional started indication listener.
+    :type listener: :py:class:`lmi.shell.LMIIndicationListener`
+    """
+    waiter = JobWaiter(ns, listener=listener)
+    try:
+        waiter.add(job)
+        for _ in waiter.wait_all():
+            pass
+    finally:
+        waiter.close()
@@ -0,0 +1,167 @@
+# Copyright (C) 2014 Red Hat, Inc. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+#
+# Authors: Michal Minar <miminar@redhat.com>
+#
+"""
+Comparison of installed packages with other hosts or with a saved manifest.
+
+Manifest is a text file with one package in ``nevra`` notation per line.
+Empty lines and lines starting with ``#`` are ignored.
+
+Sets of installed packages are obtained with one enumeration per host
+(see :py:func:`~lmi.scripts.software.list_installed_nevras`). Any number
+of hosts can be queried at once with :py:func:`fetch_installed_nevras`.
+"""
+
+from collections import defaultdict
+import threading
+
+from lmi.scripts.common.errors import LmiFailed
+from lmi.scripts.common import get_logger
+from lmi.scripts.software import list_installed_nevras
+from lmi.scripts.software.nevra import parse_nevra
+
+LOG = get_logger(__name__)
+
+#: Package is present just in the second set.
+CHANGE_ADDED = 'added'
+#: Package is present just in the first set.
+CHANGE_REMOVED = 'removed'
+#: Package is present in both sets, newer version is in the second one.
+CHANGE_UPGRADED = 'upgraded'
+#: Package is present in both sets, older version is in the second one.
+CHANGE_DOWNGRADED = 'downgraded'
+
+def load_manifest(path):
+    """
+    Read packages from manifest file.
+
+    :param string path: Path to manifest file.
+    :rtype: set of :py:class:`~lmi.scripts.software.nevra.Nevra`
+    """
+    result = set()
+    try:
+        with open(path, 'r') as manifest:
+            for lineno, line in enumerate(manifest, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                try:
+                    result.add(parse_nevra(line))
+                except ValueError:
+                    raise LmiFailed('Invalid package "%s" on line %d of'
+                            ' manifest "%s".' % (line, lineno, path))
+    except IOError as err:
+        raise LmiFailed('Failed to read manifest "%s": %s' % (path, err))
+    return result
+
+def save_manifest(path, nevras):
+    """
+    Write packages to manifest file sorted by their names.
+
+    :param string path: Path to manifest file. It will be overwritten.
+    :param nevras: Packages to write.
+    :type nevras: iterable of :py:class:`~lmi.scripts.software.nevra.Nevra`
+    """
+    try:
+        with open(path, 'w') as manifest:
+            for nevra in sorted(nevras):
+                manifest.write('%s\n' % nevra)
+    except IOError as err:
+        raise LmiFailed('Failed to write manifest "%s": %s' % (path, err))
+
+def fetch_installed_nevras(namespaces):
+    """
+    Get sets of installed packages from several hosts concurrently.
+
+    :param list namespaces: Namespace objects (``root/cimv2``) of
+        connections to hosts.
+    :returns: List of pairs ``(ns, result)`` in the same order as
+        ``namespaces``. Result is a set of installed packages or an instance
+        of :py:exc:`~lmi.scripts.common.errors.LmiFailed` if the host could
+        not be queried.
+    :rtype: list
+    """
+    results = [None] * len(namespaces)
+
+    def _fetch(index, ns):
+        try:
+            results[index] = list_installed_nevras(ns)
+        except Exception as err:
+            LOG().debug('Failed to list installed packages.', exc_info=True)
+            results[index] = LmiFailed(
+                    'Failed to list installed packages: %s' % err)
+
+    threads = [ threading.Thread(target=_fetch, args=(index, ns))
+              for index, ns in enumerate(namespaces)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return zip(namespaces, results)
+
+def diff_nevras(first, second):
+    """
+    Compare two sets of packages. Packages are matched by their name and
+    architecture.
+
+    :param set first: Base set of
+        :py:class:`~lmi.scripts.software.nevra.Nevra` objects.
+    :param set second: Set of :py:class:`~lmi.scripts.software.nevra.Nevra`
+        objects compared to the ``first``.
+    :returns: Triples ``(change, old, new)`` sorted by package name, where
+        ``change`` is one of ``CHANGE_*`` constants. ``old`` is a package from
+        the ``first`` set or ``None`` for added packages, ``new`` is a package
+        from the ``second`` set or ``None`` for removed ones.
+    :rtype: generator
+    """
+    removed = defaultdict(list)
+    for nevra in first - second:
+        removed[nevra.key].append(nevra)
+    added = defaultdict(list)
+    for nevra in second - first:
+        added[nevra.key].append(nevra)
+
+    for key in sorted(set(removed).union(added)):
+        olds = sorted(removed.get(key, ()))
+        news = sorted(added.get(key, ()))
+        if len(olds) == 1 and len(news) == 1:
+            # single version replaced with another one
+            old, new = olds[0], news[0]
+            result = new.compare(old)
+            if result:
+                yield (CHANGE_UPGRADED if result > 0 else CHANGE_DOWNGRADED,
+                        old, new)
+            # otherwise only the notation of the version differs
+            continue
+        # multiple versions may be installed (e.g. kernel)
+        for old in olds:
+            yield (CHANGE_REMOVED, old, None)
+        for new in news:
+            yield (CHANGE_ADDED, None, new)
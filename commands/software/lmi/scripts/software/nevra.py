@@ -0,0 +1,311 @@
+# Copyright (C) 2014 Red Hat, Inc. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+#
+# Authors: Michal Minar <miminar@redhat.com>
+#
+"""
+Parsing and comparison of package names and versions on client side.
+
+Package strings are parsed with precompiled regular expressions and the
+results are cached. Versions are compared with the same algorithm as
+*RPM* uses (``rpmvercmp``), so no request to provider is needed to decide,
+which of two packages is newer.
+
+Regular expressions :py:data:`~lmi.scripts.software.RE_NA`,
+:py:data:`~lmi.scripts.software.RE_NEVRA` and
+:py:data:`~lmi.scripts.software.RE_ENVRA` are defined here.
+"""
+
+from itertools import izip_longest
+import re
+
+from lmi.shell import LMIInstanceName
+
+# matches <name>.<arch>
+RE_NA  = re.compile(r'^(?P<name>.+)\.(?P<arch>[^.]+)$')
+# matches both nevra and nvra
+RE_NEVRA = re.compile(
+    r'^(?P<name>.+)-(?P<evra>(?:(?P<epoch>\d+):)?(?P<version>[\w.+{}]+)'
+    r'-(?P<release>[\w.+{}]+)\.(?P<arch>[^.]+))$')
+RE_ENVRA = re.compile(
+    r'^(?P<epoch>\d+):(?P<name>.+)-(?P<version>[\w.+{}]+)'
+    r'-(?P<release>[\w.+{}]+)\.(?P<arch>[^.]+)$')
+# splits version string to segments compared by rpmvercmp
+RE_VERSION_SEGMENT = re.compile(r'~|\^|[0-9]+|[a-zA-Z]+')
+
+#: Maximum number of items in parsing caches. Caches are cleared when
+#: they grow bigger.
+MAX_CACHE_SIZE = 65536
+
+_NEVRA_CACHE = {}
+_SEGMENTS_CACHE = {}
+
+def _version_segments(version):
+    """
+    Split version string to segments. Numeric segments are converted to
+    integers. Separators other than ``~`` and ``^`` are dropped.
+
+    :rtype: tuple
+    """
+    try:
+        return _SEGMENTS_CACHE[version]
+    except KeyError:
+        pass
+    segments = tuple(int(s) if s[0].isdigit() else s
+            for s in RE_VERSION_SEGMENT.findall(version))
+    if len(_SEGMENTS_CACHE) >= MAX_CACHE_SIZE:
+        _SEGMENTS_CACHE.clear()
+    _SEGMENTS_CACHE[version] = segments
+    return segments
+
+def rpmvercmp(first, second):
+    """
+    Compare two version or release strings the same way as *RPM* does.
+
+    Strings are split to alphabetic and numeric segments, that are compared
+    one by one. Numeric segments are newer than alphabetic ones. Segments
+    starting with ``~`` sort before anything else, even the end of string.
+    Segments starting with ``^`` sort after the end of string but before
+    anything else.
+
+    :param string first: Version or release string.
+    :param string second: Version or release string.
+    :returns: Negative number if ``first`` is older than ``second``, zero
+        if they are equal and positive number if ``first`` is newer.
+    :rtype: integer
+    """
+    if first == second:
+        return 0
+    for one, two in izip_longest(
+            _version_segments(first), _version_segments(second)):
+        if one == '~' or two == '~':
+            if one != '~':
+                return 1
+            if two != '~':
+                return -1
+            continue
+        if one == '^' or two == '^':
+            if one is None:
+                return -1
+            if two is None:
+                return 1
+            if one != '^':
+                return 1
+            if two != '^':
+                return -1
+            continue
+        if one is None:
+            return -1
+        if two is None:
+            return 1
+        one_num = not isinstance(one, basestring)
+        if one_num != (not isinstance(two, basestring)):
+            return 1 if one_num else -1
+        if one != two:
+            return 1 if one > two else -1
+    return 0
+
+def compare_evr(first, second):
+    """
+    Compare epoch, version and release of two packages.
+
+    :param tuple first: Triple ``(epoch, version, release)``. Missing epoch
+        (``None``) is treated as zero. If any of releases is ``None``,
+        releases are not compared.
+    :param tuple second: Triple ``(epoch, version, release)``.
+    :returns: Negative number if ``first`` is older than ``second``, zero
+        if they are equal and positive number if ``first`` is newer.
+    :rtype: integer
+    """
+    epoch1, version1, release1 = first
+    epoch2, version2, release2 = second
+    result = cmp(int(epoch1 or 0), int(epoch2 or 0))
+    if result:
+        return result
+    result = rpmvercmp(version1 or '', version2 or '')
+    if result or release1 is None or release2 is None:
+        return result
+    return rpmvercmp(release1, release2)
+
+class Nevra(object):
+    """
+    Immutable package identification. Any part except for ``name`` may be
+    ``None`` if it is not known.
+
+    Instances with the same name and architecture are ordered by their
+    epoch, version and release. Otherwise they are ordered by name and
+    architecture. Equality compares the parts as strings, so that equal
+    objects have equal hashes. Use :py:meth:`compare` to find out whether
+    two packages are of the same version according to *RPM*.
+    """
+
+    __slots__ = ('name', 'epoch', 'version', 'release', 'arch')
+
+    def __init__(self, name, epoch=None, version=None, release=None,
+            arch=None):
+        setattr_ = super(Nevra, self).__setattr__
+        setattr_('name', name)
+        setattr_('epoch', None if epoch is None else str(epoch))
+        setattr_('version', version)
+        setattr_('release', release)
+        setattr_('arch', arch)
+
+    def __setattr__(self, name, value):
+        # instances are shared by parsing caches
+        raise AttributeError("Nevra objects are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Nevra objects are immutable")
+
+    @classmethod
+    def from_identity(cls, identity):
+        """
+        Create the object from an instance or instance name of
+        ``LMI_SoftwareIdentity``.
+
+        :param identity: Software identity.
+        :type identity: :py:class:`lmi.shell.LMIInstance`
+            or :py:class:`lmi.shell.LMIInstanceName`
+        :rtype: :py:class:`Nevra`
+        """
+        if isinstance(identity, LMIInstanceName):
+            return parse_nevra(
+                    identity.InstanceID[len('LMI:LMI_SoftwareIdentity:'):])
+        return cls(identity.Name, identity.Epoch or 0, identity.Version,
+                identity.Release, identity.Architecture)
+
+    @property
+    def key(self):
+        """
+        Pair ``(name, arch)`` identifying the package regardless of its
+        version.
+        """
+        return (self.name, self.arch)
+
+    @property
+    def evr(self):
+        """ Triple ``(epoch, version, release)``. """
+        return (self.epoch, self.version, self.release)
+
+    def compare(self, other):
+        """
+        Compare with another object.
+
+        :returns: Negative number if ``self`` is lower than ``other``, zero
+            if they are equal and positive number if it is greater.
+        :rtype: integer
+        """
+        if self.key != other.key:
+            return cmp(self.key, other.key)
+        return compare_evr(self.evr, other.evr)
+
+    def __eq__(self, other):
+        if not isinstance(other, Nevra):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __lt__(self, other):
+        return self.compare(other) < 0
+
+    def __le__(self, other):
+        return self.compare(other) <= 0
+
+    def __gt__(self, other):
+        return self.compare(other) > 0
+
+    def __ge__(self, other):
+        return self.compare(other) >= 0
+
+    def _fields(self):
+        return (self.name, int(self.epoch or 0), self.version,
+                self.release, self.arch)
+
+    def __hash__(self):
+        return hash(self._fields())
+
+    def __str__(self):
+        if self.version is None:
+            if self.arch is None:
+                return self.name
+            return '%s.%s' % (self.name, self.arch)
+        return '%s-%s:%s-%s.%s' % (self.name, self.epoch or 0, self.version,
+                self.release, self.arch)
+
+    def __repr__(self):
+        return 'Nevra(%r, %r, %r, %r, %r)' % (self.name, self.epoch,
+                self.version, self.release, self.arch)
+
+def parse_pkg_spec(pkg_spec):
+    """
+    Parse package specification string (see
+    :py:ref:`package_specification`). Results are cached.
+
+    :param string pkg_spec: Package specification.
+    :returns: Parsed specification with unspecified parts set to ``None``.
+    :rtype: :py:class:`Nevra`
+    """
+    try:
+        return _NEVRA_CACHE[pkg_spec]
+    except KeyError:
+        pass
+    if not isinstance(pkg_spec, basestring):
+        raise TypeError("pkg_spec must be a string")
+    match = None
+    if '-' in pkg_spec:
+        # version and release are always separated with dash
+        match = RE_ENVRA.match(pkg_spec) or RE_NEVRA.match(pkg_spec)
+    if match:
+        result = Nevra(match.group('name'), match.group('epoch'),
+                match.group('version'), match.group('release'),
+                match.group('arch'))
+    else:
+        match = RE_NA.match(pkg_spec)
+        if match:
+            result = Nevra(match.group('name'), arch=match.group('arch'))
+        else:
+            result = Nevra(pkg_spec)
+    if len(_NEVRA_CACHE) >= MAX_CACHE_SIZE:
+        _NEVRA_CACHE.clear()
+    _NEVRA_CACHE[pkg_spec] = result
+    return result
+
+def parse_nevra(nevra):
+    """
+    Parse complete package string in ``nevra``, ``nvra`` or ``envra``
+    notation. Results are cached.
+
+    :param string nevra: Package string.
+    :rtype: :py:class:`Nevra`
+    """
+    result = parse_pkg_spec(nevra)
+    if result.version is None:
+        raise ValueError('Invalid nevra string "%s".' % nevra)
+    return result
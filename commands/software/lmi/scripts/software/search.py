@@ -0,0 +1,323 @@
+# Copyright (C) 2014 Red Hat, Inc. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+#
+# Authors: Michal Minar <miminar@redhat.com>
+#
+"""
+Local search in package metadata.
+
+Searching with provider (:py:func:`~lmi.scripts.software.find_package`)
+makes it scan its whole catalog for each pattern. This module keeps
+a snapshot of names and summaries of all installed and available packages
+in a client side cache (see :py:mod:`~lmi.scripts.software.cache`) and
+answers queries from an in-memory trigram index built over package names
+and summaries. Which packages are installed is not taken from the
+snapshot; it is obtained from the host with a single enumeration of
+instance names each time the index is requested.
+
+The snapshot is created or refreshed only on request with
+:py:func:`get_search_index` because listing all available packages is
+expensive. Refresh lists again just packages of repositories updated since
+the previous snapshot. When the snapshot is missing or older than
+:py:data:`SEARCH_INDEX_MAX_AGE`, callers are supposed to fall back to
+searching with provider.
+"""
+
+from collections import defaultdict
+import time
+
+from lmi.scripts.common import get_logger
+from lmi.scripts import software
+from lmi.scripts.software import cache
+from lmi.scripts.software.nevra import parse_nevra, parse_pkg_spec
+
+LOG = get_logger(__name__)
+
+#: Number of seconds, after which the snapshot of package metadata is
+#: considered stale.
+SEARCH_INDEX_MAX_AGE = 24*60*60
+
+#: Package name is equal to searched name.
+RANK_EXACT = 0
+#: Package name starts with searched name.
+RANK_PREFIX = 1
+#: Package name contains searched name.
+RANK_SUBSTRING = 2
+#: Just package summary contains searched name.
+RANK_SUMMARY = 3
+
+# in-memory indexes of this process: (cache key, (timestamp, index))
+_INDEXES = {}
+
+def _trigrams(text):
+    """ :returns: Set of all substrings of length 3. """
+    return set(text[i:i+3] for i in range(len(text) - 2))
+
+def _add_trigrams(index, text, position):
+    """ Add ``position`` to postings of all trigrams of ``text``. """
+    for trigram in _trigrams(text):
+        index[trigram].append(position)
+
+class SearchIndex(object):
+    """
+    Index of package metadata allowing for fast substring search in package
+    names and summaries.
+
+    :param list packages: Pairs ``(nevra, summary)`` with nevra string and
+        package summary.
+    :param installed: Nevra strings of installed packages.
+    :type installed: set
+    """
+
+    def __init__(self, packages, installed=()):
+        self._packages = []
+        self._names = []
+        self._summaries = []
+        self._nevras = set()
+        self._installed = frozenset(installed)
+        self._name_trigrams = defaultdict(list)     # (trigram, [index])
+        self._summary_trigrams = defaultdict(list)  # (trigram, [index])
+        for index, (nevra_str, summary) in enumerate(packages):
+            nevra = parse_nevra(nevra_str)
+            name = nevra.name.lower()
+            summary = summary or ''
+            self._packages.append((nevra, summary, nevra_str))
+            self._nevras.add(nevra_str)
+            self._names.append(name)
+            self._summaries.append(summary.lower())
+            _add_trigrams(self._name_trigrams, name, index)
+            _add_trigrams(self._summary_trigrams, summary.lower(), index)
+
+    def __len__(self):
+        return len(self._packages)
+
+    def __contains__(self, nevra):
+        """ :param string nevra: Nevra string of package. """
+        return nevra in self._nevras
+
+    def set_installed(self, installed):
+        """
+        Update the set of installed packages without rebuilding the index.
+
+        :param installed: Nevra strings of installed packages.
+        :type installed: set
+        """
+        self._installed = frozenset(installed)
+
+    def _candidates(self, trigram_index, name):
+        """
+        :param dictionary trigram_index: Postings of either names or
+            summaries.
+        :returns: Indexes of packages, whose names or summaries may contain
+            ``name``.
+        :rtype: iterable
+        """
+        trigrams = _trigrams(name)
+        if not trigrams:
+            return xrange(len(self._packages))
+        postings = sorted((trigram_index.get(t, ()) for t in trigrams),
+                key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if not result:
+                break
+            result.intersection_update(posting)
+        return result
+
+    def search(self, pkg_spec, installed=None, allow_duplicates=False):
+        """
+        Find packages matching given specification. Package name from
+        ``pkg_spec`` is matched as a case insensitive substring of package
+        names and summaries, other parts of the specification must match
+        exactly.
+
+        :param string pkg_spec: Package specification (see
+            :py:ref:`package_specification`).
+        :param boolean installed: Limit the search to installed or not
+            installed packages. Unless set to boolean value, all packages
+            are searched.
+        :param boolean allow_duplicates: Whether to include all versions of
+            packages with the same name and architecture. Otherwise just
+            the newest one is returned.
+        :returns: Triples ``(nevra, summary, installed)`` ordered by their
+            rank (``RANK_*`` constants) and name.
+        :rtype: list
+        """
+        spec = parse_pkg_spec(pkg_spec)
+        name = spec.name.lower()
+        matching = {}   # (package index, rank)
+        for index in self._candidates(self._name_trigrams, name):
+            package_name = self._names[index]
+            if package_name == name:
+                matching[index] = RANK_EXACT
+            elif package_name.startswith(name):
+                matching[index] = RANK_PREFIX
+            elif name in package_name:
+                matching[index] = RANK_SUBSTRING
+        for index in self._candidates(self._summary_trigrams, name):
+            if index not in matching and name in self._summaries[index]:
+                matching[index] = RANK_SUMMARY
+
+        newest = {}     # ((name, arch), (rank, package))
+        result = []
+        for index, rank in matching.iteritems():
+            nevra, summary, nevra_str = self._packages[index]
+            is_installed = nevra_str in self._installed
+            if installed is not None and is_installed != installed:
+                continue
+            if any(    getattr(spec, attr) is not None
+                   and getattr(spec, attr) != getattr(nevra, attr)
+                   for attr in ('version', 'release', 'arch')):
+                continue
+            if spec.epoch is not None and \
+                    int(spec.epoch) != int(nevra.epoch or 0):
+                continue
+            package = (nevra, summary, is_installed)
+            if allow_duplicates:
+                result.append((rank, package))
+            elif nevra.key not in newest or newest[nevra.key][1][0] < nevra:
+                newest[nevra.key] = (rank, package)
+        if not allow_duplicates:
+            result = newest.values()
+        result.sort(key=lambda item: (item[0], item[1][0]))
+        return [(str(nevra), summary, inst)
+               for _, (nevra, summary, inst) in result]
+
+def _fetch_repository_packages(repo):
+    """
+    List metadata of all packages available in repository.
+
+    :param repo: Instance of ``LMI_SoftwareIdentityResource``.
+    :returns: Pairs ``[nevra, summary]``.
+    :rtype: list
+    """
+    return [ [identity.ElementName, identity.Caption]
+           for identity in repo.associators(
+                Role="AvailableSAP",
+                ResultRole="ManagedElement",
+                AssocClass="LMI_ResourceForSoftwareIdentity",
+                ResultClass="LMI_SoftwareIdentity")]
+
+def _fetch_snapshot(ns, installed_nevras, previous=None):
+    """
+    Make a snapshot of metadata of all installed packages and packages
+    available in enabled repositories. Packages of repositories, that have
+    not been updated since the ``previous`` snapshot, are taken from it.
+    Installed packages are enumerated just when there is a package
+    installed, that is missing in the ``previous`` snapshot.
+
+    :param set installed_nevras: Nevra strings of installed packages.
+    :param dictionary previous: Snapshot made before.
+    :returns: Dictionary with ``installed`` list of pairs
+        ``[nevra, summary]`` and ``repositories`` dictionary with repository
+        ids as keys and pairs ``[last update, packages]`` as values.
+    :rtype: dictionary
+    """
+    previous = previous or {'installed' : [], 'repositories' : {}}
+    repositories = {}
+    for repo in software.list_repositories(ns):
+        last_update = software.get_repository_last_update(repo)
+        if last_update is not None:
+            last_update = str(last_update)
+        old = previous['repositories'].get(repo.Name)
+        if last_update is not None and old is not None \
+                and old[0] == last_update:
+            repositories[repo.Name] = old
+        else:
+            LOG().debug('Listing packages of repository "%s".', repo.Name)
+            repositories[repo.Name] = [last_update,
+                    _fetch_repository_packages(repo)]
+
+    summaries = dict(previous['installed'])
+    for _, packages in repositories.itervalues():
+        summaries.update(packages)
+    if installed_nevras.issubset(summaries):
+        installed = [[nevra, summaries[nevra]] for nevra in installed_nevras]
+    else:
+        installed = [ [identity.ElementName, identity.Caption]
+                    for identity in software.list_installed_packages(ns)]
+    return {'installed' : installed, 'repositories' : repositories}
+
+def _snapshot_packages(snapshot):
+    """
+    :returns: Pairs ``(nevra, summary)`` of all packages in snapshot made
+        by :py:func:`_fetch_snapshot`.
+    :rtype: list
+    """
+    packages = [tuple(package) for package in snapshot['installed']]
+    seen = set(nevra for nevra, _ in snapshot['installed'])
+    for _, available in snapshot['repositories'].itervalues():
+        for nevra, summary in available:
+            if nevra not in seen:
+                seen.add(nevra)
+                packages.append((nevra, summary))
+    return packages
+
+def get_search_index(ns, refresh=False, max_age=SEARCH_INDEX_MAX_AGE):
+    """
+    Get an index of package metadata of particular host.
+
+    :param boolean refresh: Whether to make a new snapshot of package
+        metadata. This lists installed packages and packages of repositories
+        updated since the previous snapshot, which may take several minutes
+        when there is no snapshot yet.
+    :param integer max_age: Maximum age of snapshot in seconds.
+    :returns: Search index or ``None`` if there is no snapshot, it is
+        too old or it misses some installed package and ``refresh`` is
+        ``False``.
+    :rtype: :py:class:`SearchIndex`
+    """
+    key = cache.make_key(ns, 'packages')
+    if refresh:
+        LOG().info('Making a snapshot of package metadata.')
+        installed = set(str(n) for n in software.list_installed_nevras(ns))
+        snapshot = _fetch_snapshot(ns, installed, cache.load(key))
+        cache.store(key, snapshot)
+        index = SearchIndex(_snapshot_packages(snapshot), installed)
+        _INDEXES[key] = (cache.get_timestamp(key), index)
+        return index
+
+    timestamp = cache.get_timestamp(key)
+    if timestamp is None or time.time() - timestamp > max_age:
+        LOG().debug('No fresh snapshot of package metadata, searching'
+                ' with provider.')
+        return None
+    if key in _INDEXES and _INDEXES[key][0] == timestamp:
+        index = _INDEXES[key][1]
+    else:
+        snapshot = cache.load(key)
+        if snapshot is None:
+            return None
+        index = SearchIndex(_snapshot_packages(snapshot))
+        _INDEXES[key] = (timestamp, index)
+    installed = set(str(n) for n in software.list_installed_nevras(ns))
+    if any(nevra not in index for nevra in installed):
+        LOG().debug('Snapshot of package metadata misses some installed'
+                ' packages, searching with provider.')
+        return None
+    index.set_installed(installed)
+    return index
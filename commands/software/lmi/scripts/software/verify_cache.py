@@ -0,0 +1,160 @@
+# Copyright (C) 2014 Red Hat, Inc. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+#
+# Authors: Michal Minar <miminar@redhat.com>
+#
+"""
+Cache of verification results.
+
+Verification of a package makes the provider compute digests of all its
+files, which is expensive. Packages, that passed the verification, are
+recorded in the client side cache (see
+:py:mod:`~lmi.scripts.software.cache`) together with a fingerprint of
+their files made out of file names, sizes and modification times. Such
+packages are not verified again until their fingerprint changes.
+
+Fingerprint of each package is made before its verification starts and
+once again after it passed. The package is recorded only if both
+fingerprints match, so files changed during the verification never get
+recorded as clean. Fingerprints are made by a pool of threads.
+
+.. warning::
+    Files modified without changing their size and modification time are
+    not detected for packages skipped thanks to the cache.
+"""
+
+import hashlib
+from multiprocessing.pool import ThreadPool
+try:
+    import lmiwbem as wbem
+except ImportError:
+    import pywbem as wbem
+
+from lmi.scripts.common.errors import LmiFailed
+from lmi.scripts.common import get_logger
+from lmi.scripts import software
+from lmi.scripts.software import cache
+
+LOG = get_logger(__name__)
+
+#: Properties of ``LMI_SoftwareIdentityFileCheck`` making up the fingerprint.
+FINGERPRINT_PROPERTIES = ('Name', 'FileSize', 'LastModificationTime')
+
+def get_files_fingerprint(ns, package):
+    """
+    Make a fingerprint of files of installed package. Just the properties
+    needed are requested from provider.
+
+    :param package: Instance or instance name of ``LMI_SoftwareIdentity``.
+    :type package: :py:class:`lmi.shell.LMIInstance`
+        or :py:class:`lmi.shell.LMIInstanceName`
+    :returns: Hexadecimal digest of names, sizes and modification times of
+        package files.
+    :rtype: string
+    """
+    digest = hashlib.sha1()
+    for file_check in software.list_package_files(ns, package,
+            properties=list(FINGERPRINT_PROPERTIES)):
+        digest.update('%s\0%s\0%s\n' % (
+            file_check.Name.encode('utf-8'),
+            file_check.FileSize,
+            file_check.LastModificationTime))
+    return digest.hexdigest()
+
+def _get_fingerprint(ns, package):
+    """
+    :returns: Fingerprint of package files (see
+        :py:func:`get_files_fingerprint`) or ``None`` if it can not be made.
+    :rtype: string
+    """
+    try:
+        return get_files_fingerprint(ns, package)
+    except (LmiFailed, wbem.CIMError) as err:
+        LOG().debug('Failed to get fingerprint of "%s": %s',
+                software.get_package_nevra(package), err)
+        return None
+
+def verify_packages(ns, packages, max_jobs=software.DEFAULT_VERIFY_JOBS,
+        listener=None):
+    """
+    Verify several packages like :py:func:`lmi.scripts.software.
+    verify_packages` does, but skip packages, that passed the verification
+    before and whose files have not changed since.
+
+    :param list packages: Instances or instance names of
+        ``LMI_SoftwareIdentity`` representing packages to verify.
+    :param integer max_jobs: Maximum number of verification jobs running
+        at once. The same number of threads makes fingerprints.
+    :param listener: Optional started indication listener used to get
+        notified about jobs' progress (see :py:mod:`.jobs`).
+    :type listener: :py:class:`lmi.shell.LMIIndicationListener`
+    :returns: Triples ``(package, result, cached)``. ``result`` is the same as
+        in :py:func:`lmi.scripts.software.verify_packages`. ``cached`` is
+        ``True`` for packages, that were not verified thanks to the cache.
+        Those are yielded first.
+    :rtype: generator
+    """
+    key = cache.make_key(ns, 'verified')
+    clean = cache.load(key) or {}     # (nevra, fingerprint)
+    packages = list(packages)
+    pool = ThreadPool(max_jobs)
+    try:
+        # fingerprints made before the verification starts
+        before = dict(zip(
+            (software.get_package_nevra(p) for p in packages),
+            pool.map(lambda p: _get_fingerprint(ns, p), packages)))
+        to_verify = []
+        for package in packages:
+            nevra = software.get_package_nevra(package)
+            if before[nevra] is not None and clean.get(nevra) == before[nevra]:
+                LOG().debug('Package "%s" is unchanged since the last'
+                        ' verification.', nevra)
+                yield (package, [], True)
+            else:
+                to_verify.append(package)
+
+        passed = {}     # (nevra, asynchronous fingerprint)
+        try:
+            for package, result in software.verify_packages(ns, to_verify,
+                    max_jobs=max_jobs, listener=listener):
+                nevra = software.get_package_nevra(package)
+                clean.pop(nevra, None)
+                if not isinstance(result, LmiFailed) and not result \
+                        and before[nevra] is not None:
+                    passed[nevra] = pool.apply_async(
+                            _get_fingerprint, (ns, package))
+                yield (package, result, False)
+        finally:
+            for nevra, fingerprint in passed.iteritems():
+                if fingerprint.get() == before[nevra]:
+                    clean[nevra] = before[nevra]
+                else:
+                    LOG().debug('Files of package "%s" changed during'
+                            ' verification.', nevra)
+            cache.store(key, clean)
+    finally:
+        pool.close()